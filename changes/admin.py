@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Change
+
+
+@admin.register(Change)
+class ChangeAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'object_type', 'object_id', 'action', 'changed_at')
+    list_filter = ('object_type', 'action')
+    search_fields = ('object_id',)
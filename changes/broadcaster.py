@@ -0,0 +1,98 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    # One SSE connection: an asyncio queue fed thread-safely by the broadcaster.
+    # While idle it costs a queue and a pending future, nothing else.
+
+    def __init__(self, broadcaster, loop, queue_size):
+        self._broadcaster = broadcaster
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, item):
+        # Called from whichever thread committed the change
+        try:
+            self._loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError:
+            # The connection's event loop is gone
+            self.close()
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # A client too slow to keep up is told to resync rather than buffering forever
+            self.overflowed = True
+            self.close()
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def close(self):
+        self._broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    # In-process fan-out of change events with a bounded replay history for
+    # Last-Event-ID resume. Only sees events committed by this process.
+
+    def __init__(self, history_size=1000, queue_size=256):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._counter = itertools.count(1)
+        self._queue_size = queue_size
+        # Event ids are "<epoch>-<n>" so ids from before a restart are recognised as stale
+        self.epoch = str(int(time.time()))
+
+    def publish(self, event):
+        with self._lock:
+            event_id = f'{self.epoch}-{next(self._counter)}'
+            item = (event_id, event)
+            self._history.append(item)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(item)
+        return event_id
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber; returns (subscription, replay, complete).
+
+        ``complete`` is False when events after ``last_event_id`` are no longer
+        in the history and the client has to refetch.
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), self._queue_size)
+        with self._lock:
+            # Registering and snapshotting under one lock leaves no gap between replay and live
+            self._subscribers.add(subscription)
+            replay, complete = self._replay_after(last_event_id)
+        return subscription, replay, complete
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _replay_after(self, last_event_id):
+        if not last_event_id:
+            return [], True
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return [], False
+        sequence = int(sequence)
+        replay = [item for item in self._history if int(item[0].split('-')[1]) > sequence]
+        oldest = int(self._history[0][0].split('-')[1]) if self._history else None
+        complete = oldest is None or oldest <= sequence + 1
+        return replay, complete
+
+
+broadcaster = Broadcaster()
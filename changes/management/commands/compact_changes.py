@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from changes.models import Change
+
+
+class Command(BaseCommand):
+    help = ('Drop change log entries superseded by a later change to the same object. '
+            'The latest entry per object, including tombstones, is always kept, so every '
+            'outstanding sync token stays valid.')
+
+    def handle(self, *args, **options):
+        newer = Change.objects.filter(
+            object_type=OuterRef('object_type'),
+            object_id=OuterRef('object_id'),
+            seq__gt=OuterRef('seq'),
+        )
+        deleted, _ = Change.objects.filter(Exists(newer)).delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} superseded change entries'))
@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class Change(models.Model):
+    ACTION_CHOICES = (
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    )
+    
+    # SQLite AUTOINCREMENT: monotonic and never reused, so it doubles as the sync token
+    seq = models.BigAutoField(primary_key=True)
+    object_type = models.CharField(max_length=30)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"#{self.seq} {self.object_type} {self.object_id} {self.action}"
+    
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', 'seq']),
+        ]
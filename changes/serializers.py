@@ -0,0 +1,40 @@
+from rest_framework import serializers
+from documents.models import Document, Version
+from workflows.models import Workflow, DocumentWorkflow
+
+
+# Flat representations for mirroring clients: related objects are referenced
+# by id and arrive through their own change entries.
+
+class DocumentSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Document
+        fields = ['id', 'title', 'description', 'file', 'thumbnail', 'created_at',
+                  'updated_at', 'created_by', 'slug', 'department']
+
+
+class VersionSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Version
+        fields = ['id', 'document', 'version_number', 'file', 'comment', 'created_at', 'created_by']
+
+
+class WorkflowSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Workflow
+        fields = ['id', 'name', 'description', 'created_at', 'created_by']
+
+
+class DocumentWorkflowSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentWorkflow
+        fields = ['id', 'document', 'workflow', 'current_step', 'status', 'started_at',
+                  'completed_at']
+
+
+SYNC_SERIALIZERS = {
+    'document': DocumentSyncSerializer,
+    'version': VersionSyncSerializer,
+    'workflow': WorkflowSyncSerializer,
+    'document_workflow': DocumentWorkflowSyncSerializer,
+}
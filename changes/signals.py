@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from documents.models import Document, Version
+from workflows.models import Workflow, DocumentWorkflow
+from .broadcaster import broadcaster
+from .models import Change
+
+
+# Model -> (event type, document the object belongs to)
+TRACKED_MODELS = {
+    Document: ('document', lambda instance: instance.pk),
+    Version: ('version', lambda instance: instance.document_id),
+    Workflow: ('workflow', lambda instance: None),
+    DocumentWorkflow: ('document_workflow', lambda instance: instance.document_id),
+}
+
+
+def build_event(instance, action):
+    event_type, document_of = TRACKED_MODELS[type(instance)]
+    document_id = document_of(instance)
+    return {
+        'type': event_type,
+        'action': action,
+        'id': str(instance.pk),
+        'document': str(document_id) if document_id is not None else None,
+    }
+
+
+def record_change(instance, action):
+    event = build_event(instance, action)
+    # Logged in the same transaction as the change itself, so the delta-sync
+    # log can never miss or invent a change
+    change = Change.objects.create(object_type=event['type'], object_id=event['id'],
+                                   action=action)
+    event['seq'] = change.seq
+    # Listeners must never hear about changes that end up rolled back
+    transaction.on_commit(lambda: broadcaster.publish(event))
+
+
+def on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(instance, 'created' if created else 'updated')
+
+
+def on_delete(sender, instance, **kwargs):
+    record_change(instance, 'deleted')
+
+
+for model in TRACKED_MODELS:
+    post_save.connect(on_save, sender=model, dispatch_uid=f'changes_save_{model.__name__}')
+    post_delete.connect(on_delete, sender=model, dispatch_uid=f'changes_delete_{model.__name__}')
@@ -0,0 +1,140 @@
+import asyncio
+from io import StringIO
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from documents.models import Document, Version
+from users.revocation import revocation_index
+from .broadcaster import Broadcaster, broadcaster
+from .models import Change
+
+
+class BroadcasterTest(TestCase):
+    def test_resume_replays_missed_events(self):
+        """Test that Last-Event-ID resume replays only the events after it"""
+        async def scenario():
+            hub = Broadcaster(history_size=10)
+            first = hub.publish({'type': 'document', 'action': 'created'})
+            hub.publish({'type': 'document', 'action': 'updated'})
+            subscription, replay, complete = hub.subscribe(first)
+            self.assertTrue(complete)
+            self.assertEqual([event['action'] for _, event in replay], ['updated'])
+            
+            hub.publish({'type': 'version', 'action': 'created'})
+            _, live = await subscription.get(timeout=1)
+            self.assertEqual(live['type'], 'version')
+            subscription.close()
+            self.assertEqual(hub.subscriber_count, 0)
+        
+        asyncio.run(scenario())
+    
+    def test_stale_event_id_requests_reset(self):
+        """Test that ids older than the history ask the client to refetch"""
+        async def scenario():
+            hub = Broadcaster(history_size=2)
+            first = hub.publish({'type': 'document', 'action': 'created'})
+            for _ in range(3):
+                hub.publish({'type': 'document', 'action': 'updated'})
+            _, _, complete = hub.subscribe(first)
+            self.assertFalse(complete)
+            _, _, complete = hub.subscribe('123-1')
+            self.assertFalse(complete)
+        
+        asyncio.run(scenario())
+
+
+class ChangeStreamTest(TransactionTestCase):
+    def setUp(self):
+        revocation_index.clear()
+        self.user = User.objects.create_user(username='streamuser', password='testpassword')
+        self.token = str(AccessToken.for_user(self.user))
+    
+    def test_requires_authentication(self):
+        """Test that the stream rejects requests without a token"""
+        async def scenario():
+            response = await self.async_client.get('/api/changes/stream/')
+            self.assertEqual(response.status_code, 401)
+        
+        asyncio.run(scenario())
+    
+    def test_streams_committed_document_changes(self):
+        """Test that a saved document is pushed to an open stream"""
+        async def scenario():
+            response = await self.async_client.get('/api/changes/stream/',
+                                                   {'token': self.token, 'types': 'document'})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = aiter(response.streaming_content)
+            self.assertIn(b'retry:', await anext(chunks))
+            
+            broadcaster.publish({'type': 'workflow', 'action': 'created', 'id': '1', 'document': None})
+            document = await Document.objects.acreate(title='Streamed', created_by=self.user)
+            chunk = await asyncio.wait_for(anext(chunks), 5)
+            self.assertIn(b'event: document.created', chunk)
+            self.assertIn(str(document.pk).encode(), chunk)
+            await chunks.aclose()
+        
+        asyncio.run(scenario())
+
+
+class ChangeListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('change-list')
+    
+    def test_delta_since_token(self):
+        """Test that only changes after the token are returned, latest per object"""
+        kept = Document.objects.create(title='Kept', created_by=self.user)
+        token = self.client.get(self.url).data['token']
+        
+        kept.title = 'Kept and renamed'
+        kept.save()
+        removed = Document.objects.create(title='Removed', created_by=self.user)
+        removed_id = str(removed.pk)
+        Version.objects.create(document=removed, version_number=1, created_by=self.user)
+        removed.delete()
+        
+        response = self.client.get(self.url, {'since': token})
+        changes = {(c['type'], c['id']): c for c in response.data['changes']}
+        self.assertEqual(changes[('document', str(kept.pk))]['data']['title'], 'Kept and renamed')
+        self.assertEqual(changes[('document', removed_id)]['action'], 'deleted')
+        self.assertEqual([c['action'] for c in changes.values() if c['type'] == 'version'], ['deleted'])
+    
+    def test_up_to_date_client_costs_one_query(self):
+        """Test that an up-to-date token returns nothing in a single query"""
+        Document.objects.create(title='Synced', created_by=self.user)
+        token = self.client.get(self.url).data['token']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'since': token})
+        self.assertEqual(response.data, {'token': token, 'has_more': False, 'changes': []})
+    
+    def test_limit_must_be_positive(self):
+        """Test that a limit below 1 is rejected rather than paging nothing or failing"""
+        Document.objects.create(title='Paged', created_by=self.user)
+        for limit in (0, -5):
+            response = self.client.get(self.url, {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'limit': 1})
+        self.assertEqual((response.status_code, len(response.data['changes'])), (200, 1))
+    
+    def test_changes_respect_document_acl(self):
+        """Test that documents the user may not read are left out of the feed"""
+        other = User.objects.create_user(username='syncother', password='testpassword')
+        Document.objects.create(title='Mine', created_by=self.user)
+        Document.objects.create(title='Theirs', created_by=other)
+        response = self.client.get(self.url)
+        titles = [c['data']['title'] for c in response.data['changes'] if c['type'] == 'document']
+        self.assertEqual(titles, ['Mine'])
+    
+    def test_compaction_keeps_latest_entry_and_tombstones(self):
+        """Test that compaction only drops superseded entries"""
+        document = Document.objects.create(title='Compacted', created_by=self.user)
+        document.save()
+        document.delete()
+        out = StringIO()
+        call_command('compact_changes', stdout=out)
+        self.assertEqual(list(Change.objects.values_list('action', flat=True)), ['deleted'])
+        self.assertIn('Removed 2 superseded', out.getvalue())
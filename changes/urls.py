@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.ChangeListView.as_view(), name='change-list'),
+    path('stream/', views.stream, name='change-stream'),
+]
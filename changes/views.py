@@ -0,0 +1,184 @@
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from documents import acl
+from documents.scoping import can_view_document_id, department_scope, scope_queryset
+from users.authentication import aauthenticate
+from .broadcaster import broadcaster
+from .models import Change
+from .serializers import SYNC_SERIALIZERS
+
+
+def _heartbeat_seconds():
+    return getattr(settings, 'CHANGE_STREAM_HEARTBEAT', 20)
+
+
+# Limits each synced model to the rows the user may read, and the paths to
+# the department the rows are scoped by, to their document and its owner
+VISIBLE = {
+    'document': (acl.visible_documents, 'department', 'pk', 'created_by_id'),
+    'version': (acl.visible_versions, 'document__department', 'document_id',
+                'document__created_by_id'),
+    'document_workflow': (acl.visible_document_workflows, 'document__department', 'document_id',
+                          'document__created_by_id'),
+}
+
+
+class DocumentVisibility:
+    # Per-stream memo of which documents the subscriber may read, so a burst
+    # of events about one document costs a single ACL query. Applies the same
+    # ACL and department scope as the delta feed
+    ttl = 60
+    max_entries = 1024
+    
+    def __init__(self, request):
+        self.request = request
+        self.sees_everything = not department_scope(request)[0]
+        self.decisions = {}
+    
+    async def can_see(self, event):
+        document_id = event['document']
+        if self.sees_everything or document_id is None:
+            return True
+        if event['type'] == 'document' and event['action'] == 'deleted':
+            # Tombstones carry nothing but the id, and the row is gone
+            return True
+        now = time.monotonic()
+        decision = self.decisions.get(document_id)
+        if decision is None or now - decision[1] > self.ttl:
+            if len(self.decisions) >= self.max_entries:
+                self.decisions.clear()
+            allowed = await sync_to_async(can_view_document_id)(self.request, document_id)
+            decision = self.decisions[document_id] = (allowed, now)
+        return decision[0]
+
+
+def format_event(event_id, event):
+    return (f'id: {event_id}\n'
+            f'event: {event["type"]}.{event["action"]}\n'
+            f'data: {json.dumps(event)}\n\n')
+
+
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+async def stream(request):
+    if not isinstance(request, ASGIRequest):
+        # A long-lived stream would pin a worker thread under WSGI
+        return JsonResponse({'error': 'The change stream is only served over ASGI'}, status=501)
+    
+    # EventSource can't send an Authorization header
+    user = await aauthenticate(request, query_token=True)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided or are invalid'},
+                            status=401)
+    
+    types = {t for t in request.GET.get('types', '').split(',') if t}
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    
+    # Department scoping reads request.user, which only knows sessions
+    request.user = user
+    visibility = DocumentVisibility(request)
+    
+    async def wanted(event):
+        return (not types or event['type'] in types) and await visibility.can_see(event)
+    
+    subscription, replay, complete = broadcaster.subscribe(last_event_id)
+    heartbeat = _heartbeat_seconds()
+    
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            if not complete:
+                # Missed events are gone from the history; the client must refetch
+                yield RESET
+            for event_id, event in replay:
+                if await wanted(event):
+                    yield format_event(event_id, event)
+            while True:
+                try:
+                    event_id, event = await subscription.get(heartbeat)
+                except asyncio.TimeoutError:
+                    if subscription.overflowed:
+                        yield RESET
+                        return
+                    yield ': keepalive\n\n'
+                    continue
+                if await wanted(event):
+                    yield format_event(event_id, event)
+        finally:
+            subscription.close()
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class ChangeListView(APIView):
+    # Delta sync: everything created, updated or deleted after the ``since`` token
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 500
+    max_limit = 2000
+    
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Primary key range scan: an up-to-date client costs exactly this one query
+        page = list(Change.objects.filter(seq__gt=since).order_by('seq')
+                    .values_list('seq', 'object_type', 'object_id', 'action')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if not page:
+            return Response({'token': str(since), 'has_more': False, 'changes': []})
+        
+        # Only the latest change per object matters to a mirror
+        latest = {}
+        for seq, object_type, object_id, action in page:
+            latest[(object_type, object_id)] = (seq, action)
+        
+        wanted = defaultdict(list)
+        for (object_type, object_id), (seq, action) in latest.items():
+            if action != 'deleted':
+                wanted[object_type].append(object_id)
+        objects = {}
+        for object_type, object_ids in wanted.items():
+            queryset = SYNC_SERIALIZERS[object_type].Meta.model.objects.filter(pk__in=object_ids)
+            if object_type in VISIBLE:
+                visible, department_field, document_field, owner_field = VISIBLE[object_type]
+                queryset = scope_queryset(visible(queryset, request.user), request, department_field,
+                                          document_field, owner_field)
+            objects[object_type] = {str(obj.pk): obj for obj in queryset}
+        
+        changes = []
+        for (object_type, object_id), (seq, action) in sorted(latest.items(), key=lambda item: item[1][0]):
+            entry = {'seq': seq, 'type': object_type, 'id': object_id, 'action': action}
+            if action != 'deleted':
+                obj = objects[object_type].get(object_id)
+                if obj is None:
+                    # Deleted since (its tombstone comes in a later entry) or not
+                    # visible to this user
+                    continue
+                serializer = SYNC_SERIALIZERS[object_type](obj, context={'request': request})
+                entry['data'] = serializer.data
+            changes.append(entry)
+        
+        return Response({'token': str(page[-1][0]), 'has_more': has_more, 'changes': changes})
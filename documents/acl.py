@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from workflows.models import DocumentWorkflow
+from .models import Document, DocumentGrant
+
+
+DEFAULTS = {
+    # Roles that hold a permission on every document without grants
+    'ROLE_PERMISSIONS': {'admin': 'edit', 'manager': 'view'},
+}
+
+# Permissions that satisfy a check for the key; edit implies view
+IMPLIED_BY = {
+    'view': ('view', 'edit'),
+    'edit': ('edit',),
+}
+
+
+def acl_setting(name):
+    return getattr(settings, 'DOCUMENT_ACL', {}).get(name, DEFAULTS[name])
+
+
+def _profile(user):
+    return getattr(user, 'profile', None)
+
+
+def subject_keys(user):
+    # Built from the request principal, which is cached for reads, so resolving
+    # a user's grants never costs a query of its own
+    keys = [f'user:{user.pk}']
+    profile = _profile(user)
+    if profile is not None:
+        keys.append(f'role:{profile.role}')
+        if profile.department:
+            keys.append(f'dept:{profile.department}')
+    return keys
+
+
+def role_permission(user):
+    if user.is_superuser:
+        return 'edit'
+    profile = _profile(user)
+    if profile is None:
+        return None
+    return acl_setting('ROLE_PERMISSIONS').get(profile.role)
+
+
+def _participating(user, document):
+    # Approvers (and escalation targets) must be able to read what they decide on
+    return DocumentWorkflow.objects.filter(
+        Q(workflow__steps__approver_id=user.pk) | Q(escalated_to_id=user.pk),
+        document_id=OuterRef(document),
+    )
+
+
+def document_access(user, permission='view', document='pk', owner='created_by_id'):
+    """Return a Q matching rows whose document the user holds ``permission`` on.
+
+    ``document`` and ``owner`` are the paths from the filtered model to the
+    document id and its owner id, so the same filter serves documents,
+    versions and document workflows.
+    """
+    if role_permission(user) in IMPLIED_BY[permission]:
+        return Q()
+
+    grants = DocumentGrant.objects.filter(
+        document_id=OuterRef(document),
+        subject__in=subject_keys(user),
+        permission__in=IMPLIED_BY[permission],
+    )
+    condition = Q(**{owner: user.pk}) | Exists(grants)
+    if permission == 'view':
+        condition |= Exists(_participating(user, document))
+    return condition
+
+
+def personal_access(user, document='pk', owner='created_by_id'):
+    """Q for rows whose document the user owns, was shared with them by name or they decide on.
+
+    Unlike role and department grants, these reach across departments
+    (see documents.scoping), so moving department keeps a user's own documents.
+    """
+    grants = DocumentGrant.objects.filter(document_id=OuterRef(document), subject=f'user:{user.pk}')
+    return Q(**{owner: user.pk}) | Exists(grants) | Exists(_participating(user, document))
+
+
+def visible_documents(queryset, user, permission='view'):
+    return queryset.filter(document_access(user, permission))
+
+
+def visible_versions(queryset, user):
+    return queryset.filter(document_access(user, document='document_id',
+                                           owner='document__created_by_id'))
+
+
+def visible_document_workflows(queryset, user):
+    return queryset.filter(document_access(user, document='document_id',
+                                           owner='document__created_by_id'))
+
+
+def has_document_permission(user, document, permission):
+    if document.created_by_id == user.pk or role_permission(user) in IMPLIED_BY[permission]:
+        return True
+    return visible_documents(Document.objects.filter(pk=document.pk), user, permission).exists()
+
+
+def can_manage(user, document):
+    # Deleting and sharing stay with the owner and roles that may edit everything
+    return document.created_by_id == user.pk or role_permission(user) == 'edit'
@@ -1,12 +1,12 @@
 from django.contrib import admin
-from .models import Document, Version
+from .models import Document, Version, DocumentGrant
 
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ('title', 'created_by', 'created_at', 'updated_at')
+    list_display = ('title', 'department', 'created_by', 'created_at', 'updated_at')
     search_fields = ('title', 'description')
-    list_filter = ('created_at', 'updated_at')
+    list_filter = ('department', 'created_at', 'updated_at')
     readonly_fields = ('id', 'created_at', 'updated_at')
 
 
@@ -15,3 +15,10 @@ class VersionAdmin(admin.ModelAdmin):
     list_display = ('document', 'version_number', 'created_by', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('document__title', 'comment')
+
+
+@admin.register(DocumentGrant)
+class DocumentGrantAdmin(admin.ModelAdmin):
+    list_display = ('document', 'subject', 'permission', 'granted_by', 'created_at')
+    list_filter = ('permission',)
+    search_fields = ('document__title', 'subject')
@@ -0,0 +1,194 @@
+"""Native async file endpoints.
+
+Under ASGI the file is streamed chunk by chunk from an async generator: each
+chunk is read in a worker thread and the next one is only read once the
+server has accepted the previous one, so a slow client holds a coroutine
+rather than a thread. Under WSGI the same views fall back to a plain
+FileResponse.
+"""
+import asyncio
+import math
+import mimetypes
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_safe
+
+from ecms_project.throttling import bucket_for, client_key, identify
+from users.authentication import aauthenticate
+from . import acl
+from .models import Document, Version, version_upload_to
+from .scoping import scope_queryset
+from .signed_urls import load_file_token
+
+
+def _chunk_size():
+    return getattr(settings, 'FILE_STREAM_CHUNK_SIZE', 64 * 1024)
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+async def _throttle(scope, who, role, cost=1, debt=False):
+    """A 429 response if ``who`` is over the scope's rate, else None."""
+    bucket = bucket_for(scope, who, role)
+    wait = await bucket.aconsume(cost, debt) if bucket is not None else 0
+    if not wait:
+        return None
+    response = _error(f'Request was throttled. Expected available in {math.ceil(wait)} seconds.', 429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+async def _read_chunks(path, chunk_size):
+    handle = await asyncio.to_thread(open, path, 'rb')
+    try:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+
+async def _path_response(request, path, filename, attachment=True, throttle_as=None):
+    try:
+        size = await asyncio.to_thread(os.path.getsize, path)
+    except OSError:
+        return _error('File not found', 404)
+    if throttle_as is not None:
+        # The whole file is charged up front; a large one leaves the bucket in debt
+        throttled = await _throttle('download_bytes', *throttle_as, cost=size, debt=True)
+        if throttled is not None:
+            return throttled
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_read_chunks(path, _chunk_size()),
+                                         content_type=mimetypes.guess_type(filename)[0]
+                                         or 'application/octet-stream')
+        response['Content-Length'] = str(size)
+    else:
+        response = FileResponse(await asyncio.to_thread(open, path, 'rb'), filename=filename)
+    response['Content-Disposition'] = f'{"attachment" if attachment else "inline"}; filename="{filename}"'
+    return response
+
+
+async def _file_response(request, field_file):
+    try:
+        path = field_file.path
+    except ValueError:
+        return _error('File not found', 404)
+    return await _path_response(request, path, os.path.basename(field_file.name),
+                                throttle_as=identify(request))
+
+
+async def _authenticate(request):
+    user = await aauthenticate(request)
+    if user is not None:
+        # Department scoping reads request.user, which only knows sessions
+        request.user = user
+    return user
+
+
+async def _visible_document(request, user, pk, permission='view'):
+    queryset = scope_queryset(acl.visible_documents(Document.objects.filter(pk=pk), user, permission),
+                              request)
+    return await queryset.afirst()
+
+
+@require_GET
+async def download_document(request, pk):
+    user = await _authenticate(request)
+    if user is None:
+        return _error('Authentication credentials were not provided or are invalid', 401)
+    throttled = await _throttle('download', *identify(request))
+    if throttled is not None:
+        return throttled
+    document = await _visible_document(request, user, pk)
+    if document is None:
+        return _error('Not found', 404)
+    return await _file_response(request, document.file)
+
+
+@require_GET
+async def download_version(request, pk, version_id):
+    user = await _authenticate(request)
+    if user is None:
+        return _error('Authentication credentials were not provided or are invalid', 401)
+    throttled = await _throttle('download', *identify(request))
+    if throttled is not None:
+        return throttled
+    versions = scope_queryset(acl.visible_versions(Version.objects.filter(document_id=pk, pk=version_id),
+                                                   user), request, 'document__department', 'document_id',
+                              'document__created_by_id')
+    version = await versions.afirst()
+    if version is None:
+        return _error('Not found', 404)
+    return await _file_response(request, version.file)
+
+
+@require_safe
+async def signed_file(request, token, filename):
+    """Serve a file named by a URL from signed_urls.sign_file; no authentication or queries."""
+    payload = load_file_token(token)
+    if payload is None:
+        return _error('This link is invalid or has expired', 403)
+    try:
+        path = default_storage.path(payload['n'])
+    except (KeyError, SuspiciousFileOperation):
+        return _error('This link is invalid or has expired', 403)
+    # The name in the URL is cosmetic; type and disposition follow the signed file name
+    # Bytes count against whoever the link was issued to
+    throttle_as = tuple(payload['t']) if payload.get('t') else (client_key(request), None)
+    response = await _path_response(request, path, os.path.basename(payload['n']),
+                                    attachment=bool(payload.get('a')), throttle_as=throttle_as)
+    if response.status_code == 200:
+        # Browsers may reuse the file until the link expires, but not beyond
+        response['Cache-Control'] = f'private, max-age={max(0, int(payload["e"] - time.time()))}'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+async def upload_version(request, pk):
+    """Store the raw request body as a new version of the document.
+
+    The file name comes from ``?filename=`` and an optional ``?comment=``;
+    the body is copied to storage in chunks without being loaded into memory.
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return _error('Authentication credentials were not provided or are invalid', 401)
+    throttled = await _throttle('upload', *identify(request))
+    if throttled is not None:
+        return throttled
+    filename = os.path.basename(request.GET.get('filename', ''))
+    if not filename:
+        return _error('A filename query parameter is required', 400)
+    document = await _visible_document(request, user, pk, 'edit')
+    if document is None:
+        return _error('Not found', 404)
+
+    version = Version(document=document, comment=request.GET.get('comment') or None,
+                      created_by_id=user.pk)
+    version.file.name = await asyncio.to_thread(
+        default_storage.save, version_upload_to(version, filename), File(request, name=filename))
+
+    await sync_to_async(version.save_next)()
+    return JsonResponse({
+        'id': version.pk,
+        'document': str(document.pk),
+        'version_number': version.version_number,
+        'file': version.file.url,
+        'comment': version.comment,
+    }, status=201)
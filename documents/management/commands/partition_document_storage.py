@@ -0,0 +1,54 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from documents.models import (Document, Version, document_upload_to, thumbnail_upload_to,
+                              version_upload_to)
+
+
+class Command(BaseCommand):
+    help = ('Move document, thumbnail and version files uploaded before storage was partitioned '
+            'into their department directories')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the files that would move')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        targets = [
+            (Document.objects.all(), 'file', document_upload_to),
+            (Document.objects.all(), 'thumbnail', thumbnail_upload_to),
+            (Version.objects.select_related('document'), 'file', version_upload_to),
+        ]
+        for queryset, field_name, upload_to in targets:
+            changed = []
+            rows = queryset.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in rows.iterator(chunk_size=options['chunk_size']):
+                name = getattr(instance, field_name).name
+                target = upload_to(instance, os.path.basename(name))
+                if name == target:
+                    continue
+                if not default_storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'Missing file: {name}')
+                    continue
+                self.stdout.write(f'{name} -> {target}')
+                moved += 1
+                if options['dry_run']:
+                    continue
+                with default_storage.open(name, 'rb') as source:
+                    saved = default_storage.save(target, source)
+                default_storage.delete(name)
+                setattr(instance, field_name, saved)
+                changed.append(instance)
+                if len(changed) >= options['chunk_size']:
+                    # Plain UPDATEs: no updated_at bump and no change-log entries
+                    queryset.model.objects.bulk_update(changed, [field_name])
+                    changed = []
+            queryset.model.objects.bulk_update(changed, [field_name])
+
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} files ({missing} missing)'))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:44
+
+import documents.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_creator_departments(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    departments = UserProfile.objects.exclude(department__isnull=True).values_list('user_id', 'department')
+    for user_id, department in departments:
+        Document.objects.filter(created_by_id=user_id).update(department=department)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_document_grants'),
+        ('users', '0003_user_search_terms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='department',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(upload_to=documents.models.document_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to=documents.models.thumbnail_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='version',
+            name='file',
+            field=models.FileField(upload_to=documents.models.version_upload_to),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['department', '-created_at'], name='documents_dept_created_idx'),
+        ),
+        migrations.RunPython(copy_creator_departments, migrations.RunPython.noop),
+    ]
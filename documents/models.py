@@ -1,27 +1,59 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Max
 import uuid
 from django.contrib.auth.models import User
 from django.utils.text import slugify
+from django.core.files.storage import default_storage
 from PIL import Image
 import os
 
 
+# Files of documents without a department
+SHARED_PARTITION = '_shared'
+
+
+def department_partition(department):
+    return slugify(department or '') or SHARED_PARTITION
+
+
+def department_of(user):
+    profile = getattr(user, 'profile', None)
+    return profile.department if profile is not None else None
+
+
+def document_upload_to(instance, filename):
+    return f'documents/{department_partition(instance.department)}/{filename}'
+
+
+def thumbnail_upload_to(instance, filename):
+    return f'thumbnails/{department_partition(instance.department)}/{filename}'
+
+
+def version_upload_to(instance, filename):
+    return f'versions/{department_partition(instance.document.department)}/{filename}'
+
+
 class Document(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    file = models.FileField(upload_to='documents/')
-    thumbnail = models.ImageField(upload_to='thumbnails/', blank=True, null=True)
+    file = models.FileField(upload_to=document_upload_to)
+    thumbnail = models.ImageField(upload_to=thumbnail_upload_to, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
     slug = models.SlugField(max_length=255, unique=True, blank=True)
+    # Tenant key, copied from the creator's profile when the document is created
+    department = models.CharField(max_length=100, blank=True, null=True)
     
     def save(self, *args, **kwargs):
         # Generate slug from title if not provided
         if not self.slug:
             self.slug = slugify(self.title)
         
+        if self._state.adding and self.department is None and self.created_by_id:
+            self.department = department_of(self.created_by)
+        
         # Generate thumbnail for image files
         super().save(*args, **kwargs)
         if self.file and not self.thumbnail:
@@ -32,9 +64,11 @@ class Document(models.Model):
                 try:
                     img = Image.open(self.file.path)
                     img.thumbnail((300, 300))
-                    thumb_path = f'media/thumbnails/{self.id}{file_ext}'
+                    thumb_name = thumbnail_upload_to(self, f'{self.id}{file_ext}')
+                    thumb_path = default_storage.path(thumb_name)
+                    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
                     img.save(thumb_path)
-                    self.thumbnail = f'thumbnails/{self.id}{file_ext}'
+                    self.thumbnail = thumb_name
                     super().save(update_fields=['thumbnail'])
                 except Exception as e:
                     # Handle thumbnail generation error
@@ -45,12 +79,15 @@ class Document(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['department', '-created_at'], name='documents_dept_created_idx'),
+        ]
 
 
 class Version(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='versions')
     version_number = models.PositiveIntegerField()
-    file = models.FileField(upload_to='versions/')
+    file = models.FileField(upload_to=version_upload_to)
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='document_versions')
@@ -58,6 +95,55 @@ class Version(models.Model):
     def __str__(self):
         return f"{self.document.title} - v{self.version_number}"
     
+    def save_next(self, attempts=3):
+        """Save as the document's next version, numbered in the same transaction."""
+        if self.file and not self.file._committed:
+            # Store the upload once, not on every attempt
+            self.file.save(self.file.name, self.file.file, save=False)
+        try:
+            # IMMEDIATE transactions serialize writers, and the retry covers
+            # databases where they don't
+            for attempt in range(attempts):
+                try:
+                    with transaction.atomic():
+                        latest = self.document.versions.aggregate(latest=Max('version_number'))['latest']
+                        self.version_number = (latest or 0) + 1
+                        self.save()
+                    return
+                except IntegrityError:
+                    if attempt == attempts - 1:
+                        raise
+        except Exception:
+            # Don't leave the stored file behind without a version row
+            if self.file:
+                self.file.storage.delete(self.file.name)
+            raise
+    
     class Meta:
         ordering = ['-version_number']
         unique_together = ['document', 'version_number']
+
+
+class DocumentGrant(models.Model):
+    # Sharing entry; subject is "user:<id>", "role:<role>" or "dept:<department>"
+    # so one indexed lookup covers every way a user can be granted access
+    PERMISSION_CHOICES = (
+        ('view', 'View'),
+        ('edit', 'Edit'),
+    )
+    
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='grants')
+    subject = models.CharField(max_length=120)
+    permission = models.CharField(max_length=10, choices=PERMISSION_CHOICES, default='view')
+    granted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='document_grants_given')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.subject} can {self.permission} {self.document.title}"
+    
+    class Meta:
+        unique_together = ['document', 'subject']
+        indexes = [
+            models.Index(fields=['subject', 'document'], name='documents_grant_subject_idx'),
+        ]
@@ -0,0 +1,52 @@
+from django.db.models import Q
+
+from . import acl
+from .models import Document, department_of
+
+
+def department_scope(request):
+    """Return ``(scoped, department)`` for the request's user.
+
+    Users are confined to their own department's rows (documents without a
+    department form a partition of their own), apart from documents they own,
+    were shared with them by name or are in a workflow they decide on. Roles that may read
+    every document are unscoped, but can narrow to one department with
+    ``?department=``.
+    """
+    user = request.user
+    if acl.role_permission(user) is not None:
+        requested = request.GET.get('department')
+        if requested is None:
+            return False, None
+        return True, requested or None
+    return True, department_of(user)
+
+
+def scope_queryset(queryset, request, field='department', document='pk', owner='created_by_id'):
+    """Scope ``queryset``; the paths lead to the document's department, id and owner id."""
+    scoped, department = department_scope(request)
+    if not scoped:
+        return queryset
+    if department is None:
+        condition = Q(**{f'{field}__isnull': True})
+    else:
+        condition = Q(**{field: department})
+    if acl.role_permission(request.user) is None:
+        condition |= acl.personal_access(request.user, document, owner)
+    return queryset.filter(condition)
+
+
+def can_view_document_id(request, document_id):
+    documents = acl.visible_documents(Document.objects.filter(pk=document_id), request.user)
+    return scope_queryset(documents, request).exists()
+
+
+class DepartmentScopedMixin:
+    # Paths from the viewset's model to the owning document's department, id and owner
+    department_field = 'department'
+    document_field = 'pk'
+    owner_field = 'created_by_id'
+    
+    def get_queryset(self):
+        return scope_queryset(super().get_queryset(), self.request, self.department_field,
+                              self.document_field, self.owner_field)
@@ -1,6 +1,8 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Document, Version
+from .models import Document, Version, DocumentGrant
 from django.contrib.auth.models import User
+from users.models import UserProfile
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -15,7 +17,17 @@ class VersionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Version
         fields = ['id', 'document', 'version_number', 'file', 'comment', 'created_at', 'created_by']
-        read_only_fields = ['created_at', 'created_by']
+        # create_version fills these in from the URL and the latest version
+        read_only_fields = ['document', 'version_number', 'created_at', 'created_by']
+    
+    @staticmethod
+    def eager_load(queryset, prefix=''):
+        return queryset.select_related(f'{prefix}created_by')
+    
+    def create(self, validated_data):
+        version = Version(**validated_data)
+        version.save_next()
+        return version
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -26,16 +38,50 @@ class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = ['id', 'title', 'description', 'file', 'thumbnail', 'created_at', 
-                  'updated_at', 'created_by', 'slug', 'versions', 'latest_version']
-        read_only_fields = ['created_at', 'updated_at', 'created_by', 'thumbnail']
+                  'updated_at', 'created_by', 'slug', 'department', 'versions', 'latest_version']
+        read_only_fields = ['created_at', 'updated_at', 'created_by', 'thumbnail', 'department']
+    
+    @staticmethod
+    def eager_load(queryset, prefix=''):
+        # Everything the nested fields read, in a fixed number of queries per page
+        versions = VersionSerializer.eager_load(Version.objects.all())
+        return queryset.select_related(f'{prefix}created_by').prefetch_related(
+            Prefetch(f'{prefix}versions', queryset=versions))
     
     def get_latest_version(self, obj):
-        latest = obj.versions.order_by('-version_number').first()
-        if latest:
-            return VersionSerializer(latest).data
+        # Versions are ordered newest first, so this reuses the prefetched list
+        versions = obj.versions.all()
+        if versions:
+            return VersionSerializer(versions[0]).data
         return None
     
     def create(self, validated_data):
         # Set the current user as the creator
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class DocumentGrantSerializer(serializers.ModelSerializer):
+    granted_by = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = DocumentGrant
+        fields = ['id', 'subject', 'permission', 'granted_by', 'created_at']
+        read_only_fields = ['granted_by', 'created_at']
+    
+    def validate_subject(self, value):
+        kind, _, name = value.partition(':')
+        if kind == 'user':
+            if not name.isdigit() or not User.objects.filter(pk=name).exists():
+                raise serializers.ValidationError('Unknown user')
+        elif kind == 'role':
+            if name not in dict(UserProfile.ROLE_CHOICES):
+                raise serializers.ValidationError('Unknown role')
+        elif kind != 'dept' or not name:
+            raise serializers.ValidationError('Subject must be "user:<id>", "role:<role>" or "dept:<department>"')
+        else:
+            # Department and role grants only reach users in the document's own department
+            document = self.context.get('document')
+            if document is not None and name != document.department:
+                raise serializers.ValidationError("Documents can't be shared with another department")
+        return value
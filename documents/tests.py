@@ -1,6 +1,21 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.contrib.auth.models import User
-from .models import Document, Version
+from .models import Document, Version, DocumentGrant, document_upload_to, version_upload_to
+from . import acl
+from .scoping import can_view_document_id
+from .signed_urls import sign_file
+from workflows.models import Workflow, WorkflowStep, DocumentWorkflow
+from users.revocation import revocation_index
+from users.serializers import ECMSTokenObtainPairSerializer
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
@@ -112,4 +127,377 @@ class AdminSiteTest(TestCase):
         response = self.client.get(url)
         
         # Should be redirected to login page (302 status code)
-        self.assertEqual(response.status_code, 302)
\ No newline at end of file
+        self.assertEqual(response.status_code, 302)
+
+class DocumentACLTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='acl_owner', password='testpassword')
+        self.other = User.objects.create_user(username='acl_other', password='testpassword')
+        # Same department, so scoping leaves only the ACL to decide
+        for user in (self.owner, self.other):
+            user.profile.department = 'legal'
+            user.profile.save()
+        self.document = Document.objects.create(title='Private', created_by=self.owner)
+        Version.objects.create(document=self.document, version_number=1, created_by=self.owner)
+        Document.objects.create(title='Also private', created_by=self.owner)
+        self.client.force_authenticate(user=self.other)
+        self.detail_url = reverse('document-detail', args=[self.document.pk])
+    
+    def visible_titles(self):
+        response = self.client.get(reverse('document-list'))
+        return {document['title'] for document in response.data['results']}
+    
+    def test_documents_are_private_without_grants(self):
+        """Test that other users can neither list nor fetch an unshared document"""
+        self.assertEqual(self.visible_titles(), set())
+        self.assertEqual(self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('version-list'))
+        self.assertEqual(response.data['results'], [])
+    
+    def test_user_role_and_department_grants(self):
+        """Test that grants to the user, their role or their department all give access"""
+        for subject in (f'user:{self.other.pk}', 'role:viewer', 'dept:legal'):
+            grant = DocumentGrant.objects.create(document=self.document, subject=subject)
+            self.assertEqual(self.visible_titles(), {'Private'})
+            self.assertEqual(len(self.client.get(reverse('version-list')).data['results']), 1)
+            grant.delete()
+    
+    def test_edit_requires_edit_grant(self):
+        """Test that a view grant is read-only and an edit grant allows changes"""
+        grant = DocumentGrant.objects.create(document=self.document, subject=f'user:{self.other.pk}')
+        response = self.client.patch(self.detail_url, {'title': 'Renamed'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        grant.permission = 'edit'
+        grant.save()
+        response = self.client.patch(self.detail_url, {'title': 'Renamed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(self.detail_url).status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_owner_shares_and_revokes(self):
+        """Test that the owner manages grants through the API"""
+        self.client.force_authenticate(user=self.owner)
+        grants_url = reverse('document-grants', args=[self.document.pk])
+        response = self.client.post(grants_url, {'subject': 'dept:legal', 'permission': 'view'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(grants_url, {'subject': 'role:nobody'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.visible_titles(), {'Private'})
+        self.assertEqual(self.client.get(grants_url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(user=self.owner)
+        revoke_url = reverse('document-revoke-grant', args=[self.document.pk, response.data['id']])
+        self.assertEqual(self.client.delete(revoke_url).status_code, status.HTTP_204_NO_CONTENT)
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.visible_titles(), set())
+    
+    def test_roles_and_approvers_see_documents(self):
+        """Test that manager roles and workflow approvers see documents without grants"""
+        workflow = Workflow.objects.create(name='Review', created_by=self.owner)
+        WorkflowStep.objects.create(workflow=workflow, name='Legal', order=1, approver=self.other)
+        DocumentWorkflow.objects.create(document=self.document, workflow=workflow)
+        self.assertEqual(self.visible_titles(), {'Private'})
+        
+        self.other.profile.role = 'manager'
+        self.other.profile.save()
+        self.assertEqual(self.visible_titles(), {'Private', 'Also private'})
+    
+    def test_visibility_is_a_single_query(self):
+        """Test that filtering a listing by ACL needs no per-document checks"""
+        for i in range(5):
+            document = Document.objects.create(title=f'Shared {i}', created_by=self.owner)
+            DocumentGrant.objects.create(document=document, subject='role:viewer')
+        user = User.objects.select_related('profile').get(pk=self.other.pk)
+        with self.assertNumQueries(1):
+            documents = list(acl.visible_documents(Document.objects.all(), user))
+        self.assertEqual(len(documents), 5)
+
+
+class DepartmentScopingTest(APITestCase):
+    def setUp(self):
+        self.users = {}
+        for department in ('legal', 'finance'):
+            user = User.objects.create_user(username=f'{department}_user', password='testpassword')
+            user.profile.department = department
+            user.profile.save()
+            self.users[department] = user
+            document = Document.objects.create(title=f'{department} memo', created_by=user)
+            # Shared with everyone, so only department scoping can hide it
+            DocumentGrant.objects.create(document=document, subject='role:viewer')
+    
+    def titles(self, user, **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('document-list'), params)
+        return {document['title'] for document in response.data['results']}
+    
+    def test_department_copied_from_creator_and_partitions_storage(self):
+        """Test that documents take the creator's department and file partition"""
+        document = Document.objects.get(title='legal memo')
+        self.assertEqual(document.department, 'legal')
+        self.assertEqual(document_upload_to(document, 'memo.pdf'), 'documents/legal/memo.pdf')
+        version = Version(document=document, version_number=1)
+        self.assertEqual(version_upload_to(version, 'memo.pdf'), 'versions/legal/memo.pdf')
+        unassigned = Document(title='Loose')
+        self.assertEqual(document_upload_to(unassigned, 'x.pdf'), 'documents/_shared/x.pdf')
+    
+    def test_users_only_see_their_department(self):
+        """Test that listings are scoped to the user's department"""
+        self.assertEqual(self.titles(self.users['legal']), {'legal memo'})
+        self.assertEqual(self.titles(self.users['finance']), {'finance memo'})
+    
+    def test_unscoped_roles_can_narrow_by_department(self):
+        """Test that admins see every department unless they pick one"""
+        admin = User.objects.create_user(username='dept_admin', password='testpassword')
+        admin.profile.role = 'admin'
+        admin.profile.save()
+        self.assertEqual(self.titles(admin), {'legal memo', 'finance memo'})
+        self.assertEqual(self.titles(admin, department='finance'), {'finance memo'})
+    
+    def test_owners_keep_their_documents_after_moving_department(self):
+        """Test that a user moved to another department still sees the documents they own"""
+        user = self.users['legal']
+        memo = Document.objects.get(title='legal memo')
+        Version.objects.create(document=memo, version_number=1, created_by=user)
+        user.profile.department = 'finance'
+        user.profile.save()
+        self.assertEqual(self.titles(user), {'legal memo', 'finance memo'})
+        response = self.client.get(reverse('version-list'))
+        self.assertEqual([v['version_number'] for v in response.data['results']], [1])
+        self.assertEqual(self.titles(self.users['finance']), {'finance memo'})
+    
+    def test_named_grants_and_approvers_cross_departments(self):
+        """Test that grants by name and workflow participation reach across departments"""
+        legal, finance = self.users['legal'], self.users['finance']
+        memo = Document.objects.get(title='finance memo')
+        DocumentGrant.objects.create(document=memo, subject=f'user:{legal.pk}')
+        self.assertEqual(self.titles(legal), {'legal memo', 'finance memo'})
+        
+        workflow = Workflow.objects.create(name='Cross review', created_by=legal)
+        WorkflowStep.objects.create(workflow=workflow, name='Finance', order=1, approver=finance)
+        self.client.force_authenticate(user=legal)
+        response = self.client.post(reverse('documentworkflow-list'), {
+            'document_id': str(Document.objects.get(title='legal memo').pk),
+            'workflow_id': workflow.pk,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('legal memo', self.titles(finance))
+        self.client.force_authenticate(user=finance)
+        response = self.client.post(reverse('documentworkflow-approve-step', args=[response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'approved')
+    
+    def test_department_grants_stay_in_the_department(self):
+        """Test that a document can't be shared with another department as a whole"""
+        self.client.force_authenticate(user=self.users['legal'])
+        memo = Document.objects.get(title='legal memo')
+        grants_url = reverse('document-grants', args=[memo.pk])
+        response = self.client.post(grants_url, {'subject': 'dept:finance'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(grants_url, {'subject': 'dept:legal'}).status_code,
+                         status.HTTP_201_CREATED)
+    
+    def test_change_stream_visibility_matches_scoping(self):
+        """Test that the change stream applies the department scope like the delta feed"""
+        legal = User.objects.select_related('profile').get(pk=self.users['legal'].pk)
+        request = RequestFactory().get('/')
+        request.user = legal
+        memos = {title: Document.objects.get(title=title).pk for title in ('legal memo', 'finance memo')}
+        self.assertTrue(can_view_document_id(request, memos['legal memo']))
+        self.assertFalse(can_view_document_id(request, memos['finance memo']))
+        DocumentGrant.objects.create(document_id=memos['finance memo'], subject=f'user:{legal.pk}')
+        self.assertTrue(can_view_document_id(request, memos['finance memo']))
+    
+    def test_existing_files_move_into_partitions(self):
+        """Test that files from the flat layout are moved to their department directory"""
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            default_storage.save('documents/old.txt', ContentFile(b'old'))
+            Document.objects.filter(title='legal memo').update(file='documents/old.txt')
+            out = StringIO()
+            call_command('partition_document_storage', stdout=out)
+            
+            document = Document.objects.get(title='legal memo')
+            self.assertEqual(document.file.name, 'documents/legal/old.txt')
+            self.assertTrue(default_storage.exists('documents/legal/old.txt'))
+            self.assertFalse(default_storage.exists('documents/old.txt'))
+            self.assertIn('documents/old.txt -> documents/legal/old.txt', out.getvalue())
+
+
+class AsyncFileTransferTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media_root.name, FILE_STREAM_CHUNK_SIZE=4)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.user = User.objects.create_user(username='transfer', password='testpassword')
+        self.user.profile.department = 'legal'
+        self.user.profile.save()
+        self.document = Document.objects.create(title='Transfer', created_by=self.user,
+                                                file=ContentFile(b'document body', name='body.txt'))
+        self.version = Version.objects.create(document=self.document, version_number=1,
+                                              created_by=self.user,
+                                              file=ContentFile(b'first version', name='v1.txt'))
+        token = ECMSTokenObtainPairSerializer.get_token(self.user).access_token
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.download_url = reverse('document-download', args=[self.document.pk])
+    
+    async def read(self, response):
+        return b''.join([chunk async for chunk in response.streaming_content])
+    
+    async def test_asgi_download_streams_in_chunks(self):
+        """Test that an ASGI download is streamed from an async iterator"""
+        response = await AsyncClient().get(self.download_url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Length'], '13')
+        self.assertEqual(await self.read(response), b'document body')
+        
+        url = reverse('version-download', args=[self.document.pk, self.version.pk])
+        response = await AsyncClient().get(url, headers=self.headers)
+        self.assertEqual(await self.read(response), b'first version')
+    
+    def test_wsgi_download_falls_back_to_file_response(self):
+        """Test that the same view serves a plain FileResponse under WSGI"""
+        response = self.client.get(self.download_url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'document body')
+    
+    async def test_download_requires_access(self):
+        """Test that anonymous and unauthorized users cannot download"""
+        response = await AsyncClient().get(self.download_url)
+        self.assertEqual(response.status_code, 401)
+        
+        other = await User.objects.acreate(username='outsider')
+        token = ECMSTokenObtainPairSerializer.get_token(other).access_token
+        response = await AsyncClient().get(self.download_url,
+                                           headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 404)
+    
+    async def test_download_ignores_query_string_token(self):
+        """Test that only the change stream takes an access token from the query string"""
+        token = self.headers['Authorization'].split()[1]
+        response = await AsyncClient().get(self.download_url, {'token': token})
+        self.assertEqual(response.status_code, 401)
+    
+    async def test_upload_streams_body_into_new_version(self):
+        """Test that a raw PUT body becomes the next version"""
+        url = reverse('document-version-upload', args=[self.document.pk])
+        response = await AsyncClient().put(f'{url}?filename=v2.txt&comment=Second', b'second version',
+                                           content_type='application/octet-stream',
+                                           headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        version = await Version.objects.aget(pk=response.json()['id'])
+        self.assertEqual(version.version_number, 2)
+        self.assertEqual(version.file.name, 'versions/legal/v2.txt')
+        with open(version.file.path, 'rb') as handle:
+            self.assertEqual(handle.read(), b'second version')
+    
+    async def test_upload_renumbers_after_a_concurrent_version(self):
+        """Test that a version number taken concurrently is retried and a failed save leaves no file"""
+        url = reverse('document-version-upload', args=[self.document.pk])
+        # The first attempt sees no versions yet, as if v1 was added concurrently
+        stale = [{'latest': None}, {'latest': 1}]
+        with mock.patch('django.db.models.QuerySet.aggregate', side_effect=stale):
+            response = await AsyncClient().put(f'{url}?filename=v2.txt', b'second version',
+                                               content_type='application/octet-stream', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['version_number'], 2)
+        
+        with mock.patch('django.db.models.QuerySet.aggregate', return_value={'latest': None}):
+            with self.assertRaises(IntegrityError):
+                await AsyncClient().put(f'{url}?filename=v3.txt', b'third version',
+                                        content_type='application/octet-stream', headers=self.headers)
+        self.assertFalse(default_storage.exists('versions/legal/v3.txt'))
+        self.assertEqual(await Version.objects.filter(document=self.document).acount(), 2)
+    
+    def test_create_version_renumbers_after_a_concurrent_version(self):
+        """Test that the multipart create_version action numbers versions the same way"""
+        url = reverse('document-create-version', args=[self.document.pk])
+        stale = [{'latest': None}, {'latest': 1}]
+        with mock.patch('django.db.models.QuerySet.aggregate', side_effect=stale):
+            response = self.client.post(url, {'file': SimpleUploadedFile('v2.txt', b'second')},
+                                        headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['version_number'], 2)
+        
+        with mock.patch('django.db.models.QuerySet.aggregate', return_value={'latest': None}):
+            with self.assertRaises(IntegrityError):
+                self.client.post(url, {'file': SimpleUploadedFile('v3.txt', b'third')},
+                                 headers=self.headers)
+        self.assertFalse(default_storage.exists('versions/legal/v3.txt'))
+
+
+class SignedFileUrlTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media_root.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.user = User.objects.create_user(username='signer', password='testpassword')
+        self.document = Document.objects.create(title='Signed', created_by=self.user,
+                                                file=ContentFile(b'signed body', name='signed.txt'))
+        self.version = Version.objects.create(document=self.document, version_number=1, created_by=self.user,
+                                              file=ContentFile(b'signed version', name='signed-v1.txt'))
+        token = ECMSTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.issue_url = reverse('document-signed-url', args=[self.document.pk])
+    
+    def fetch(self, url):
+        # Signed URLs need no credentials
+        response = self.client_class().get(url)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+    
+    def test_signed_url_serves_file_without_queries(self):
+        """Test that a signed URL serves the file with no authentication or queries"""
+        response = self.client.get(self.issue_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('expires_at', response.data)
+        with self.assertNumQueries(0):
+            response, body = self.fetch(response.data['url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'signed body')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertIn('max-age=', response['Cache-Control'])
+        
+        url = self.client.get(self.issue_url, {'version': self.version.pk, 'disposition': 'attachment'}).data['url']
+        response, body = self.fetch(url)
+        self.assertEqual(body, b'signed version')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+    
+    def test_forged_and_expired_urls_are_rejected(self):
+        """Test that tampered, expired and renamed links don't serve other content"""
+        url = self.client.get(self.issue_url).data['url']
+        self.assertEqual(self.fetch(url.replace('/files/', '/files/x'))[0].status_code, 403)
+        with mock.patch('documents.signed_urls.time.time', return_value=10 ** 10):
+            self.assertEqual(self.fetch(url)[0].status_code, 403)
+        response, body = self.fetch(url.rsplit('/', 1)[0] + '/page.html')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        
+        other = User.objects.create_user(username='stranger', password='testpassword')
+        token = ECMSTokenObtainPairSerializer.get_token(other).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get(self.issue_url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_missing_derivative_and_bad_parameters(self):
+        """Test that unknown files and parameters are refused when issuing"""
+        self.assertEqual(self.client.get(self.issue_url, {'derivative': 'thumbnail'}).status_code, 404)
+        self.assertEqual(self.client.get(self.issue_url, {'derivative': 'poster'}).status_code, 400)
+        self.assertEqual(self.client.get(self.issue_url, {'version': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.issue_url, {'version': 999}).status_code, 404)
+    
+    async def test_signed_url_streams_under_asgi(self):
+        """Test that the signed file view streams under ASGI too"""
+        path, _ = sign_file(self.version.file)
+        response = await AsyncClient().get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'signed version')
@@ -1,13 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import DocumentViewSet, VersionViewSet
+from . import async_views
 
 router = DefaultRouter()
-router.register(r'', DocumentViewSet)
+# Prefixed routes go first so the '' detail route does not shadow them
 router.register(r'versions', VersionViewSet)
+router.register(r'', DocumentViewSet)
 
 urlpatterns = [
+    # Native async file transfer, ahead of the router so it takes these paths
+    path('<uuid:pk>/download/', async_views.download_document, name='document-download'),
+    path('<uuid:pk>/versions/<int:version_id>/download/', async_views.download_version,
+         name='version-download'),
+    path('<uuid:pk>/versions/upload/', async_views.upload_version, name='document-version-upload'),
+    path('files/<str:token>/<str:filename>', async_views.signed_file, name='signed-file'),
     path('', include(router.urls)),
-    # Add explicit path for download action
-    path('<str:pk>/download/', DocumentViewSet.as_view({'get': 'download'})),
 ]
\ No newline at end of file
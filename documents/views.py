@@ -1,96 +1,134 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from datetime import datetime, timezone
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from .models import Document, Version
-from .serializers import DocumentSerializer, VersionSerializer
+from .serializers import DocumentSerializer, VersionSerializer, DocumentGrantSerializer
+from . import acl
+from .scoping import DepartmentScopedMixin
+from .signed_urls import sign_file
+from ecms_project.throttling import identify
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
-import os
-class IsOwnerOrReadOnly(permissions.BasePermission):
+
+
+class DocumentAccessPermission(permissions.BasePermission):
+    # Reads are already limited by the ACL queryset filter; changes need an
+    # edit grant, and deleting or sharing is left to the owner
     def has_object_permission(self, request, view, obj):
+        if view.action in ('destroy', 'grants', 'revoke_grant'):
+            return acl.can_manage(request.user, obj)
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.created_by == request.user
+        return acl.has_document_permission(request.user, obj, 'edit')
 
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(DepartmentScopedMixin, viewsets.ModelViewSet):
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
-    permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    permission_classes = [permissions.IsAuthenticated, DocumentAccessPermission]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['created_by']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'updated_at', 'title']
+    # Scopes of ecms_project.throttling.TokenBucketThrottle
+    throttle_scopes = {
+        'search': 'search',
+        'create': 'upload',
+        'update': 'upload',
+        'partial_update': 'upload',
+        'create_version': 'upload',
+        'signed_url': 'download',
+    }
     
-    @action(detail=True, methods=['get'])
-    def download(self, request, pk=None):
-        try:
-            document = self.get_object()
-            file_path = document.file.path
-            
-            # Check if file exists
-            if not os.path.exists(file_path):
-                return Response(
-                    {"error": f"File not found at {file_path}"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Try to open the file
-            try:
-                file = open(file_path, 'rb')
-            except PermissionError:
-                return Response(
-                    {"error": "Permission denied when accessing file"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            except Exception as e:
-                return Response(
-                    {"error": f"Error opening file: {str(e)}"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-            
-            # Create response with proper filename handling for Windows
-            response = FileResponse(file)
-            filename = os.path.basename(document.file.name)
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
-        except Exception as e:
-            # Log the error for debugging
-            print(f"Download error: {str(e)}")
-            return Response(
-                {"error": "An unexpected error occurred while downloading the file"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    def get_queryset(self):
+        queryset = acl.visible_documents(super().get_queryset(), self.request.user)
+        # Only actions that return documents need their nested rows
+        if self.action in ('list', 'retrieve', 'update', 'partial_update'):
+            queryset = DocumentSerializer.eager_load(queryset)
+        return queryset
+    
+    @action(detail=True, methods=['get', 'post'])
+    def grants(self, request, pk=None):
+        document = self.get_object()
+        if request.method == 'GET':
+            grants = document.grants.select_related('granted_by')
+            return Response(DocumentGrantSerializer(grants, many=True).data)
+        
+        serializer = DocumentGrantSerializer(data=request.data, context={'document': document})
+        serializer.is_valid(raise_exception=True)
+        grant, created = document.grants.update_or_create(
+            subject=serializer.validated_data['subject'],
+            defaults={'permission': serializer.validated_data.get('permission', 'view'),
+                      'granted_by': request.user},
+        )
+        return Response(DocumentGrantSerializer(grant).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['delete'], url_path=r'grants/(?P<grant_id>\d+)')
+    def revoke_grant(self, request, pk=None, grant_id=None):
+        document = self.get_object()
+        get_object_or_404(document.grants, pk=grant_id).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=True, methods=['post'])
     def create_version(self, request, pk=None):
         document = self.get_object()
         
-        # Get the latest version number and increment
-        latest_version = document.versions.order_by('-version_number').first()
-        version_number = 1 if not latest_version else latest_version.version_number + 1
-        
         serializer = VersionSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(
-                document=document,
-                version_number=version_number,
-                created_by=request.user
-            )
+            # Numbered by Version.save_next, like streamed uploads
+            serializer.save(document=document, created_by=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
         document = self.get_object()
-        versions = document.versions.all()
+        versions = VersionSerializer.eager_load(document.versions.all())
         serializer = VersionSerializer(versions, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='signed-url')
+    def signed_url(self, request, pk=None):
+        """Issue a short-lived URL for the document file, ``?version=<id>`` or ``?derivative=thumbnail``.
 
-class VersionViewSet(viewsets.ReadOnlyModelViewSet):
+        ``?disposition=attachment`` makes the browser save the file instead of showing it.
+        """
+        document = self.get_object()
+        version_id = request.query_params.get('version')
+        derivative = request.query_params.get('derivative')
+        if version_id is not None:
+            if not version_id.isdigit():
+                return Response({'version': 'A version id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+            field_file = get_object_or_404(document.versions, pk=version_id).file
+        elif derivative is not None:
+            if derivative != 'thumbnail':
+                return Response({'derivative': 'Unknown derivative.'}, status=status.HTTP_400_BAD_REQUEST)
+            field_file = document.thumbnail
+        else:
+            field_file = document.file
+        if not field_file:
+            raise Http404('No such file')
+        
+        path, expires = sign_file(field_file, attachment=request.query_params.get('disposition') == 'attachment',
+                                  throttle_as=identify(request))
+        return Response({
+            'url': request.build_absolute_uri(path),
+            'expires_at': datetime.fromtimestamp(expires, tz=timezone.utc),
+        })
+
+class VersionViewSet(DepartmentScopedMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Version.objects.all()
+    department_field = 'document__department'
+    document_field = 'document_id'
+    owner_field = 'document__created_by_id'
     serializer_class = VersionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['document', 'created_by']
+    
+    def get_queryset(self):
+        queryset = acl.visible_versions(super().get_queryset(), self.request.user)
+        return VersionSerializer.eager_load(queryset)
@@ -3,6 +3,11 @@ ASGI config for ecms_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived endpoints such as the change stream (/api/changes/stream/) are
+only served through this entry point, e.g. ``uvicorn ecms_project.asgi:application``.
+Document and version downloads and uploads (documents/async_views.py) are
+native async views here, so slow clients do not hold worker threads.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
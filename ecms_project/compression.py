@@ -0,0 +1,267 @@
+"""Response compression for API responses and file downloads.
+
+Unlike django.middleware.gzip, streamed bodies (FileResponse and the async
+download views) are compressed chunk by chunk and flushed after every chunk,
+so nothing is buffered and the first bytes leave as soon as the first chunk
+is read. The encoding is negotiated from Accept-Encoding in the order of
+RESPONSE_COMPRESSION['ENCODINGS']; zstd and brotli are only offered when the
+zstandard and brotli packages are installed.
+
+Bodies that are already compressed (images, archives, office files, ...) and
+small bodies are passed through. A FileResponse for a derivative the
+server generated itself (PRECOMPRESSED_PREFIXES of MEDIA_ROOT) is answered
+with a fresh ``.zst``, ``.br`` or ``.gz`` variant stored by the
+precompress_media command under PRECOMPRESSED_ROOT. Variants are never
+looked up next to the file: anyone who can upload could place one there.
+"""
+import os
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Server preference; the client's q-values decide among what it accepts
+    'ENCODINGS': ('zstd', 'br', 'gzip'),
+    'LEVELS': {'zstd': 3, 'br': 4, 'gzip': 6},
+    # Bodies (or Content-Length of streams) below this are sent as they are
+    'MIN_SIZE': 1024,
+    'PRECOMPRESSED': True,
+    # Kept apart from MEDIA_ROOT, so uploads can't add variants
+    'PRECOMPRESSED_ROOT': os.path.join(settings.BASE_DIR, 'precompressed'),
+    # Media names with stored variants: generated derivatives, never uploads
+    'PRECOMPRESSED_PREFIXES': ('thumbnails/',),
+    # Content types not worth compressing again; entries ending in '/' are prefixes
+    'SKIP_TYPES': (
+        'image/', 'audio/', 'video/', 'font/woff', 'font/woff2',
+        'application/zip', 'application/gzip', 'application/x-gzip', 'application/x-bzip2',
+        'application/x-xz', 'application/zstd', 'application/x-7z-compressed',
+        'application/x-rar-compressed', 'application/vnd.rar', 'application/pdf',
+        'application/epub+zip', 'application/java-archive', 'application/msgpack',
+        'application/vnd.openxmlformats-officedocument.', 'application/vnd.oasis.opendocument.',
+    ),
+    # Exceptions to the prefixes above
+    'COMPRESS_TYPES': ('image/svg+xml', 'image/bmp', 'image/x-icon'),
+}
+
+EXTENSIONS = {'zstd': '.zst', 'br': '.br', 'gzip': '.gz'}
+
+
+def compression_setting(name):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def available_encodings():
+    installed = {'zstd': zstandard is not None, 'br': brotli is not None, 'gzip': True}
+    return [encoding for encoding in compression_setting('ENCODINGS') if installed.get(encoding)]
+
+
+def parse_accept_encoding(header):
+    """Map of coding -> q-value from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, encodings):
+    """The encoding to use among ``encodings`` (in preference order), or None."""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get('x-gzip') if encoding == 'gzip' else None)
+        if q is None:
+            q = accepted.get('*', 0.0)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    if not media_type or media_type in compression_setting('COMPRESS_TYPES'):
+        return bool(media_type)
+    for skipped in compression_setting('SKIP_TYPES'):
+        if media_type == skipped or (skipped.endswith(('/', '.')) and media_type.startswith(skipped)):
+            return False
+    return True
+
+
+class StreamCompressor:
+    """Incremental compressor; every ``compress`` returns a decodable prefix of the stream."""
+
+    def __init__(self, encoding, level=None):
+        level = level or compression_setting('LEVELS').get(encoding)
+        self.encoding = encoding
+        if encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level or 3).compressobj()
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level or 4)
+        else:
+            self._compressor = zlib.compressobj(level or 6, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == 'zstd':
+            return (self._compressor.compress(chunk)
+                    + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'zstd':
+            return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+def precompressible_name(path):
+    """The media name of the file at ``path`` if it may have stored variants, else None."""
+    name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    if not name.startswith(tuple(compression_setting('PRECOMPRESSED_PREFIXES'))):
+        return None
+    return name
+
+
+def variant_path(name, encoding):
+    return os.path.join(compression_setting('PRECOMPRESSED_ROOT'), *name.split('/')) + EXTENSIONS[encoding]
+
+
+def precompressed_variant(response, encodings):
+    """A stored ``(encoding, path)`` for the file a FileResponse streams, if one is up to date."""
+    path = getattr(response.file_to_stream, 'name', None)
+    if not isinstance(path, str) or not os.path.isabs(path):
+        return None
+    name = precompressible_name(path)
+    if name is None:
+        return None
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return None
+    for encoding in encodings:
+        variant = variant_path(name, encoding)
+        try:
+            if os.path.getmtime(variant) >= modified:
+                return encoding, variant
+        except OSError:
+            continue
+    return None
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = compression_setting('ENABLED')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response) if self.enabled else response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response) if self.enabled else response
+
+    def process_response(self, request, response):
+        if (response.has_header('Content-Encoding') or response.status_code in (204, 206, 304)
+                or 'no-transform' in response.get('Cache-Control', '')
+                or not is_compressible(response.get('Content-Type', ''))):
+            return response
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and length.isdigit() and int(length) < compression_setting('MIN_SIZE'):
+                return response
+        elif len(response.content) < compression_setting('MIN_SIZE'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        encodings = available_encodings()
+
+        if isinstance(response, FileResponse) and compression_setting('PRECOMPRESSED'):
+            accepted = parse_accept_encoding(header)
+            variant = precompressed_variant(response, [encoding for encoding in encodings
+                                                       if accepted.get(encoding, 0) > 0])
+            if variant is not None:
+                encoding, path = variant
+                response.file_to_stream.close()
+                response.streaming_content = open(path, 'rb')
+                response.headers['Content-Length'] = str(os.path.getsize(path))
+                return self.mark_encoded(response, encoding)
+
+        encoding = negotiate(header, encodings)
+        if encoding is None:
+            return response
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            # The compressed size is only known once the stream has been sent
+            del response.headers['Content-Length']
+        else:
+            compressor = StreamCompressor(encoding)
+            compressed = compressor.compress(response.content) + compressor.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+        return self.mark_encoded(response, encoding)
+
+    def mark_encoded(self, response, encoding):
+        # A strong ETag names the identity body; keep it usable for conditional requests
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,82 @@
+"""Read/write routing between the primary SQLite connection and a read-only one."""
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_only = contextvars.ContextVar('ecms_read_only', default=False)
+
+
+def read_alias():
+    alias = getattr(settings, 'DATABASE_READ_ALIAS', None)
+    if alias is None or alias not in settings.DATABASES:
+        return None
+    # Under the test runner the alias mirrors the default test database, where
+    # a second connection could not see a test's uncommitted rows
+    if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    return alias
+
+
+@contextmanager
+def read_only(enabled=True):
+    """Send ORM reads in this block to the read-only connection (or not)."""
+    token = _read_only.set(enabled)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def use_primary():
+    # For reads in a safe request that must see this request's own writes
+    return read_only(False)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _read_only.get():
+            return None
+        # Reads inside a transaction must see the transaction's own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases open the same database file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == getattr(settings, 'DATABASE_READ_ALIAS', None):
+            return False
+        return None
+
+
+class ReadOnlyRoutingMiddleware:
+    """Route the ORM reads of safe (GET/HEAD/OPTIONS) requests to the read-only alias."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with read_only(request.method in SAFE_METHODS):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with read_only(request.method in SAFE_METHODS):
+            return await self.get_response(request)
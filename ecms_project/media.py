@@ -0,0 +1,107 @@
+"""Content-hashed media URLs.
+
+HashedMediaStorage.url() puts a digest of the file's content in the URL
+(``/media/<digest>/<name>``), so a URL never refers to two different
+contents and browsers may cache it for good. The digest is keyed with
+SECRET_KEY, so URLs can't be derived from a file name alone. Digests are
+cached against the file's size and modification time and primed on save.
+
+serve_media answers these URLs without authentication, so only files under
+MEDIA_CACHE['PUBLIC_PREFIXES'] (thumbnails and profile pictures) get them.
+Document and version files keep plain URLs and are only served through the
+access-checked download views and signed URLs. A digest that doesn't match
+the current content, such as one from before the file changed, is a 404.
+With MEDIA_CACHE['ACCEL_REDIRECT'] set, the body is left to the proxy
+(nginx X-Accel-Redirect to an internal location mapped to MEDIA_ROOT).
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.encoding import filepath_to_uri
+from django.views.decorators.http import require_safe
+
+
+DEFAULTS = {
+    'CACHE_CONTROL': 'private, max-age=31536000, immutable',
+    # Internal proxy location mapped to MEDIA_ROOT, e.g. '/_protected_media/'
+    'ACCEL_REDIRECT': None,
+    'DIGEST_LENGTH': 20,
+    'DIGEST_CACHE_TTL': 7 * 24 * 3600,
+    # Storage name prefixes that anyone holding the URL may read
+    'PUBLIC_PREFIXES': ('thumbnails/', 'profile_pics/'),
+}
+
+
+def media_setting(name):
+    return getattr(settings, 'MEDIA_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def is_public(name):
+    # Normalized names only, so '..' segments can't lead out of a public prefix
+    return posixpath.normpath(name) == name and name.startswith(tuple(media_setting('PUBLIC_PREFIXES')))
+
+
+class HashedMediaStorage(FileSystemStorage):
+    def digest(self, name):
+        """Keyed digest of the file's content, or None if it doesn't exist."""
+        try:
+            stat = os.stat(self.path(name))
+        except (OSError, SuspiciousFileOperation):
+            return None
+        key = ('media-digest:' + hashlib.md5(name.encode()).hexdigest()
+               + f':{stat.st_mtime_ns}:{stat.st_size}')
+        digest = cache.get(key)
+        if digest is None:
+            with open(self.path(name), 'rb') as handle:
+                content_hash = hashlib.file_digest(handle, 'sha256').hexdigest()
+            digest = salted_hmac('ecms.media', f'{name}:{content_hash}',
+                                 algorithm='sha256').hexdigest()[:media_setting('DIGEST_LENGTH')]
+            cache.set(key, digest, media_setting('DIGEST_CACHE_TTL'))
+        return digest
+
+    def url(self, name):
+        digest = self.digest(name) if name and is_public(name) else None
+        if digest is None:
+            return super().url(name)
+        return f'{self.base_url}{digest}/{filepath_to_uri(name)}'
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        if is_public(name):
+            # Hash while the file is likely still in the page cache
+            self.digest(name)
+        return name
+
+
+def immutable_headers(response, digest):
+    response['Cache-Control'] = media_setting('CACHE_CONTROL')
+    response['ETag'] = f'"{digest}"'
+    return response
+
+
+@require_safe
+def serve_media(request, digest, name):
+    if not isinstance(default_storage, HashedMediaStorage) or not is_public(name):
+        raise Http404
+    current = default_storage.digest(name)
+    if current is None or not constant_time_compare(digest, current):
+        # Never point to the current URL: that would make the digest guessable
+        raise Http404('File not found')
+
+    if request.META.get('HTTP_IF_NONE_MATCH', '') in (f'"{digest}"', f'W/"{digest}"'):
+        return immutable_headers(HttpResponseNotModified(), digest)
+    accel = media_setting('ACCEL_REDIRECT')
+    if accel:
+        response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = accel.rstrip('/') + '/' + filepath_to_uri(name)
+    else:
+        response = FileResponse(open(default_storage.path(name), 'rb'))
+    return immutable_headers(response, digest)
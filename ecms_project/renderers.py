@@ -0,0 +1,70 @@
+"""Faster API renderers.
+
+ORJSONRenderer encodes with orjson when it is installed and falls back to
+DRF's JSONRenderer otherwise. MessagePackRenderer answers clients that ask
+for ``application/msgpack`` and needs the msgpack package; settings only
+list it when that package is installed.
+
+Values neither library handles natively (datetimes, Decimals, lazy strings,
+files) go through DRF's JSON encoder, so both formats carry the same values
+as the stdlib JSON responses. Payloads with integers beyond 64 bits are
+rendered by DRF itself. One difference remains: NaN and infinities come out
+as null, where DRF's strict JSON raises; finding them would mean walking
+every payload in Python and give up most of the speedup.
+"""
+from django.db.models.fields.files import FieldFile
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_drf_default = JSONEncoder().default
+
+
+def encode_default(obj):
+    """Encode what the fast encoders can't, the way DRF's JSON encoder does."""
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    return _drf_default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson; same media type and output, except for NaN and infinities."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # Datetimes go through encode_default so they match DRF's format (milliseconds, 'Z')
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=option)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits, among others
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, keep the output safe to embed in JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
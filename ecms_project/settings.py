@@ -3,6 +3,7 @@ Django settings for ecms_project project.
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 
@@ -35,11 +36,17 @@ INSTALLED_APPS = [
     'documents',
     'workflows',
     'users',
+    'changes',
+    'ops',
     'django_filters', 
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Outside compression, so response sizes are the bytes actually sent
+    'ops.middleware.RequestMetricsMiddleware',
+    'ecms_project.compression.CompressionMiddleware',
+    'ecms_project.db_router.ReadOnlyRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
     'django.middleware.common.CommonMiddleware',
@@ -47,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ops.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'ecms_project.urls'
@@ -70,11 +78,97 @@ TEMPLATES = [
 WSGI_APPLICATION = 'ecms_project.wsgi.application'
 
 # Database
+SQLITE_PATH = os.environ.get('ECMS_SQLITE_PATH', str(BASE_DIR / 'db.sqlite3'))
+
+# Applied on every new connection. WAL lets readers run alongside the single
+# writer, busy_timeout makes writers wait for the lock instead of failing with
+# "database is locked", and synchronous=NORMAL is durable in WAL mode except
+# for the last transactions on power loss.
+SQLITE_PRAGMAS = [
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-32000',
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': SQLITE_PATH,
+        # Reuse connections across requests instead of reopening the file each time
+        'CONN_MAX_AGE': int(os.environ.get('ECMS_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(['PRAGMA journal_mode=WAL'] + SQLITE_PRAGMAS),
+            # Take the write lock when the transaction starts: a deferred
+            # transaction that reads and then writes cannot wait for the lock
+            # and fails at once when another writer holds it
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Same file opened read-only; safe requests read here so they never queue
+    # behind a write transaction on the primary connection (see ecms_project/db_router.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{SQLITE_PATH}?mode=ro',
+        'CONN_MAX_AGE': int(os.environ.get('ECMS_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS + ['PRAGMA query_only=ON']),
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['ecms_project.db_router.ReadReplicaRouter']
+DATABASE_READ_ALIAS = 'replica'
+
+# Request timings: Server-Timing headers and Prometheus histograms at /api/_metrics
+# (see ops/metrics.py). Without a token only local addresses may scrape.
+OPS_METRICS = {
+    'ENABLED': os.environ.get('ECMS_METRICS', '1') == '1',
+    'SERVER_TIMING': True,
+    'TOKEN': os.environ.get('ECMS_METRICS_TOKEN'),
+    'METRICS_IPS': ('127.0.0.1', '::1'),
+}
+
+# On-demand profiles: staff send "X-Profile: cprofile" or "X-Profile: sampling";
+# SAMPLE_RATE profiles a share of all requests. Listed in the admin (see ops/profiling.py).
+OPS_PROFILING = {
+    'ENABLED': os.environ.get('ECMS_PROFILING', '1') == '1',
+    'HEADER': 'X-Profile',
+    'SAMPLE_RATE': float(os.environ.get('ECMS_PROFILE_SAMPLE_RATE', '0')),
+    'SAMPLE_MODE': 'sampling',
+    'ROOT': os.environ.get('ECMS_PROFILE_ROOT', str(BASE_DIR / 'profiles')),
+    'MAX_PROFILES': 200,
+}
+
+# Statements slower than THRESHOLD_MS, grouped by fingerprint with their query plans and
+# ranked by total time in the admin (see ops/slow_queries.py)
+OPS_SLOW_QUERIES = {
+    'ENABLED': os.environ.get('ECMS_SLOW_QUERIES', '1') == '1',
+    'THRESHOLD_MS': float(os.environ.get('ECMS_SLOW_QUERY_MS', '100')),
+    'EXPLAIN': True,
+}
+
+# zstd/brotli/gzip for API responses and downloads, streamed chunk by chunk; already
+# compressed types and small bodies are skipped (see ecms_project/compression.py)
+RESPONSE_COMPRESSION = {
+    'ENABLED': os.environ.get('ECMS_COMPRESSION', '1') == '1',
+    'MIN_SIZE': 1024,
+    # Variants stored by precompress_media; outside MEDIA_ROOT so uploads can't add any
+    'PRECOMPRESSED_ROOT': os.environ.get('ECMS_PRECOMPRESSED_ROOT', str(BASE_DIR / 'precompressed')),
+}
+
+# Online snapshots of the database and media (see ops/backup.py)
+OPS_BACKUP = {
+    'ROOT': os.environ.get('ECMS_BACKUP_ROOT', str(BASE_DIR / 'backups')),
+    'PAGES_PER_STEP': 1024,
+    'STEP_SLEEP': 0.005,
+    'KEEP': 7,
 }
 
 # Password validation
@@ -109,14 +203,47 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media URLs carry a digest of the file's content (/media/<digest>/<name>) and are served
+# with an immutable Cache-Control in every environment (see ecms_project/media.py)
+STORAGES = {
+    'default': {'BACKEND': 'ecms_project.media.HashedMediaStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_CACHE = {
+    'CACHE_CONTROL': 'private, max-age=31536000, immutable',
+    # Behind nginx: an internal location aliased to MEDIA_ROOT, e.g. '/_protected_media/'
+    'ACCEL_REDIRECT': os.environ.get('ECMS_MEDIA_ACCEL_REDIRECT'),
+    # Only these get hashed URLs, served without authentication; document files
+    # go through the download views and signed URLs
+    'PUBLIC_PREFIXES': ('thumbnails/', 'profile_pics/'),
+}
+
 # REST Framework settings
+# orjson-backed JSON (plain DRF JSON without orjson); MessagePack for "Accept: application/msgpack"
+# when msgpack is installed (see ecms_project/renderers.py)
+API_RENDERER_CLASSES = ['ecms_project.renderers.ORJSONRenderer']
+API_PARSER_CLASSES = ['ecms_project.parsers.ORJSONParser']
+if find_spec('msgpack'):
+    API_RENDERER_CLASSES.append('ecms_project.renderers.MessagePackRenderer')
+    API_PARSER_CLASSES.append('ecms_project.parsers.MessagePackParser')
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': API_RENDERER_CLASSES + [
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': API_PARSER_CLASSES + [
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'ecms_project.throttling.TokenBucketThrottle',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
@@ -148,7 +275,84 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ECMSTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.ECMSTokenRefreshSerializer',
 }
 
+# Authentication principals (see users/authentication.py)
+USERS_AUTH = {
+    'PRINCIPAL_CACHE_TTL': 300,
+    # Serve read requests from the role claims inside access tokens, with no cache lookup
+    'TRUST_TOKEN_CLAIMS': os.environ.get('ECMS_TRUST_TOKEN_CLAIMS', '') == '1',
+    # Token revocation (see users/revocation.py)
+    'REVOCATION_REFRESH_SECONDS': 2,
+    'REVOCATION_BLOOM_CAPACITY': 100000,
+    'REVOCATION_BLOOM_ERROR_RATE': 0.001,
+}
+
+# Cache: per-process memory by default; set ECMS_REDIS_URL so all workers share one cache
+if os.environ.get('ECMS_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['ECMS_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only, restrict in production
+
+# Workflow analytics: in-progress workflows idle on one step longer than this are reported as stuck
+WORKFLOW_STUCK_AFTER = timedelta(days=3)
+
+# Lifetime in seconds of the signed file URLs issued by /api/documents/<id>/signed-url/
+SIGNED_FILE_URL_TTL = 300
+
+# Token-bucket rate limits per scope and UserProfile.role (see ecms_project/throttling.py).
+# Buckets live in the default cache, so they are only shared between workers with Redis.
+API_THROTTLES = {
+    'ENABLED': os.environ.get('ECMS_THROTTLES', '1') == '1',
+    'RATES': {
+        'upload': {'*': '30/min', 'admin': '120/min'},
+        'search': {'*': '60/min', 'admin': None},
+        'analytics': {'*': '10/min', 'manager': '30/min', 'admin': None},
+        'download': {'*': '120/min', 'admin': None},
+        'download_bytes': {'*': '20MB/s', 'admin': None},
+    },
+}
+
+# Change stream (Server-Sent Events): seconds between keepalive comments on idle connections
+CHANGE_STREAM_HEARTBEAT = 20
+
+# Workflow step SLAs (see workflows/sla.py for the defaults)
+WORKFLOW_SLA = {
+    'REMINDER_INTERVAL': timedelta(hours=24),
+    'ESCALATE_AFTER_REMINDERS': 2,
+    'BATCH_SIZE': 500,
+    'MAX_SLEEP_SECONDS': 60,
+}
+
+# Document access: roles that may read or edit every document without a grant
+# (see documents/acl.py)
+DOCUMENT_ACL = {
+    'ROLE_PERMISSIONS': {'admin': 'edit', 'manager': 'view'},
+}
+
+# Email: the console backend prints digests locally; use the SMTP backend in production
+EMAIL_BACKEND = os.environ.get('ECMS_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+DEFAULT_FROM_EMAIL = os.environ.get('ECMS_FROM_EMAIL', 'ecms@localhost')
+
+# Workflow notification digests (see workflows/notifications.py for the defaults)
+NOTIFICATION_DIGEST = {
+    'WINDOW': timedelta(minutes=10),
+    'MAX_EVENTS_PER_DIGEST': 50,
+    'MAX_DIGESTS_PER_RUN': 200,
+    'MAX_MESSAGES_PER_SECOND': 5,
+}
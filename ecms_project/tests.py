@@ -0,0 +1,549 @@
+import datetime
+import gzip
+import os
+import tempfile
+import uuid
+import zlib
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from documents.models import Document, DocumentGrant
+from documents.views import DocumentViewSet, VersionViewSet
+from ops.benchmark import token_client
+from users.revocation import revocation_index
+from users.views import UserViewSet
+from workflows.models import DocumentWorkflow, Workflow
+from workflows.views import DocumentWorkflowViewSet, WorkflowStepViewSet, WorkflowViewSet
+from . import compression, db_router, renderers, throttling
+from .media import HashedMediaStorage
+from .db_router import ReadOnlyRoutingMiddleware, ReadReplicaRouter, read_only
+
+
+class SQLiteProfileTest(TestCase):
+    def test_pragmas_applied_to_connections(self):
+        """Test that every connection gets the busy timeout and sync pragmas"""
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+            # 1 is NORMAL
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class ReadReplicaRoutingTest(SimpleTestCase):
+    def test_middleware_marks_safe_requests_read_only(self):
+        """Test that only GET/HEAD/OPTIONS requests read from the replica"""
+        seen = []
+        
+        def view(request):
+            seen.append(db_router._read_only.get())
+            return HttpResponse()
+        
+        middleware = ReadOnlyRoutingMiddleware(view)
+        middleware(RequestFactory().get('/'))
+        middleware(RequestFactory().post('/'))
+        self.assertEqual(seen, [True, False])
+        self.assertFalse(db_router._read_only.get())
+    
+    def test_router_sends_reads_to_replica_outside_transactions(self):
+        """Test that reads go to the replica except inside a transaction"""
+        router = ReadReplicaRouter()
+        with mock.patch.object(db_router, 'read_alias', return_value='replica'):
+            self.assertIsNone(router.db_for_read(None))
+            with read_only():
+                self.assertEqual(router.db_for_read(None), 'replica')
+                self.assertEqual(router.db_for_write(None), 'default')
+                with mock.patch.object(connection, 'in_atomic_block', True):
+                    self.assertIsNone(router.db_for_read(None))
+    
+    def test_test_mirror_is_not_used(self):
+        """Test that the replica alias is skipped when it mirrors the test database"""
+        with read_only():
+            self.assertIsNone(ReadReplicaRouter().db_for_read(None))
+
+
+VIEWSETS = (DocumentViewSet, VersionViewSet, WorkflowViewSet, WorkflowStepViewSet,
+            DocumentWorkflowViewSet, UserViewSet)
+
+# Queries per request, whatever the page or the nested relations hold.
+# Raise a budget only together with the change that needs it.
+QUERY_BUDGETS = {
+    'DocumentViewSet.list': 3,
+    'DocumentViewSet.retrieve': 2,
+    'DocumentViewSet.grants': 2,
+    'DocumentViewSet.revoke_grant': 5,
+    'DocumentViewSet.create_version': 8,
+    'DocumentViewSet.versions': 2,
+    'DocumentViewSet.signed_url': 2,
+    'VersionViewSet.list': 2,
+    'VersionViewSet.retrieve': 1,
+    'WorkflowViewSet.list': 3,
+    'WorkflowViewSet.retrieve': 2,
+    'WorkflowViewSet.add_step': 5,
+    'WorkflowViewSet.analytics': 4,
+    'WorkflowStepViewSet.list': 2,
+    'WorkflowStepViewSet.retrieve': 1,
+    'DocumentWorkflowViewSet.list': 5,
+    'DocumentWorkflowViewSet.retrieve': 4,
+    'DocumentWorkflowViewSet.approve_step': 16,
+    'DocumentWorkflowViewSet.reject': 17,
+    'UserViewSet.list': 2,
+    'UserViewSet.retrieve': 1,
+    'UserViewSet.me': 0,
+    'UserViewSet.autocomplete': 1,
+    'UserViewSet.update_profile': 7,
+}
+
+# Small pages and single nested rows against full pages and long chains
+SIZES = (
+    {'documents': 3, 'versions': 1, 'steps': 2, 'in_flight': 3},
+    {'documents': 15, 'versions': 4, 'steps': 4, 'in_flight': 12},
+)
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media_root.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.admin = User.objects.create_user(username='budget', password='testpassword')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+    
+    def seed(self, size):
+        # One department and workflow: approve_step and reject then take the
+        # same analytics upsert paths at both sizes
+        call_command('seed_dataset', users=12, departments=1, workflows=1, file_size=16, clear=True,
+                     stdout=StringIO(), **size)
+    
+    def requests(self):
+        """(client, method, url, data) per budgeted action, against the current data."""
+        admin = token_client(self.admin)
+        document = Document.objects.filter(versions__isnull=False).first()
+        version = document.versions.first()
+        grant = DocumentGrant.objects.create(document=document, subject='dept:budget')
+        workflow = Workflow.objects.first()
+        approving, rejecting = DocumentWorkflow.objects.filter(status='in_progress')[:2]
+        approver = token_client(approving.current_step.approver)
+        rejecter = token_client(rejecting.current_step.approver)
+        user = User.objects.exclude(pk=self.admin.pk).first()
+        
+        def document_url(name):
+            return reverse(name, args=[document.pk])
+        
+        return {
+            'DocumentViewSet.list': (admin, 'get', reverse('document-list'), None),
+            'DocumentViewSet.retrieve': (admin, 'get', document_url('document-detail'), None),
+            'DocumentViewSet.grants': (admin, 'get', document_url('document-grants'), None),
+            'DocumentViewSet.revoke_grant': (
+                admin, 'delete', reverse('document-revoke-grant', args=[document.pk, grant.pk]), None),
+            'DocumentViewSet.create_version': (
+                admin, 'post', document_url('document-create-version'),
+                {'file': SimpleUploadedFile('budget.txt', b'budget')}),
+            'DocumentViewSet.versions': (admin, 'get', document_url('document-versions'), None),
+            'DocumentViewSet.signed_url': (admin, 'get', document_url('document-signed-url'),
+                                           {'version': version.pk}),
+            'VersionViewSet.list': (admin, 'get', reverse('version-list'), None),
+            'VersionViewSet.retrieve': (admin, 'get', reverse('version-detail', args=[version.pk]), None),
+            'WorkflowViewSet.list': (admin, 'get', reverse('workflow-list'), None),
+            'WorkflowViewSet.retrieve': (admin, 'get', reverse('workflow-detail', args=[workflow.pk]), None),
+            'WorkflowViewSet.add_step': (
+                admin, 'post', reverse('workflow-add-step', args=[workflow.pk]),
+                {'name': 'Budget', 'order': 99, 'approver_id': self.admin.pk}),
+            'WorkflowViewSet.analytics': (admin, 'get', reverse('workflow-analytics'), None),
+            'WorkflowStepViewSet.list': (admin, 'get', reverse('workflowstep-list'), None),
+            'WorkflowStepViewSet.retrieve': (
+                admin, 'get', reverse('workflowstep-detail', args=[workflow.steps.first().pk]), None),
+            'DocumentWorkflowViewSet.list': (admin, 'get', reverse('documentworkflow-list'), None),
+            'DocumentWorkflowViewSet.retrieve': (
+                admin, 'get', reverse('documentworkflow-detail', args=[approving.pk]), None),
+            'DocumentWorkflowViewSet.approve_step': (
+                approver, 'post', reverse('documentworkflow-approve-step', args=[approving.pk]), {}),
+            'DocumentWorkflowViewSet.reject': (
+                rejecter, 'post', reverse('documentworkflow-reject', args=[rejecting.pk]), {}),
+            'UserViewSet.list': (admin, 'get', reverse('user-list'), None),
+            'UserViewSet.retrieve': (admin, 'get', reverse('user-detail', args=[user.pk]), None),
+            'UserViewSet.me': (admin, 'get', reverse('user-me'), None),
+            'UserViewSet.autocomplete': (admin, 'get', reverse('user-autocomplete'), {'q': 'a'}),
+            'UserViewSet.update_profile': (admin, 'patch', reverse('user-update-profile'),
+                                           {'first_name': 'Budget'}),
+        }
+    
+    def count_queries(self):
+        counts = {}
+        for name, (client, method, url, data) in self.requests().items():
+            # Warm the principal cache; reads are warmed on themselves
+            client.get(reverse('user-me'))
+            if method == 'get':
+                client.get(url, data)
+            request_format = 'multipart' if method == 'post' else None
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(url, data, format=request_format)
+            self.assertLess(response.status_code, 300, f'{name}: {response.status_code}')
+            counts[name] = len(queries)
+        return counts
+    
+    def test_every_action_has_a_budget(self):
+        """Test that each list, retrieve and custom action declares a query budget"""
+        actions = {f'{viewset.__name__}.{name}' for viewset in VIEWSETS
+                   for name in ['list', 'retrieve'] + [a.__name__ for a in viewset.get_extra_actions()]}
+        self.assertEqual(actions, set(QUERY_BUDGETS))
+    
+    def test_query_counts_do_not_grow_with_data(self):
+        """Test that every action stays within its budget at both dataset sizes"""
+        self.seed(SIZES[0])
+        small = self.count_queries()
+        self.seed(SIZES[1])
+        large = self.count_queries()
+        for name, budget in QUERY_BUDGETS.items():
+            self.assertEqual(small[name], large[name], f'{name} grows with the data')
+            self.assertLessEqual(large[name], budget, f'{name} is over budget')
+
+
+class RendererTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.user = User.objects.create_user(username='renderer', password='testpassword')
+        self.client = token_client(self.user)
+    
+    @skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_orjson_output_matches_drf_json(self):
+        """Test that the orjson renderer produces the same bytes as DRF's JSONRenderer"""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with override_settings(MEDIA_ROOT=media_root.name):
+            document = Document.objects.create(title='Ünïcode \u2028', created_by=self.user,
+                                               file=SimpleUploadedFile('report.txt', b'x'))
+        data = {
+            'id': uuid.uuid4(),
+            'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'amount': Decimal('12.50'),
+            'label': gettext_lazy('Approved'),
+            'nested': [{'title': document.title, 'count': 3, 'ratio': 0.25, 'empty': None}],
+        }
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(renderers.ORJSONRenderer().render({'file': document.file}),
+                         f'{{"file":"{document.file.url}"}}'.encode())
+    
+    @skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_orjson_edge_values(self):
+        """Test that huge integers render like DRF and non-finite floats render as null"""
+        data = {'big': 2 ** 70, 'values': [1, -2 ** 65]}
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(renderers.ORJSONRenderer().render({'nan': float('nan'), 'inf': float('inf')}),
+                         b'{"nan":null,"inf":null}')
+    
+    def test_api_negotiates_json_and_parses_it(self):
+        """Test that API responses are JSON by default and bad JSON bodies are rejected"""
+        response = self.client.get(reverse('document-list'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        response = self.client.post(reverse('document-list'), '{"title": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('workflow-list'), {'name': 'Fast', 'description': 'Parsed'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+    
+    @skipUnless(renderers.msgpack, 'msgpack is not installed')
+    def test_messagepack_is_chosen_by_accept_header(self):
+        """Test that clients asking for MessagePack get it and can send it"""
+        Document.objects.create(title='Packed', created_by=self.user)
+        response = self.client.get(reverse('document-list'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.msgpack.unpackb(response.content)['results'][0]['title'], 'Packed')
+        response = self.client.post(reverse('workflow-list'),
+                                    renderers.msgpack.packb({'name': 'Packed', 'description': 'Sent'}),
+                                    content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media_root.name, FILE_STREAM_CHUNK_SIZE=1024)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.user = User.objects.create_user(username='compressed', password='testpassword')
+        self.body = b'line of a plain text document\n' * 400
+        self.document = Document.objects.create(title='Plain', created_by=self.user,
+                                                file=ContentFile(self.body, name='plain.txt'))
+        self.client = token_client(self.user)
+        self.download_url = reverse('document-download', args=[self.document.pk])
+    
+    def test_encoding_negotiation(self):
+        """Test that q-values and the available encodings decide the encoding"""
+        self.assertEqual(compression.negotiate('gzip, deflate', ['zstd', 'br', 'gzip']), 'gzip')
+        self.assertEqual(compression.negotiate('br;q=1.0, gzip;q=0.5', ['gzip']), 'gzip')
+        self.assertEqual(compression.negotiate('br, zstd;q=0.5', ['zstd', 'br', 'gzip']), 'br')
+        self.assertIsNone(compression.negotiate('gzip;q=0, *', ['gzip']))
+        self.assertIsNone(compression.negotiate('', ['gzip']))
+        self.assertFalse(compression.is_compressible('image/jpeg'))
+        self.assertFalse(compression.is_compressible(
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document'))
+        self.assertTrue(compression.is_compressible('image/svg+xml'))
+        self.assertTrue(compression.is_compressible('application/json; charset=utf-8'))
+    
+    def test_api_responses_are_compressed_when_large_enough(self):
+        """Test that large API responses are gzipped and small ones are left alone"""
+        for index in range(30):
+            Document.objects.create(title=f'Compressible {index}', created_by=self.user,
+                                    description='A description repeated for compression. ' * 5)
+        plain = self.client.get(reverse('document-list'))
+        response = self.client.get(reverse('document-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+        
+        response = self.client.get(reverse('document-detail', args=[self.document.pk]) + '?fields=id',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_file_response_is_compressed_while_streaming(self):
+        """Test that a download is compressed chunk by chunk without a Content-Length"""
+        response = self.client.get(self.download_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), self.body)
+        # Each flushed chunk can be decoded as soon as it arrives
+        first = zlib.decompressobj(31).decompress(chunks[0])
+        self.assertTrue(first and self.body.startswith(first))
+    
+    async def test_async_stream_is_compressed(self):
+        """Test that the ASGI download stream is compressed as it is read"""
+        token = token_client(self.user)._credentials['HTTP_AUTHORIZATION']
+        response = await AsyncClient().get(self.download_url, headers={'Authorization': token,
+                                                                        'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(body), self.body)
+    
+    def test_compressed_files_are_passed_through(self):
+        """Test that already compressed types are not compressed again"""
+        document = Document.objects.create(title='Archive', created_by=self.user,
+                                           file=ContentFile(self.body, name='archive.zip'))
+        response = self.client.get(reverse('document-download', args=[document.pk]),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+    
+    def precompressed_root(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        overridden = override_settings(RESPONSE_COMPRESSION={'PRECOMPRESSED_ROOT': root.name})
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        return root.name
+    
+    def test_precompressed_variant_is_served(self):
+        """Test that a stored variant of a derivative is sent instead of compressing on the fly"""
+        root = self.precompressed_root()
+        name = default_storage.save('thumbnails/legal/diagram.svg', ContentFile(b'<svg/>' + self.body))
+        call_command('precompress_media', stdout=StringIO())
+        variant = os.path.join(root, 'thumbnails', 'legal', 'diagram.svg.gz')
+        self.assertTrue(os.path.exists(variant))
+        self.assertFalse(os.path.exists(os.path.join(root, 'documents')))
+        response = self.client.get(default_storage.url(name), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(os.path.getsize(variant)))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'<svg/>' + self.body)
+        response.close()
+        
+        call_command('precompress_media', clear=True, stdout=StringIO())
+        self.assertFalse(os.path.exists(variant))
+        self.assertTrue(default_storage.exists(name))
+    
+    def test_uploaded_sibling_variants_are_ignored(self):
+        """Test that a .gz uploaded next to a file is never served in its place"""
+        self.precompressed_root()
+        with open(self.document.file.path + '.gz', 'wb') as handle:
+            handle.write(gzip.compress(b'someone else\'s content'))
+        call_command('precompress_media', self.document.file.path, stdout=StringIO())
+        response = self.client.get(self.download_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body)
+        response.close()
+
+
+class HashedMediaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media_root.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.user = User.objects.create_user(username='cached', password='testpassword')
+        image = BytesIO()
+        Image.new('RGB', (600, 400), 'navy').save(image, 'PNG')
+        self.document = Document.objects.create(title='Picture', created_by=self.user,
+                                                file=ContentFile(image.getvalue(), name='picture.png'))
+        self.client = token_client(self.user)
+    
+    def test_serializers_emit_hashed_urls(self):
+        """Test that thumbnail URLs carry a content digest and document file URLs don't"""
+        self.assertIsInstance(default_storage, HashedMediaStorage)
+        data = self.client.get(reverse('document-detail', args=[self.document.pk])).data
+        name = self.document.thumbnail.name
+        self.assertEqual(data['thumbnail'], f'http://testserver/media/{default_storage.digest(name)}/{name}')
+        self.assertEqual(data['file'], f'http://testserver/media/{self.document.file.name}')
+    
+    def test_hashed_urls_are_served_immutable(self):
+        """Test that a hashed URL is served with a long-lived immutable Cache-Control"""
+        url = default_storage.url(self.document.thumbnail.name)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        with open(self.document.thumbnail.path, 'rb') as handle:
+            self.assertEqual(b''.join(response.streaming_content), handle.read())
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url.replace('/media/', '/media/0') + 'x').status_code, 404)
+        self.assertEqual(self.client.get('/media/0123456789abcdef/../../settings.py').status_code, 404)
+    
+    def test_changed_file_gets_a_new_url(self):
+        """Test that new content changes the URL and the old URL stops working"""
+        name = default_storage.save('thumbnails/_shared/notes.txt', ContentFile(b'first'))
+        old_url = default_storage.url(name)
+        with open(default_storage.path(name), 'wb') as handle:
+            handle.write(b'second, longer')
+        new_url = default_storage.url(name)
+        self.assertNotEqual(old_url, new_url)
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertEqual(b''.join(self.client.get(new_url).streaming_content), b'second, longer')
+    
+    def test_private_files_and_wrong_digests_are_not_served(self):
+        """Test that anonymous requests can't reach document files, even with their digest"""
+        anonymous = Client()
+        name = self.document.file.name
+        response = anonymous.get(f'/media/00000000/{name}')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('Location'))
+        self.assertEqual(anonymous.get(f'/media/{default_storage.digest(name)}/{name}').status_code, 404)
+        self.assertEqual(default_storage.url(name), f'/media/{name}')
+        
+        thumbnail = self.document.thumbnail.name
+        self.assertEqual(anonymous.get(f'/media/00000000/{thumbnail}').status_code, 404)
+        # Public prefixes can't be left through '..' segments
+        sneaky = f'thumbnails/../{name}'
+        self.assertEqual(anonymous.get(f'/media/{default_storage.digest(sneaky)}/{sneaky}').status_code, 404)
+        response = anonymous.get(default_storage.url(thumbnail))
+        self.assertEqual(response.status_code, 200)
+        response.close()
+    
+    def test_proxy_offload(self):
+        """Test that the body is left to the proxy when X-Accel-Redirect is configured"""
+        name = self.document.thumbnail.name
+        with override_settings(MEDIA_CACHE={'ACCEL_REDIRECT': '/_protected_media/'}):
+            response = self.client.get(default_storage.url(name))
+        self.assertEqual(response['X-Accel-Redirect'], f'/_protected_media/{name}')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+@override_settings(API_THROTTLES={'RATES': {
+    'search': {'*': '2/min', 'admin': None},
+    'download': {'*': '100/min'},
+    'download_bytes': {'*': '10B/min'},
+}})
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media_root.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.user = User.objects.create_user(username='limited', password='testpassword')
+        self.document = Document.objects.create(title='Limited', created_by=self.user,
+                                                file=ContentFile(b'twenty bytes of text', name='limited.txt'))
+        self.client = token_client(self.user)
+    
+    def test_bucket_refills_at_its_rate(self):
+        """Test that a bucket allows its capacity, then one request per refill interval"""
+        bucket = throttling.TokenBucket('throttle:test', capacity=3, refill=1, scale=throttling.REQUEST_SCALE)
+        with mock.patch('ecms_project.throttling.time.time', return_value=1_800_000_000.0) as clock:
+            self.assertEqual([bucket.consume() for _ in range(3)], [0.0, 0.0, 0.0])
+            self.assertAlmostEqual(bucket.consume(), 1.0)
+            clock.return_value += 1
+            self.assertEqual(bucket.consume(), 0.0)
+            self.assertGreater(bucket.consume(), 0)
+            # Idle time beyond a full bucket is not saved up
+            clock.return_value += 3600
+            self.assertEqual([bucket.consume() > 0 for _ in range(4)], [False, False, False, True])
+    
+    def test_parse_rate(self):
+        """Test that request and byte rates parse into capacity and refill per second"""
+        self.assertEqual(throttling.parse_rate('30/min'), (30, 0.5, throttling.REQUEST_SCALE))
+        self.assertEqual(throttling.parse_rate('2MB/s'), (2 * 1024 ** 2, 2 * 1024 ** 2, 1))
+        self.assertEqual(throttling.parse_rate('10/5m'), (10, 10 / 300, throttling.REQUEST_SCALE))
+        with self.assertRaises(ValueError):
+            throttling.parse_rate('10/fortnight')
+    
+    def test_search_is_limited_per_role(self):
+        """Test that searches get 429 with Retry-After past the rate, except for unlimited roles"""
+        url = reverse('document-list')
+        statuses = [self.client.get(url, {'search': 'Limited'}).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.get(url, {'search': 'Limited'})
+        self.assertEqual(int(response['Retry-After']), 30)
+        # Plain listing isn't a search
+        self.assertEqual(self.client.get(url).status_code, 200)
+        
+        admin = User.objects.create_user(username='unlimited', password='testpassword')
+        admin.profile.role = 'admin'
+        admin.profile.save()
+        client = token_client(admin)
+        self.assertEqual({client.get(url, {'search': 'x'}).status_code for _ in range(5)}, {200})
+    
+    def test_download_bytes_are_limited(self):
+        """Test that downloads draw on the byte bucket, including through signed URLs"""
+        url = reverse('document-download', args=[self.document.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        # The 20 byte file left the 10 byte bucket in debt
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 60)
+        
+        signed = self.client.get(reverse('document-signed-url', args=[self.document.pk])).data['url']
+        self.assertEqual(self.client_class().get(signed).status_code, 429)
+        with override_settings(API_THROTTLES={'ENABLED': False}):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
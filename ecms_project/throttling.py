@@ -0,0 +1,155 @@
+"""Token-bucket rate limits kept in the default cache.
+
+A bucket is a single integer in the cache: the total cost ever charged to
+it. What has refilled since a fixed epoch is computed from the clock, so the
+level is ``counter - refill * (now - EPOCH)`` and every request is one
+atomic incr, with no read-modify-write race between workers. With
+ECMS_REDIS_URL set all workers share the buckets; the per-process memory
+cache only limits each worker on its own.
+
+API_THROTTLES['RATES'] maps a scope to a rate per UserProfile.role, with
+'*' for other roles and anonymous clients and None for no limit. Rates are
+DRF style ('30/min') or, for byte buckets, a size per period ('20MB/s').
+"""
+import functools
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'RATES': {
+        'upload': {'*': '30/min', 'admin': '120/min'},
+        'search': {'*': '60/min', 'admin': None},
+        'analytics': {'*': '10/min', 'manager': '30/min', 'admin': None},
+        'download': {'*': '120/min', 'admin': None},
+        # Bytes of file downloads, whatever the endpoint
+        'download_bytes': {'*': '20MB/s', 'admin': None},
+    },
+}
+
+EPOCH = 1735689600  # 2025-01-01 UTC
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60,
+           'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+SIZES = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+# Request buckets count thousandths of a request so slow refills stay exact
+REQUEST_SCALE = 1000
+
+_RATE = re.compile(r'\s*(\d+(?:\.\d+)?)\s*(|B|KB|MB|GB)\s*/\s*(\d*)\s*([a-z]+)\s*', re.IGNORECASE)
+
+
+def throttle_setting(name):
+    return getattr(settings, 'API_THROTTLES', {}).get(name, DEFAULTS[name])
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'30/min'`` or ``'20MB/s'`` into ``(capacity, refill per second, scale)``."""
+    match = _RATE.fullmatch(rate)
+    if match is None or match.group(4).lower() not in PERIODS:
+        raise ValueError(f'Invalid rate {rate!r}')
+    amount, size, count, period = match.groups()
+    capacity = float(amount) * SIZES[size.upper()]
+    seconds = int(count or 1) * PERIODS[period.lower()]
+    return capacity, capacity / seconds, 1 if size else REQUEST_SCALE
+
+
+class TokenBucket:
+    def __init__(self, key, capacity, refill, scale=1):
+        self.key = key
+        self.capacity = int(capacity * scale)
+        self.refill = refill * scale
+        self.scale = scale
+        # Long enough for an idle bucket to fill up again; an expired bucket is a full one
+        self.timeout = int(capacity / refill) + 60
+
+    def consume(self, cost=1, debt=False):
+        """Charge ``cost``; returns 0 if allowed, else the seconds until it would be.
+
+        With ``debt`` the charge is allowed whenever the bucket isn't empty,
+        even past its capacity, and later charges wait until it is paid off.
+        That suits costs known only as a whole, like the bytes of a download.
+        """
+        cost = int(cost * self.scale)
+        refilled = int((time.time() - EPOCH) * self.refill)
+        cache.add(self.key, refilled, self.timeout)
+        try:
+            counter = cache.incr(self.key, cost)
+        except ValueError:
+            # Expired between add and incr
+            cache.add(self.key, refilled, self.timeout)
+            counter = cache.incr(self.key, cost)
+        level = counter - refilled
+        if level < cost:
+            # The bucket was full: idle time beyond that isn't saved up
+            cache.incr(self.key, cost - level)
+            level = cost
+        cache.touch(self.key, self.timeout)
+
+        over = level - cost - self.capacity if debt else level - self.capacity
+        if over < 0 or (over == 0 and not debt):
+            return 0.0
+        cache.decr(self.key, cost)
+        return max(over, 1) / self.refill
+
+    async def aconsume(self, cost=1, debt=False):
+        return await sync_to_async(self.consume)(cost, debt)
+
+
+def identify(request):
+    """``(key, role)`` a request is throttled as: its user, else its client address."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        profile = getattr(user, 'profile', None)
+        return f'user:{user.pk}', profile.role if profile is not None else None
+    return client_key(request), None
+
+
+def client_key(request):
+    # DRF's client address logic (NUM_PROXIES), for views outside DRF too
+    return f'ip:{BaseThrottle().get_ident(request)}'
+
+
+def bucket_for(scope, who, role=None):
+    """The bucket of ``scope`` for ``who`` (see identify), or None when unlimited."""
+    if not throttle_setting('ENABLED'):
+        return None
+    rates = throttle_setting('RATES').get(scope)
+    if not rates:
+        return None
+    rate = rates[role] if role in rates else rates.get('*')
+    if rate is None:
+        return None
+    capacity, refill, scale = parse_rate(rate)
+    return TokenBucket(f'throttle:{scope}:{who}', capacity, refill, scale)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle the actions a view lists in ``throttle_scopes`` (action -> scope).
+
+    A 'search' entry applies to list requests that carry the search parameter.
+    """
+
+    def allow_request(self, request, view):
+        self.delay = 0.0
+        scopes = getattr(view, 'throttle_scopes', {})
+        action = getattr(view, 'action', None)
+        scope = scopes.get(action)
+        if scope is None and action == 'list' and request.query_params.get(api_settings.SEARCH_PARAM):
+            scope = scopes.get('search')
+        if scope is None:
+            return True
+        bucket = bucket_for(scope, *identify(request))
+        if bucket is None:
+            return True
+        self.delay = bucket.consume()
+        return not self.delay
+
+    def wait(self):
+        return self.delay
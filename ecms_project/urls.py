@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import (
@@ -7,6 +7,9 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from rest_framework import routers
+from users.views import LogoutView
+from ops.views import metrics
+from .media import serve_media
 
 # Create a router for our API viewsets
 router = routers.DefaultRouter()
@@ -17,11 +20,17 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/logout/', LogoutView.as_view(), name='token_logout'),
     path('api/documents/', include('documents.urls')),
     path('api/workflows/', include('workflows.urls')),
     path('api/users/', include('users.urls')),
+    path('api/changes/', include('changes.urls')),
+    path('api/_metrics', metrics, name='metrics'),
+    # Content-hashed media URLs, cacheable for good; served in production too
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<digest>[0-9a-f]{{8,64}})/(?P<name>.+)$', serve_media,
+            name='media'),
 ]
 
-# Serve media files in development
+# Serve unhashed media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -66,8 +66,11 @@ const DocumentDetail = () => {
       setDocumentData(response.data);
       
       // Determine preview type based on file extension
-      const fileUrl = response.data.file;
-      const fileExt = fileUrl.split('.').pop().toLowerCase();
+      const fileExt = response.data.file.split('.').pop().toLowerCase();
+      // Previews load through a short-lived signed URL, which the API only issues
+      // to users who may read the document
+      const signed = await api.get(`/documents/${id}/signed-url/`);
+      const fileUrl = signed.data.url;
       
       if (['pdf'].includes(fileExt)) {
         setPreviewType('pdf');
@@ -39,6 +39,7 @@ import {
   ExpandLess as ExpandLessIcon,
 } from '@mui/icons-material';
 import api from '../../services/apiService';
+import { subscribeToChanges } from '../../services/changeFeed';
 import moment from 'moment';
 
 const DocumentList = () => {
@@ -84,6 +85,11 @@ const DocumentList = () => {
     fetchDocuments();
   }, [page, rowsPerPage]);
   
+  // Refetch only when the server reports a change instead of polling
+  useEffect(() => {
+    return subscribeToChanges(['document', 'version'], () => fetchDocuments());
+  }, [page, rowsPerPage, searchQuery, filters]);
+  
   const handleChangePage = (event, newPage) => {
     setPage(newPage);
   };
@@ -18,13 +18,16 @@ import {
   Download as DownloadIcon,
 } from '@mui/icons-material';
 import { Document, Page, pdfjs } from 'react-pdf';
+import api from '../../services/apiService';
 import 'react-pdf/dist/esm/Page/AnnotationLayer.css';
 import 'react-pdf/dist/esm/Page/TextLayer.css';
 
 // Set up PDF.js worker
 pdfjs.GlobalWorkerOptions.workerSrc = `//cdnjs.cloudflare.com/ajax/libs/pdf.js/${pdfjs.version}/pdf.worker.min.js`;
 
-const DocumentPreview = ({ documentUrl, documentType, documentName }) => {
+// With documentId the file is loaded through a short-lived signed URL from the API
+// instead of documentUrl
+const DocumentPreview = ({ documentId, documentUrl, documentType, documentName }) => {
   const [numPages, setNumPages] = useState(null);
   const [pageNumber, setPageNumber] = useState(1);
   const [scale, setScale] = useState(1.0);
@@ -37,17 +40,32 @@ const DocumentPreview = ({ documentUrl, documentType, documentName }) => {
   const isText = /\.(txt|md|json|csv|html|xml|css|js)$/i.test(documentName);
   
   const [textContent, setTextContent] = useState('');
+  const [fileUrl, setFileUrl] = useState(documentId ? null : documentUrl);
   
   useEffect(() => {
-    if (isText) {
+    if (!documentId) {
+      setFileUrl(documentUrl);
+      return;
+    }
+    api.get(`/documents/${documentId}/signed-url/`)
+      .then((response) => setFileUrl(response.data.url))
+      .catch((err) => {
+        console.error('Error requesting file URL:', err);
+        setError('Failed to load document');
+        setLoading(false);
+      });
+  }, [documentId, documentUrl]);
+  
+  useEffect(() => {
+    if (isText && fileUrl) {
       fetchTextContent();
     }
-  }, [documentUrl, isText]);
+  }, [fileUrl, isText]);
   
   const fetchTextContent = async () => {
     try {
       setLoading(true);
-      const response = await fetch(documentUrl);
+      const response = await fetch(fileUrl);
       const text = await response.text();
       setTextContent(text);
       setError(null);
@@ -131,7 +149,7 @@ const DocumentPreview = ({ documentUrl, documentType, documentName }) => {
           </Box>
           
           <Document
-            file={documentUrl}
+            file={fileUrl}
             onLoadSuccess={onDocumentLoadSuccess}
             onLoadError={onDocumentLoadError}
             loading={<CircularProgress />}
@@ -152,7 +170,7 @@ const DocumentPreview = ({ documentUrl, documentType, documentName }) => {
       return (
         <Box sx={{ display: 'flex', justifyContent: 'center', overflow: 'auto' }}>
           <img
-            src={documentUrl}
+            src={fileUrl}
             alt={documentName}
             style={{
               maxWidth: '100%',
@@ -191,7 +209,7 @@ const DocumentPreview = ({ documentUrl, documentType, documentName }) => {
         <Button
           variant="contained"
           startIcon={<DownloadIcon />}
-          href={documentUrl}
+          href={fileUrl}
           target="_blank"
           sx={{ mt: 2 }}
         >
@@ -227,7 +245,7 @@ const DocumentPreview = ({ documentUrl, documentType, documentName }) => {
             </IconButton>
           </Tooltip>
           <Tooltip title="Download">
-            <IconButton href={documentUrl} download={documentName} size="small">
+            <IconButton href={fileUrl} download={documentName} size="small">
               <DownloadIcon />
             </IconButton>
           </Tooltip>
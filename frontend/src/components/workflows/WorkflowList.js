@@ -27,6 +27,7 @@ import {
   Delete as DeleteIcon,
 } from '@mui/icons-material';
 import api from '../../services/apiService';
+import { subscribeToChanges } from '../../services/changeFeed';
 import moment from 'moment';
 const WorkflowList = () => {
   const [workflows, setWorkflows] = useState([]);
@@ -66,6 +67,11 @@ const WorkflowList = () => {
     fetchWorkflows();
   }, [page, rowsPerPage, searchQuery]);
   
+  // Refetch only when the server reports a change instead of polling
+  useEffect(() => {
+    return subscribeToChanges(['workflow'], () => fetchWorkflows());
+  }, [page, rowsPerPage, searchQuery]);
+  
   const handleChangePage = (event, newPage) => {
     setPage(newPage);
   };
@@ -0,0 +1,28 @@
+const API_URL = 'http://localhost:8000/api/';
+
+// Subscribe to server-pushed change events (document, version, workflow,
+// document_workflow). Returns a function that closes the stream.
+// EventSource cannot send headers, so the access token goes in the query string;
+// the browser resumes with Last-Event-ID on reconnect by itself.
+export const subscribeToChanges = (types, onChange) => {
+  const token = localStorage.getItem('access_token');
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  
+  const params = new URLSearchParams({ token, types: types.join(',') });
+  const source = new EventSource(`${API_URL}changes/stream/?${params}`);
+  
+  const handleEvent = (event) => onChange(JSON.parse(event.data));
+  types.forEach((type) => {
+    ['created', 'updated', 'deleted'].forEach((action) => {
+      source.addEventListener(`${type}.${action}`, handleEvent);
+    });
+  });
+  // Events were missed (server restart or slow client): refetch everything
+  source.addEventListener('reset', () => onChange({ type: 'reset' }));
+  
+  return () => source.close();
+};
+
+export default subscribeToChanges;
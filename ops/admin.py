@@ -0,0 +1,73 @@
+import os
+
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile, SlowQuery
+from .profiling import profile_path
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status', 'duration_ms', 'queries', 'db_ms',
+                    'mode', 'trigger', 'user', 'downloads')
+    list_filter = ('mode', 'trigger', 'method', 'status')
+    search_fields = ('path', 'view_name')
+    readonly_fields = [field.name for field in RequestProfile._meta.fields] + ['downloads']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download),
+                 name='ops_requestprofile_download'),
+        ] + super().get_urls()
+
+    @admin.display(description='Files')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">profile</a> · <a href="{}">SQL</a>',
+            reverse('admin:ops_requestprofile_download', args=[obj.pk, 'profile']),
+            reverse('admin:ops_requestprofile_download', args=[obj.pk, 'sql']),
+        )
+
+    def download(self, request, pk, kind):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind not in ('profile', 'sql'):
+            raise Http404
+        file_path = profile_path(profile.name, profile.mode if kind == 'profile' else 'sql')
+        if not os.path.exists(file_path):
+            raise Http404('The profile file has been removed')
+        return FileResponse(open(file_path, 'rb'), as_attachment=True,
+                            filename=os.path.basename(file_path))
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('short_sql', 'count', 'total_ms', 'mean', 'max_ms', 'caller', 'location', 'last_seen')
+    search_fields = ('sql', 'caller', 'location')
+    readonly_fields = [field.name for field in SlowQuery._meta.fields] + ['mean']
+    ordering = ('-total_ms',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='SQL')
+    def short_sql(self, obj):
+        return obj.sql if len(obj.sql) <= 120 else obj.sql[:117] + '...'
+
+    @admin.display(description='Mean ms')
+    def mean(self, obj):
+        return round(obj.mean_ms, 2)
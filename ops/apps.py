@@ -0,0 +1,24 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+
+
+class OpsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ops'
+    verbose_name = 'Operations'
+
+    def ready(self):
+        from . import metrics, profiling, slow_queries
+
+        # Profiles need the SQL trace even when metrics are off
+        if metrics.metrics_setting('ENABLED') or profiling.profiling_setting('ENABLED'):
+            connection_created.connect(metrics.install_query_wrapper,
+                                       dispatch_uid='ops_install_query_wrapper')
+        if metrics.metrics_setting('ENABLED'):
+            metrics.install_serializer_timer()
+        if slow_queries.slow_query_setting('ENABLED'):
+            connection_created.connect(slow_queries.install_slow_query_wrapper,
+                                       dispatch_uid='ops_install_slow_query_wrapper')
+            request_finished.connect(slow_queries.flush_slow_queries,
+                                     dispatch_uid='ops_flush_slow_queries')
@@ -0,0 +1,253 @@
+"""Online snapshots of the SQLite database and the media directory.
+
+Layout under the backup root::
+
+    objects/ab/abcdef...          media file contents, stored once per SHA-256
+    snapshots/<name>/db.sqlite3   page-by-page copy made with the online backup API
+    snapshots/<name>/manifest.json
+
+Media files are hashed only when their size or modification time differs
+from the previous snapshot's manifest, and copied only when their hash is
+not in the object store yet, so a nightly snapshot reads and writes what
+changed since the last one.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'ROOT': os.path.join(settings.BASE_DIR, 'backups'),
+    # Pages copied per backup step; the source is only locked while a step runs
+    'PAGES_PER_STEP': 1024,
+    'STEP_SLEEP': 0.005,
+    # Snapshots kept by --prune
+    'KEEP': 7,
+}
+
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def backup_setting(name):
+    return getattr(settings, 'OPS_BACKUP', {}).get(name, DEFAULTS[name])
+
+
+def snapshots_dir(root):
+    return os.path.join(root, 'snapshots')
+
+
+def object_path(root, digest):
+    return os.path.join(root, 'objects', digest[:2], digest)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backup_database(source_path, target_path, pages=None, sleep=None):
+    """Copy a live SQLite database with the online backup API."""
+    pages = pages or backup_setting('PAGES_PER_STEP')
+    sleep = backup_setting('STEP_SLEEP') if sleep is None else sleep
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        # Writers get the database back between steps; the copy restarts
+        # by itself if a step sees the source changed underneath it
+        source.backup(target, pages=pages, sleep=sleep)
+    finally:
+        target.close()
+        source.close()
+
+
+def store_object(root, path):
+    """Copy a file into the object store, hashing it on the way; returns (digest, copied)."""
+    objects = os.path.join(root, 'objects')
+    os.makedirs(objects, exist_ok=True)
+    digest = hashlib.sha256()
+    handle, temp_path = tempfile.mkstemp(dir=objects, prefix='.incoming-')
+    try:
+        with os.fdopen(handle, 'wb') as target, open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                target.write(chunk)
+        hexdigest = digest.hexdigest()
+        destination = object_path(root, hexdigest)
+        if os.path.exists(destination):
+            return hexdigest, False
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(temp_path, destination)
+        return hexdigest, True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def latest_manifest(root):
+    names = list_snapshots(root)
+    return load_manifest(root, names[-1]) if names else None
+
+
+def list_snapshots(root):
+    directory = snapshots_dir(root)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if os.path.exists(os.path.join(directory, name, 'manifest.json')))
+
+
+def load_manifest(root, name):
+    path = os.path.join(snapshots_dir(root), name, 'manifest.json')
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        raise SnapshotError(f'No snapshot named {name}')
+
+
+def create_snapshot(root, database_path, media_root, name=None):
+    """Snapshot the database and media; returns (name, stats)."""
+    name = name or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    snapshot_dir = os.path.join(snapshots_dir(root), name)
+    if os.path.exists(snapshot_dir):
+        raise SnapshotError(f'Snapshot {name} already exists')
+    work_dir = os.path.join(snapshots_dir(root), f'.{name}.partial')
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+
+    # Database first: media files referenced by its rows were written before it
+    database_copy = os.path.join(work_dir, 'db.sqlite3')
+    backup_database(database_path, database_copy)
+
+    previous = latest_manifest(root)
+    known = previous['files'] if previous else {}
+    stats = {'files': 0, 'hashed': 0, 'copied': 0, 'copied_bytes': 0, 'bytes': 0}
+    files = {}
+    for directory, _, filenames in os.walk(media_root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            relative = os.path.relpath(path, media_root).replace(os.sep, '/')
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Deleted while we were walking
+                continue
+            entry = known.get(relative)
+            if (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                    and os.path.exists(object_path(root, entry['sha256']))):
+                digest = entry['sha256']
+            else:
+                try:
+                    digest, copied = store_object(root, path)
+                except FileNotFoundError:
+                    continue
+                stats['hashed'] += 1
+                if copied:
+                    stats['copied'] += 1
+                    stats['copied_bytes'] += stat.st_size
+            files[relative] = {'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            stats['files'] += 1
+            stats['bytes'] += stat.st_size
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'name': name,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'database': {'sha256': file_digest(database_copy), 'size': os.path.getsize(database_copy)},
+        'files': files,
+    }
+    with open(os.path.join(work_dir, 'manifest.json'), 'w') as handle:
+        json.dump(manifest, handle, indent=1, sort_keys=True)
+    # A snapshot only becomes visible once it is complete
+    os.replace(work_dir, snapshot_dir)
+    return name, stats
+
+
+def verify_snapshot(root, name, full=True):
+    """Return a list of problems; empty when the snapshot is intact.
+
+    ``full`` re-hashes every object; otherwise only presence and size are checked.
+    """
+    manifest = load_manifest(root, name)
+    problems = []
+    database_copy = os.path.join(snapshots_dir(root), name, 'db.sqlite3')
+    if not os.path.exists(database_copy):
+        problems.append('database copy is missing')
+    else:
+        if file_digest(database_copy) != manifest['database']['sha256']:
+            problems.append('database copy does not match the manifest')
+        connection = sqlite3.connect(f'file:{database_copy}?mode=ro', uri=True)
+        try:
+            result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            result = str(e)
+        finally:
+            connection.close()
+        if result != 'ok':
+            problems.append(f'database integrity check failed: {result}')
+
+    checked = set()
+    for relative, entry in manifest['files'].items():
+        digest = entry['sha256']
+        if digest in checked:
+            continue
+        checked.add(digest)
+        path = object_path(root, digest)
+        if not os.path.exists(path):
+            problems.append(f'{relative}: object {digest} is missing')
+        elif os.path.getsize(path) != entry['size']:
+            problems.append(f'{relative}: object {digest} has the wrong size')
+        elif full and file_digest(path) != digest:
+            problems.append(f'{relative}: object {digest} is corrupt')
+    return problems
+
+
+def restore_snapshot(root, name, database_path, media_root):
+    """Restore a verified snapshot; returns the number of media files written."""
+    manifest = load_manifest(root, name)
+    backup_database(os.path.join(snapshots_dir(root), name, 'db.sqlite3'), database_path)
+
+    written = 0
+    for relative, entry in manifest['files'].items():
+        target = os.path.join(media_root, *relative.split('/'))
+        if (os.path.exists(target) and os.path.getsize(target) == entry['size']
+                and file_digest(target) == entry['sha256']):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(object_path(root, entry['sha256']), target)
+        written += 1
+    return written
+
+
+def prune_snapshots(root, keep):
+    """Delete all but the newest ``keep`` snapshots and the objects only they used."""
+    names = list_snapshots(root)
+    removed = names[:-keep] if keep else names
+    for name in removed:
+        shutil.rmtree(os.path.join(snapshots_dir(root), name))
+
+    referenced = set()
+    for name in names[len(removed):]:
+        referenced.update(entry['sha256'] for entry in load_manifest(root, name)['files'].values())
+    deleted = 0
+    objects = os.path.join(root, 'objects')
+    for directory, _, filenames in os.walk(objects):
+        for filename in filenames:
+            if filename not in referenced and not filename.startswith('.incoming-'):
+                os.remove(os.path.join(directory, filename))
+                deleted += 1
+    return len(removed), deleted
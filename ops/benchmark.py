@@ -0,0 +1,76 @@
+"""Helpers shared by the benchmark commands."""
+import json
+import math
+import platform
+import resource
+import sys
+
+import django
+from django.conf import settings
+from django.test import override_settings
+
+
+def client_settings():
+    """Settings for driving the app through the test client outside the test runner.
+
+    The test client talks to 'testserver', DEBUG would log every query and
+    skew the numbers, and the rate limits would answer most requests with 429.
+    """
+    return override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                             API_THROTTLES={**getattr(settings, 'API_THROTTLES', {}), 'ENABLED': False})
+
+
+def token_client(user):
+    """An APIClient that authenticates as ``user`` with a real access token."""
+    # Imported here so stress workers can import this module before django.setup()
+    from rest_framework.test import APIClient
+    from users.serializers import ECMSTokenObtainPairSerializer
+
+    client = APIClient()
+    token = ECMSTokenObtainPairSerializer.get_token(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def latency_summary(seconds):
+    """p50/p95/p99, mean and max of a list of durations, in milliseconds."""
+    values = sorted(seconds)
+    return {
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def max_rss_kb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+    }
+
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def write_results(path, results):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ops.backup import SnapshotError, backup_setting, create_snapshot, prune_snapshots
+
+
+class Command(BaseCommand):
+    help = ('Snapshot the SQLite database (online backup API, writers keep running) and the '
+            'media directory (content-addressed, only changed files are read and copied)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='Backup directory (default: OPS_BACKUP["ROOT"])')
+        parser.add_argument('--name', help='Snapshot name (default: UTC timestamp)')
+        parser.add_argument('--database-path', help='Default: the default database file')
+        parser.add_argument('--media-root', help='Default: MEDIA_ROOT')
+        parser.add_argument('--prune', action='store_true',
+                            help='Afterwards keep only the newest OPS_BACKUP["KEEP"] snapshots')
+
+    def handle(self, *args, **options):
+        root = options['root'] or backup_setting('ROOT')
+        database_path = options['database_path'] or str(settings.DATABASES['default']['NAME'])
+        started = time.monotonic()
+        try:
+            name, stats = create_snapshot(root, database_path,
+                                          options['media_root'] or settings.MEDIA_ROOT,
+                                          name=options['name'])
+        except (SnapshotError, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {name} in {time.monotonic() - started:.1f}s: {stats["files"]} media files '
+            f'({stats["bytes"] / 1e6:.1f} MB), {stats["hashed"]} hashed, {stats["copied"]} new '
+            f'objects copied ({stats["copied_bytes"] / 1e6:.1f} MB)'
+        ))
+        if options['prune']:
+            removed, deleted = prune_snapshots(root, backup_setting('KEEP'))
+            self.stdout.write(f'Pruned {removed} snapshots and {deleted} unreferenced objects')
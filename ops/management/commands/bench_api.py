@@ -0,0 +1,218 @@
+import re
+import time
+import tracemalloc
+from random import Random
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import reverse
+
+from documents.models import Document, Version
+from ops.benchmark import (client_settings, environment, latency_summary, load_results, max_rss_kb,
+                           token_client, write_results)
+from workflows.models import DocumentWorkflow
+
+from .seed_dataset import TOPICS, USERNAME_PREFIX
+
+
+ENDPOINTS = ('list', 'search', 'retrieve', 'download', 'create_version', 'approve_step')
+WRITES = ('create_version', 'approve_step')
+QUERIES_PATTERN = re.compile(r'db;desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the main API endpoints in process against a dataset made by seed_dataset. '
+            'Reports p50/p95/p99 latency, SQL queries (from the Server-Timing header) and memory; '
+            'writes are rolled back unless --keep-writes is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                            help=f'Comma-separated subset of {", ".join(ENDPOINTS)}')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--tracemalloc', action='store_true',
+                            help='Record peak Python allocations per request (slows requests down)')
+        parser.add_argument('--keep-writes', action='store_true',
+                            help='Commit created versions and approvals instead of rolling them back')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Results JSON of an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        baseline = load_results(options['compare']) if options['compare'] else None
+
+        users = list(User.objects.filter(username__startswith=USERNAME_PREFIX, is_active=True)
+                     .select_related('profile'))
+        documents = list(Document.objects.filter(created_by__username__startswith=USERNAME_PREFIX)
+                         .values_list('pk', 'created_by_id'))
+        if not users or not documents:
+            raise CommandError('No seeded dataset found; run seed_dataset first')
+        self.in_flight = list(DocumentWorkflow.objects.filter(
+            status='in_progress', current_step__isnull=False, document__in=[pk for pk, _ in documents],
+        ).values_list('pk', 'current_step__approver_id'))
+        if 'approve_step' in endpoints and not self.in_flight:
+            raise CommandError('No in-flight document workflows left to approve')
+
+        self.rng = Random(options['seed'])
+        self.users = users
+        self.documents = documents
+        self.clients = {}
+        self.options = options
+
+        results = {
+            'environment': environment(),
+            'dataset': {'users': len(users), 'documents': len(documents),
+                        'in_flight': len(self.in_flight)},
+            'options': {key: options[key] for key in ('requests', 'warmup', 'seed', 'tracemalloc',
+                                                      'keep_writes')},
+            'endpoints': {},
+        }
+        if options['tracemalloc']:
+            tracemalloc.start()
+        with client_settings():
+            try:
+                for name in endpoints:
+                    for _ in range(options['warmup']):
+                        self.measure(name)
+                    samples = [self.measure(name) for _ in range(options['requests'])]
+                    results['endpoints'][name] = self.summarize(samples)
+            finally:
+                if options['tracemalloc']:
+                    tracemalloc.stop()
+        results['max_rss_kb'] = max_rss_kb()
+
+        self.report(results)
+        if baseline:
+            self.compare(baseline, results)
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def client_for(self, user_id):
+        client = self.clients.get(user_id)
+        if client is None:
+            user = next(u for u in self.users if u.pk == user_id)
+            client = self.clients[user_id] = token_client(user)
+        return client
+
+    def build(self, name):
+        """Return (user id, method, url, data) for one request to the endpoint."""
+        rng = self.rng
+        if name == 'list':
+            return (rng.choice(self.users).pk, 'get', reverse('document-list'),
+                    {'ordering': rng.choice(['-created_at', '-updated_at', 'title'])})
+        if name == 'search':
+            return rng.choice(self.users).pk, 'get', reverse('document-list'), {'search': rng.choice(TOPICS)}
+        if name == 'approve_step':
+            if self.options['keep_writes']:
+                # A committed approval moves the workflow on to another approver
+                if not self.in_flight:
+                    raise CommandError('Ran out of in-flight document workflows to approve')
+                pk, approver_id = self.in_flight.pop(rng.randrange(len(self.in_flight)))
+            else:
+                pk, approver_id = rng.choice(self.in_flight)
+            return approver_id, 'post', reverse('documentworkflow-approve-step', args=[pk]), {
+                'comments': 'Benchmark approval'}
+        # Owners can always read and edit their documents, whatever the grants
+        pk, owner_id = rng.choice(self.documents)
+        if name == 'retrieve':
+            return owner_id, 'get', reverse('document-detail', args=[pk]), None
+        if name == 'download':
+            return owner_id, 'get', reverse('document-download', args=[pk]), None
+        return owner_id, 'post', reverse('document-create-version', args=[pk]), {
+            'file': SimpleUploadedFile('benchmark.bin', b'x' * 4096), 'comment': 'Benchmark version'}
+
+    def measure(self, name):
+        user_id, method, url, data = self.build(name)
+        client = self.client_for(user_id)
+        if name in WRITES and not self.options['keep_writes']:
+            with transaction.atomic():
+                sample = self.request(client, method, url, data)
+                created = (list(Version.objects.filter(pk=sample['version'])
+                                .values_list('file', flat=True)) if sample['version'] else [])
+                transaction.set_rollback(True)
+            for file_name in created:
+                default_storage.delete(file_name)
+            return sample
+        return self.request(client, method, url, data)
+
+    def request(self, client, method, url, data):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        if method == 'get':
+            response = client.get(url, data)
+        else:
+            response = client.post(url, data, format='multipart')
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            response.close()
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+
+        match = QUERIES_PATTERN.search(response.get('Server-Timing', ''))
+        version = None
+        if response.status_code == 201 and not response.streaming:
+            version = response.json().get('id')
+        return {
+            'seconds': elapsed,
+            'status': response.status_code,
+            'queries': int(match.group(1)) if match else None,
+            'bytes': size,
+            'alloc_kb': (tracemalloc.get_traced_memory()[1] - before) / 1024 if tracing else None,
+            'version': version,
+        }
+
+    def summarize(self, samples):
+        summary = latency_summary([s['seconds'] for s in samples])
+        statuses = {}
+        for sample in samples:
+            statuses[str(sample['status'])] = statuses.get(str(sample['status']), 0) + 1
+        queries = [s['queries'] for s in samples if s['queries'] is not None]
+        allocations = [s['alloc_kb'] for s in samples if s['alloc_kb'] is not None]
+        summary.update({
+            'requests': len(samples),
+            'errors': sum(1 for s in samples if s['status'] >= 400),
+            'statuses': statuses,
+            'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'queries_max': max(queries) if queries else None,
+            'bytes_mean': round(sum(s['bytes'] for s in samples) / len(samples)) if samples else 0,
+            'alloc_peak_kb_mean': round(sum(allocations) / len(allocations), 1) if allocations else None,
+            'alloc_peak_kb_max': round(max(allocations), 1) if allocations else None,
+        })
+        return summary
+
+    def report(self, results):
+        self.stdout.write(f'{"endpoint":<16}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                          f'{"queries":>9}{"errors":>8}{"alloc KB":>10}')
+        for name, row in results['endpoints'].items():
+            queries = '-' if row['queries_mean'] is None else f'{row["queries_mean"]:.1f}'
+            alloc = '-' if row['alloc_peak_kb_max'] is None else f'{row["alloc_peak_kb_max"]:.0f}'
+            self.stdout.write(f'{name:<16}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}'
+                              f'{row["p99_ms"]:>9.2f}{queries:>9}{row["errors"]:>8}{alloc:>10}')
+        self.stdout.write(f'max RSS {results["max_rss_kb"] / 1024:.1f} MB')
+
+    def compare(self, baseline, results):
+        self.stdout.write('\nChange against the baseline run (negative is faster)')
+        self.stdout.write(f'{"endpoint":<16}{"p50":>9}{"p95":>9}{"p99":>9}{"queries":>9}')
+        for name, row in results['endpoints'].items():
+            before = baseline.get('endpoints', {}).get(name)
+            if not before:
+                continue
+            changes = [f'{(row[key] - before[key]) / before[key] * 100:+.1f}%' if before[key] else '-'
+                       for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+            if row['queries_mean'] is None or before['queries_mean'] is None:
+                queries = '-'
+            else:
+                queries = f'{row["queries_mean"] - before["queries_mean"]:+.1f}'
+            self.stdout.write(f'{name:<16}' + ''.join(f'{c:>9}' for c in changes) + f'{queries:>9}')
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from documents.models import Document
+from documents.serializers import DocumentSerializer
+from ecms_project import renderers
+from ops.benchmark import client_settings, environment, latency_summary, write_results
+from workflows.models import DocumentWorkflow
+from workflows.serializers import DocumentWorkflowSerializer
+
+from .seed_dataset import USERNAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = ('Encode real API payloads from a seed_dataset database with DRF\'s JSONRenderer, the '
+            'orjson renderer and the MessagePack renderer, and report encode time, size and speedup.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help='Objects per payload')
+        parser.add_argument('--rounds', type=int, default=200, help='Encodes per renderer and payload')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        with client_settings():
+            payloads = self.payloads(options['items'])
+        candidates = {'drf-json': JSONRenderer()}
+        if renderers.orjson is not None:
+            candidates['orjson'] = renderers.ORJSONRenderer()
+        else:
+            self.stderr.write('orjson is not installed; skipping the orjson renderer')
+        if renderers.msgpack is not None:
+            candidates['msgpack'] = renderers.MessagePackRenderer()
+        else:
+            self.stderr.write('msgpack is not installed; skipping the MessagePack renderer')
+
+        results = {'environment': environment(), 'options': {key: options[key] for key in ('items', 'rounds')},
+                   'payloads': {}}
+        self.stdout.write(f'{"payload":<20}{"renderer":<10}{"bytes":>10}{"p50 ms":>9}{"p99 ms":>9}'
+                          f'{"MB/s":>8}{"speedup":>9}')
+        for payload_name, data in payloads.items():
+            rows = results['payloads'][payload_name] = {}
+            for renderer_name, renderer in candidates.items():
+                timings = []
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    body = renderer.render(data, renderer.media_type, {})
+                    timings.append(time.perf_counter() - started)
+                row = latency_summary(timings)
+                row['bytes'] = len(body)
+                row['mb_per_second'] = round(len(body) / (row['mean_ms'] / 1000) / 1e6, 1) if row['mean_ms'] else 0.0
+                baseline = rows.get('drf-json', row)
+                row['speedup'] = round(baseline['mean_ms'] / row['mean_ms'], 2) if row['mean_ms'] else 0.0
+                rows[renderer_name] = row
+                self.stdout.write(f'{payload_name:<20}{renderer_name:<10}{row["bytes"]:>10}{row["p50_ms"]:>9.3f}'
+                                  f'{row["p99_ms"]:>9.3f}{row["mb_per_second"]:>8.1f}{row["speedup"]:>8.2f}x')
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def payloads(self, items):
+        # Serialize once, the way the list endpoints do, so only encoding is timed; file
+        # URLs are absolute, built from a test request
+        context = {'request': Request(APIRequestFactory().get('/api/'))}
+        document_workflows = DocumentWorkflowSerializer.eager_load(DocumentWorkflow.objects.filter(
+            document__created_by__username__startswith=USERNAME_PREFIX).order_by('-started_at'))[:items]
+        documents = DocumentSerializer.eager_load(Document.objects.filter(
+            created_by__username__startswith=USERNAME_PREFIX).order_by('-created_at'))[:items]
+        payloads = {
+            'document_workflows': DocumentWorkflowSerializer(document_workflows, many=True, context=context).data,
+            'documents': DocumentSerializer(documents, many=True, context=context).data,
+        }
+        if not all(payloads.values()):
+            raise CommandError('No seeded dataset found; run seed_dataset first')
+        return payloads
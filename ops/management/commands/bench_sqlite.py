@@ -0,0 +1,164 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Django's defaults: rollback journal, deferred transactions, a new
+# connection per request, and the sqlite3 module's 5 second timeout
+BASELINE = {
+    'pragmas': [],
+    'begin': 'BEGIN',
+    'persistent': False,
+    'read_only_readers': False,
+}
+
+PRODUCTION = {
+    'pragmas': ['PRAGMA journal_mode=WAL'],
+    'begin': 'BEGIN IMMEDIATE',
+    'persistent': True,
+    'read_only_readers': True,
+}
+
+
+class Worker(threading.Thread):
+    def __init__(self, path, profile, pragmas, rows, deadline, write):
+        super().__init__(daemon=True)
+        self.path = path
+        self.profile = profile
+        self.pragmas = pragmas
+        self.rows = rows
+        self.deadline = deadline
+        self.write = write
+        self.latencies = []
+        self.errors = 0
+        self.connection = None
+
+    def connect(self):
+        if self.write or not self.profile['read_only_readers']:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, isolation_level=None,
+                                         check_same_thread=False)
+        for pragma in self.profile['pragmas'] + self.pragmas:
+            connection.execute(pragma)
+        return connection
+
+    def run(self):
+        rng = random.Random(id(self))
+        while time.monotonic() < self.deadline:
+            started = time.monotonic()
+            if self.connection is None:
+                self.connection = self.connect()
+            try:
+                if self.write:
+                    self.write_once(rng)
+                else:
+                    self.read_once(rng)
+                self.latencies.append(time.monotonic() - started)
+            except sqlite3.OperationalError:
+                # "database is locked": the request would have failed
+                self.errors += 1
+                if self.connection.in_transaction:
+                    self.connection.execute('ROLLBACK')
+            if not self.profile['persistent']:
+                self.connection.close()
+                self.connection = None
+        if self.connection is not None:
+            self.connection.close()
+
+    def write_once(self, rng):
+        # Read-then-write, like loading a row and saving it in an atomic block
+        item_id = rng.randrange(1, self.rows + 1)
+        self.connection.execute(self.profile['begin'])
+        self.connection.execute('SELECT value FROM item WHERE id = ?', (item_id,)).fetchone()
+        self.connection.execute('UPDATE item SET value = ?, updated_at = ? WHERE id = ?',
+                                (f'value {rng.random()}', time.time(), item_id))
+        self.connection.execute('INSERT INTO item_log (item_id, changed_at) VALUES (?, ?)',
+                                (item_id, time.time()))
+        self.connection.execute('COMMIT')
+
+    def read_once(self, rng):
+        start = rng.randrange(1, self.rows + 1)
+        self.connection.execute(
+            'SELECT count(*), max(updated_at) FROM item WHERE id BETWEEN ? AND ?',
+            (start, start + 200),
+        ).fetchone()
+
+
+class Command(BaseCommand):
+    help = ('Compare concurrent read/write throughput of Django\'s default SQLite setup with the '
+            'production profile (WAL, pragmas, immediate transactions, persistent and read-only '
+            'connections) on a scratch database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+        parser.add_argument('--rows', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        pragmas = list(getattr(settings, 'SQLITE_PRAGMAS', []))
+        self.stdout.write(f"{options['writers']} writers, {options['readers']} readers, "
+                          f"{options['duration']:.1f}s per profile")
+        self.stdout.write(f'{"profile":<12}{"writes/s":>10}{"reads/s":>10}{"locked":>9}'
+                          f'{"read p50 ms":>13}{"read p99 ms":>13}{"write p99 ms":>14}')
+        for name, profile, extra in (('baseline', BASELINE, []), ('production', PRODUCTION, pragmas)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['rows'], profile)
+                result = self.run_profile(path, profile, extra, options)
+            self.stdout.write(
+                f'{name:<12}{result["writes"]:>10.0f}{result["reads"]:>10.0f}{result["errors"]:>9}'
+                f'{result["read_p50"]:>13.2f}{result["read_p99"]:>13.2f}{result["write_p99"]:>14.2f}'
+            )
+
+    def seed(self, path, rows, profile):
+        connection = sqlite3.connect(path, isolation_level=None)
+        for pragma in profile['pragmas']:
+            connection.execute(pragma)
+        connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, value TEXT, updated_at REAL)')
+        connection.execute('CREATE TABLE item_log (id INTEGER PRIMARY KEY, item_id INTEGER, '
+                           'changed_at REAL)')
+        connection.execute('BEGIN')
+        connection.executemany('INSERT INTO item (id, value, updated_at) VALUES (?, ?, ?)',
+                               ((i, f'value {i}', time.time()) for i in range(1, rows + 1)))
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run_profile(self, path, profile, pragmas, options):
+        deadline = time.monotonic() + options['duration']
+        workers = ([Worker(path, profile, pragmas, options['rows'], deadline, True)
+                    for _ in range(options['writers'])]
+                   + [Worker(path, profile, pragmas, options['rows'], deadline, False)
+                      for _ in range(options['readers'])])
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+
+        def percentile(latencies, fraction):
+            if not latencies:
+                return 0.0
+            if len(latencies) == 1:
+                return latencies[0] * 1000
+            return statistics.quantiles(latencies, n=100)[int(fraction * 100) - 1] * 1000
+
+        reads = [latency for worker in workers if not worker.write for latency in worker.latencies]
+        writes = [latency for worker in workers if worker.write for latency in worker.latencies]
+        return {
+            'writes': len(writes) / elapsed,
+            'reads': len(reads) / elapsed,
+            'errors': sum(worker.errors for worker in workers),
+            'read_p50': percentile(reads, 0.5),
+            'read_p99': percentile(reads, 0.99),
+            'write_p99': percentile(writes, 0.99),
+        }
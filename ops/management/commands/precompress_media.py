@@ -0,0 +1,85 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ecms_project.compression import (EXTENSIONS, StreamCompressor, available_encodings,
+                                      compression_setting, is_compressible, precompressible_name,
+                                      variant_path)
+
+
+# Stored variants are written once and served many times: use the strongest levels
+LEVELS = {'zstd': 19, 'br': 11, 'gzip': 9}
+
+
+class Command(BaseCommand):
+    help = ('Store .zst/.br/.gz variants of compressible generated media (PRECOMPRESSED_PREFIXES, '
+            'thumbnails by default) under PRECOMPRESSED_ROOT so the compression middleware can '
+            'serve them without compressing on every download.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Directories or files to process (default: the '
+                                 'PRECOMPRESSED_PREFIXES of MEDIA_ROOT); others are ignored')
+        parser.add_argument('--clear', action='store_true', help='Delete stored variants instead')
+
+    def handle(self, *args, **options):
+        roots = options['paths'] or [
+            os.path.join(settings.MEDIA_ROOT, *prefix.split('/'))
+            for prefix in compression_setting('PRECOMPRESSED_PREFIXES')
+        ]
+        for root in options['paths']:
+            if not os.path.exists(root):
+                raise CommandError(f'{root} does not exist')
+        encodings = available_encodings()
+        written = skipped = removed = 0
+        for path in self.files(roots):
+            # Uploads never get variants, whatever paths were given
+            name = precompressible_name(os.path.abspath(path))
+            if name is None:
+                skipped += 1
+                continue
+            if options['clear']:
+                for encoding in EXTENSIONS:
+                    variant = variant_path(name, encoding)
+                    if os.path.exists(variant):
+                        os.remove(variant)
+                        removed += 1
+                continue
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            if not is_compressible(content_type) or os.path.getsize(path) < compression_setting('MIN_SIZE'):
+                skipped += 1
+                continue
+            for encoding in encodings:
+                written += self.store_variant(path, name, encoding)
+        if options['clear']:
+            self.stdout.write(f'Removed {removed} variants')
+        else:
+            self.stdout.write(f'Wrote {written} variants; skipped {skipped} files not worth compressing')
+
+    def files(self, roots):
+        for root in roots:
+            if os.path.isfile(root):
+                yield root
+                continue
+            for directory, _, names in os.walk(root):
+                for name in sorted(names):
+                    yield os.path.join(directory, name)
+
+    def store_variant(self, path, name, encoding):
+        variant = variant_path(name, encoding)
+        if os.path.exists(variant) and os.path.getmtime(variant) >= os.path.getmtime(path):
+            return 0
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        compressor = StreamCompressor(encoding, LEVELS[encoding])
+        compressed = compressor.compress(data) + compressor.finish()
+        if len(compressed) >= len(data):
+            return 0
+        os.makedirs(os.path.dirname(variant), exist_ok=True)
+        partial = variant + '.partial'
+        with open(partial, 'wb') as handle:
+            handle.write(compressed)
+        os.replace(partial, variant)
+        return 1
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ops.backup import (SnapshotError, backup_setting, list_snapshots, restore_snapshot,
+                        verify_snapshot)
+
+
+class Command(BaseCommand):
+    help = ('Verify a snapshot against its manifest and restore the database and media files. '
+            'Stop the application before restoring over the live database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Snapshot to restore (default: the newest)')
+        parser.add_argument('--root', help='Backup directory (default: OPS_BACKUP["ROOT"])')
+        parser.add_argument('--database-path', help='Default: the default database file')
+        parser.add_argument('--media-root', help='Default: MEDIA_ROOT')
+        parser.add_argument('--verify-only', action='store_true')
+        parser.add_argument('--quick', action='store_true',
+                            help='Check objects by presence and size instead of re-hashing them')
+
+    def handle(self, *args, **options):
+        root = options['root'] or backup_setting('ROOT')
+        name = options['name']
+        if name is None:
+            snapshots = list_snapshots(root)
+            if not snapshots:
+                raise CommandError(f'No snapshots in {root}')
+            name = snapshots[-1]
+
+        try:
+            problems = verify_snapshot(root, name, full=not options['quick'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f'Snapshot {name} failed verification ({len(problems)} problems)')
+        self.stdout.write(f'Snapshot {name} verified')
+        if options['verify_only']:
+            return
+
+        written = restore_snapshot(
+            root, name,
+            options['database_path'] or str(settings.DATABASES['default']['NAME']),
+            options['media_root'] or settings.MEDIA_ROOT,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Restored snapshot {name}: database and {written} changed media files'
+        ))
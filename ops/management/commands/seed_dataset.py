@@ -0,0 +1,182 @@
+import os
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from documents.models import Document, DocumentGrant, Version, document_upload_to
+from users.models import UserProfile, UserSearchTerm
+from users.search import build_terms
+from workflows.models import DocumentWorkflow, Workflow, WorkflowStep, WorkflowStepApproval
+
+
+# Seeded users share this prefix (and password) so bench_api can find them
+# and --clear can remove everything seeded
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+
+FIRST_NAMES = ['Ada', 'Ben', 'Chloe', 'Dev', 'Elena', 'Farid', 'Grace', 'Hugo', 'Ines', 'Jonas',
+               'Kira', 'Liam', 'Maya', 'Noah', 'Olga', 'Priya', 'Quinn', 'Rosa', 'Sami', 'Tara']
+LAST_NAMES = ['Adams', 'Brown', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito',
+              'Jensen', 'Khan', 'Lopez', 'Martin', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Silva']
+TOPICS = ['contract', 'invoice', 'policy', 'report', 'proposal', 'budget', 'audit', 'memo',
+          'specification', 'minutes', 'agreement', 'forecast', 'review', 'plan', 'handbook']
+DEPARTMENTS = ['legal', 'finance', 'engineering', 'sales', 'operations', 'marketing', 'hr', 'it']
+
+
+class Command(BaseCommand):
+    help = ('Generate a realistic dataset for benchmarking: users with profiles, documents with '
+            'version chains and files, workflows with steps and in-flight document workflows. '
+            'Rows are bulk-inserted without signals, so no change-log entries are written.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--departments', type=int, default=4)
+        parser.add_argument('--documents', type=int, default=5000)
+        parser.add_argument('--versions', type=int, default=3, help='Versions per document')
+        parser.add_argument('--workflows', type=int, default=3, help='Workflows per department')
+        parser.add_argument('--steps', type=int, default=3, help='Steps per workflow')
+        parser.add_argument('--in-flight', type=int, default=1000,
+                            help='Documents with a workflow in progress')
+        parser.add_argument('--file-size', type=int, default=16384, help='Bytes per document file')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete a previously seeded dataset first')
+
+    def handle(self, *args, **options):
+        if options['departments'] > len(DEPARTMENTS):
+            raise CommandError(f'At most {len(DEPARTMENTS)} departments')
+        if options['users'] < options['departments'] * 4:
+            raise CommandError('Need at least four users per department (approvers and a manager)')
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f'Deleted {deleted} previously seeded rows')
+        elif User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('A seeded dataset already exists; pass --clear to replace it')
+
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+        departments = DEPARTMENTS[:options['departments']]
+        with transaction.atomic():
+            users = self.seed_users(rng, options['users'], departments)
+            documents = self.seed_documents(rng, users, options)
+            workflows = self.seed_workflows(rng, users, departments, options)
+            in_flight = self.seed_document_workflows(rng, documents, workflows, options['in_flight'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users, {len(documents)} documents '
+            f'({len(documents) * options["versions"]} versions), '
+            f'{sum(len(w) for w in workflows.values())} workflows and {in_flight} in-flight '
+            f'document workflows in {time.monotonic() - started:.1f}s'
+        ))
+
+    def seed_users(self, rng, count, departments):
+        # One hash for everyone: hashing per user would dominate the run
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}{i:06d}', password=password,
+                 first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                 email=f'{USERNAME_PREFIX}{i:06d}@example.com')
+            for i in range(count)
+        ], batch_size=1000)
+        profiles = []
+        for i, user in enumerate(users):
+            # Every department gets approvers and a manager; the rest contribute or read
+            if i < len(departments) * 3:
+                role = 'approver'
+            elif i < len(departments) * 4:
+                role = 'manager'
+            else:
+                role = rng.choices(['approver', 'contributor', 'viewer'], [1, 5, 4])[0]
+            profiles.append(UserProfile(user_id=user.pk, role=role,
+                                        department=departments[i % len(departments)]))
+        UserProfile.objects.bulk_create(profiles, batch_size=1000)
+        UserSearchTerm.objects.bulk_create(
+            [term for user, profile in zip(users, profiles) for term in build_terms(user, profile)],
+            batch_size=2000,
+        )
+        for user, profile in zip(users, profiles):
+            user.seeded_profile = profile
+        return users
+
+    def seed_documents(self, rng, users, options):
+        authors = [u for u in users if u.seeded_profile.role in ('contributor', 'manager', 'approver')]
+        payload = os.urandom(options['file_size'])
+        now = timezone.now()
+        documents = []
+        for i in range(options['documents']):
+            author = rng.choice(authors)
+            topic = rng.choice(TOPICS)
+            title = f'{topic.title()} {i:06d} {rng.choice(LAST_NAMES)}'
+            document = Document(title=title, description=f'Seeded {topic} for benchmarking',
+                                created_by=author, department=author.seeded_profile.department,
+                                slug=f'{slugify(title)}-bench')
+            document.file.name = default_storage.save(
+                document_upload_to(document, f'bench-{i:06d}.bin'), ContentFile(payload))
+            documents.append(document)
+        documents = Document.objects.bulk_create(documents, batch_size=1000)
+        # auto_now_add ignores explicit values; spread creation dates afterwards
+        for document in documents:
+            document.created_at = now - timedelta(minutes=rng.randrange(60 * 24 * 365))
+        Document.objects.bulk_update(documents, ['created_at'], batch_size=1000)
+
+        versions = [
+            Version(document=document, version_number=number, file=document.file.name,
+                    comment=f'Revision {number}', created_by=document.created_by)
+            for document in documents for number in range(1, options['versions'] + 1)
+        ]
+        Version.objects.bulk_create(versions, batch_size=2000)
+        # A share of documents is visible department-wide through a role grant
+        DocumentGrant.objects.bulk_create([
+            DocumentGrant(document=document, subject='role:viewer', permission='view')
+            for document in documents if rng.random() < 0.3
+        ], batch_size=2000)
+        return documents
+
+    def seed_workflows(self, rng, users, departments, options):
+        workflows = {}
+        for department in departments:
+            members = [u for u in users if u.seeded_profile.department == department]
+            approvers = [u for u in members if u.seeded_profile.role == 'approver']
+            owner = next(u for u in members if u.seeded_profile.role == 'manager')
+            created = []
+            for n in range(options['workflows']):
+                workflow = Workflow.objects.create(name=f'{department.title()} review {n + 1}',
+                                                   description='Seeded', created_by=owner)
+                WorkflowStep.objects.bulk_create([
+                    WorkflowStep(workflow=workflow, name=f'Step {order}', order=order,
+                                 approver=rng.choice(approvers), sla=timedelta(days=2))
+                    for order in range(1, options['steps'] + 1)
+                ])
+                created.append(workflow)
+            workflows[department] = created
+        return workflows
+
+    def seed_document_workflows(self, rng, documents, workflows, count):
+        steps = {}
+        for workflow in (w for department in workflows.values() for w in department):
+            steps[workflow.pk] = list(workflow.steps.order_by('order'))
+        now = timezone.now()
+        document_workflows = []
+        for document in rng.sample(documents, min(count, len(documents))):
+            workflow = rng.choice(workflows[document.department])
+            document_workflow = DocumentWorkflow(document=document, workflow=workflow)
+            document_workflow.start_step(steps[workflow.pk][0],
+                                         now - timedelta(hours=rng.randrange(1, 96)))
+            document_workflows.append(document_workflow)
+        DocumentWorkflow.objects.bulk_create(document_workflows, batch_size=1000)
+        WorkflowStepApproval.objects.bulk_create([
+            WorkflowStepApproval(document_workflow=document_workflow, step=step)
+            for document_workflow in document_workflows
+            for step in steps[document_workflow.workflow_id]
+        ], batch_size=2000)
+        return len(document_workflows)
+
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from ops.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = 'List the logged slow queries ranked by total time, with their callers and query plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--order', choices=('total', 'mean', 'max', 'count'), default='total')
+        parser.add_argument('--plans', action='store_true', help='Print each query plan')
+        parser.add_argument('--clear', action='store_true', help='Delete the log instead')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(f'Deleted {deleted} slow queries')
+            return
+
+        queries = list(SlowQuery.objects.all())
+        key = {'total': lambda q: q.total_ms, 'mean': lambda q: q.mean_ms,
+               'max': lambda q: q.max_ms, 'count': lambda q: q.count}[options['order']]
+        queries.sort(key=key, reverse=True)
+        if not queries:
+            self.stdout.write('No slow queries logged')
+            return
+        for rank, query in enumerate(queries[:options['limit']], 1):
+            self.stdout.write(f'{rank}. {query.total_ms:.1f} ms total, {query.count} calls, '
+                              f'{query.mean_ms:.1f} ms mean, {query.max_ms:.1f} ms max')
+            self.stdout.write(f'   {query.caller or "?"} at {query.location or "?"}  params {query.params_shape}')
+            self.stdout.write(f'   {query.sql}')
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'     {line}')
@@ -0,0 +1,157 @@
+import multiprocessing
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ops.benchmark import environment, latency_summary, write_results
+from ops.stress import DEFAULT_MIX, check_invariants, parse_mix, run_worker, snapshot
+from workflows.models import DocumentWorkflow, WorkflowStep
+
+from .seed_dataset import USERNAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = ('Fire concurrent mixed read/write traffic at the app from several worker processes '
+            'sharing the configured database, then report throughput, errors by type, time spent '
+            'waiting for the SQLite write lock and invariant violations. Writes are committed: run '
+            'it against a scratch copy of a seed_dataset database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Worker processes; 0 runs a single worker in this process')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of traffic')
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                            help='Operation weights, e.g. read=60,create_version=15,upload=10,'
+                                 'approve_step=15')
+        parser.add_argument('--hot', type=int, default=20,
+                            help='Documents (with an in-flight workflow each) all workers target')
+        parser.add_argument('--think', type=float, default=0.0,
+                            help='Maximum random pause between requests, in seconds')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        plan = self.plan(options, mix)
+        before = snapshot(plan)
+
+        # Workers open their own connections; don't hand them ours
+        connections.close_all()
+        start_at = time.time() + 1 + 0.25 * options['processes']
+        if options['processes'] == 0:
+            raw = [run_worker(0, plan, time.time())]
+        else:
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(options['processes']) as pool:
+                raw = pool.starmap(run_worker, [(index, plan, start_at)
+                                                for index in range(options['processes'])])
+
+        results = self.aggregate(raw, options)
+        results['invariants'] = check_invariants(plan, before, results.pop('acknowledged'))
+        results['environment'] = environment()
+        results['options'] = {key: options[key] for key in ('processes', 'duration', 'hot', 'think',
+                                                            'seed')}
+        results['options']['mix'] = mix
+        self.report(results)
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def plan(self, options, mix):
+        rng = random.Random(options['seed'])
+        in_flight = list(DocumentWorkflow.objects.filter(
+            status='in_progress', document__created_by__username__startswith=USERNAME_PREFIX,
+        ).values_list('pk', 'document_id', 'document__created_by_id'))
+        if not in_flight:
+            raise CommandError('No seeded in-flight document workflows; run seed_dataset first')
+        # A small hot set keeps the workers on the same rows
+        chosen = rng.sample(in_flight, min(options['hot'], len(in_flight)))
+        workflows = [pk for pk, _, _ in chosen]
+        documents = [(document_id, owner_id) for _, document_id, owner_id in chosen]
+        approvers = WorkflowStep.objects.filter(
+            workflow__document_workflows__in=workflows).values_list('approver_id', flat=True)
+        return {
+            'mix': mix,
+            'duration': options['duration'],
+            'think': options['think'],
+            'seed': options['seed'],
+            'documents': documents,
+            'workflows': workflows,
+            'user_ids': sorted({owner_id for _, owner_id in documents} | set(approvers)),
+        }
+
+    def aggregate(self, raw, options):
+        operations = {}
+        acknowledged = {'versions': 0, 'approvals': 0}
+        total = 0
+        for name in raw[0]['operations']:
+            latencies, statuses, errors = [], {}, {}
+            for worker in raw:
+                stats = worker['operations'][name]
+                latencies.extend(stats['latencies'])
+                for key, count in stats['statuses'].items():
+                    statuses[key] = statuses.get(key, 0) + count
+                for key, count in stats['errors'].items():
+                    errors[key] = errors.get(key, 0) + count
+            if not latencies:
+                continue
+            for status, count in statuses.items():
+                if int(status) >= 400:
+                    errors[f'http_{status}'] = errors.get(f'http_{status}', 0) + count
+            ok = sum(count for status, count in statuses.items() if int(status) < 400)
+            if name in ('create_version', 'upload'):
+                acknowledged['versions'] += statuses.get('201', 0)
+            elif name == 'approve_step':
+                acknowledged['approvals'] += statuses.get('200', 0)
+            total += len(latencies)
+            row = latency_summary(latencies)
+            row.update({'requests': len(latencies), 'ok': ok,
+                        'ok_per_second': round(ok / options['duration'], 2),
+                        'statuses': statuses, 'errors': errors})
+            operations[name] = row
+
+        lock_seconds = sum(worker['lock_wait']['seconds'] for worker in raw)
+        errors = {}
+        for row in operations.values():
+            for key, count in row['errors'].items():
+                errors[key] = errors.get(key, 0) + count
+        return {
+            'requests': total,
+            'requests_per_second': round(total / options['duration'], 2),
+            'operations': operations,
+            'errors': errors,
+            'error_rate': round(sum(errors.values()) / total, 4) if total else 0.0,
+            'lock_wait': {
+                'seconds': round(lock_seconds, 4),
+                'waits': sum(worker['lock_wait']['waits'] for worker in raw),
+                'longest_ms': round(max(worker['lock_wait']['longest'] for worker in raw) * 1000, 3),
+                'per_request_ms': round(lock_seconds / total * 1000, 3) if total else 0.0,
+            },
+            'acknowledged': acknowledged,
+        }
+
+    def report(self, results):
+        options = results['options']
+        self.stdout.write(f'{options["processes"] or 1} workers for {options["duration"]:.1f}s: '
+                          f'{results["requests"]} requests, {results["requests_per_second"]:.1f}/s, '
+                          f'error rate {results["error_rate"] * 100:.2f}%')
+        self.stdout.write(f'{"operation":<16}{"requests":>9}{"ok/s":>8}{"p50 ms":>9}{"p99 ms":>9}'
+                          f'  errors')
+        for name, row in results['operations'].items():
+            errors = ', '.join(f'{key} {count}' for key, count in sorted(row['errors'].items())) or '-'
+            self.stdout.write(f'{name:<16}{row["requests"]:>9}{row["ok_per_second"]:>8.1f}'
+                              f'{row["p50_ms"]:>9.2f}{row["p99_ms"]:>9.2f}  {errors}')
+        lock = results['lock_wait']
+        self.stdout.write(f'lock wait: {lock["seconds"]:.3f}s over {lock["waits"]} waits, '
+                          f'{lock["per_request_ms"]:.2f} ms per request, longest {lock["longest_ms"]:.1f} ms')
+        violations = results['invariants']
+        line = ', '.join(f'{key.replace("_", " ")} {count}' for key, count in violations.items())
+        if any(violations.values()):
+            self.stdout.write(self.style.ERROR(f'invariant violations: {line}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'invariants hold: {line}'))
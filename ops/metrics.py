@@ -0,0 +1,169 @@
+"""Per-request timings and per-endpoint histograms.
+
+Counters live in the process; each worker exposes its own at /api/_metrics,
+so scrape every worker (or run one metrics worker per host) and sum them.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.serializers import BaseSerializer
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    # Bearer token the scraper must send; without one only METRICS_IPS may scrape
+    'TOKEN': None,
+    'METRICS_IPS': ('127.0.0.1', '::1'),
+}
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Queries kept in a profiled request's SQL trace
+MAX_TRACED_QUERIES = 5000
+
+
+def metrics_setting(name):
+    return getattr(settings, 'OPS_METRICS', {}).get(name, DEFAULTS[name])
+
+
+class RequestTimings:
+    __slots__ = ('started', 'view_started', 'queries', 'db_seconds', 'serializer_seconds',
+                 'serializer_depth', 'trace', 'profile_baseline')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        # A list while the request is being profiled: (alias, sql, many, seconds)
+        self.trace = None
+        self.profile_baseline = (0, 0.0)
+
+
+current_timings = contextvars.ContextVar('ops_request_timings', default=None)
+
+
+def record_queries(execute, sql, params, many, context):
+    # Installed on every connection; does nothing outside an instrumented request
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.queries += 1
+        timings.db_seconds += elapsed
+        if timings.trace is not None and len(timings.trace) < MAX_TRACED_QUERIES:
+            timings.trace.append((context['connection'].alias, sql, many, elapsed))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # connection_created fires again after every reconnect of the same wrapper
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+_serializer_data = BaseSerializer.data
+
+
+def _timed_serializer_data(self):
+    timings = current_timings.get()
+    if timings is None:
+        return _serializer_data.fget(self)
+    # Only the outermost .data counts; nested serializers run inside it
+    timings.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        timings.serializer_depth -= 1
+        if not timings.serializer_depth:
+            timings.serializer_seconds += time.perf_counter() - started
+
+
+def install_serializer_timer():
+    BaseSerializer.data = property(_timed_serializer_data)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+HISTOGRAMS = (
+    ('ecms_request_duration_seconds', 'Wall time of the request', DURATION_BUCKETS),
+    ('ecms_request_view_seconds', 'Time spent in the view, including rendering', DURATION_BUCKETS),
+    ('ecms_request_db_seconds', 'Time spent executing SQL', DURATION_BUCKETS),
+    ('ecms_request_db_queries', 'SQL queries executed', QUERY_BUCKETS),
+    ('ecms_request_serializer_seconds', 'Time spent in serializer .data', DURATION_BUCKETS),
+    ('ecms_response_bytes', 'Response body bytes sent, after compression', SIZE_BUCKETS),
+)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.endpoints = {}
+        self.responses = {}
+
+    def observe(self, method, view, status, values):
+        with self._lock:
+            histograms = self.endpoints.get((method, view))
+            if histograms is None:
+                histograms = self.endpoints[(method, view)] = [Histogram(buckets)
+                                                               for _, _, buckets in HISTOGRAMS]
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+            key = (method, view, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            endpoints = {key: [(list(h.counts), h.total, h.count) for h in histograms]
+                         for key, histograms in self.endpoints.items()}
+            responses = dict(self.responses)
+
+        lines = ['# HELP ecms_requests_total Requests by endpoint and status',
+                 '# TYPE ecms_requests_total counter']
+        for (method, view, status), count in sorted(responses.items()):
+            lines.append(f'ecms_requests_total{{method="{method}",view="{view}",status="{status}"}} {count}')
+        for index, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (method, view), histograms in sorted(endpoints.items()):
+                counts, total, count = histograms[index]
+                labels = f'method="{method}",view="{view}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
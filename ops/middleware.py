@@ -0,0 +1,234 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError
+
+from users.authentication import token_user
+from .metrics import RequestTimings, current_timings, metrics_setting, registry
+from .profiling import MODES, profiling_setting, start_profiler, store_profile
+
+
+logger = logging.getLogger(__name__)
+
+
+class CountedBody:
+    # Counts a streamed body as it is sent; records the sample once closed
+    def __init__(self, content, record):
+        self.content = content
+        self.record = record
+        self.size = 0
+
+    def close(self):
+        if self.record is not None:
+            self.record(self.size)
+            self.record = None
+
+
+class CountedStream(CountedBody):
+    def __iter__(self):
+        for chunk in self.content:
+            self.size += len(chunk)
+            yield chunk
+
+
+class AsyncCountedStream(CountedBody):
+    # No __iter__: responses take anything iterable as a sync stream
+    async def __aiter__(self):
+        async for chunk in self.content:
+            self.size += len(chunk)
+            yield chunk
+
+
+class RequestMetricsMiddleware:
+    """Time each request, its SQL and serializers; report via Server-Timing and /api/_metrics."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = metrics_setting('ENABLED')
+        self.server_timing = metrics_setting('SERVER_TIMING')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def finish(self, request, response, timings):
+        ended = time.perf_counter()
+        total = ended - timings.started
+        view = ended - timings.view_started if timings.view_started else 0.0
+        match = request.resolver_match
+
+        def record(size):
+            registry.observe(request.method, match.view_name if match else 'unmatched',
+                             response.status_code,
+                             (total, view, timings.db_seconds, timings.queries,
+                              timings.serializer_seconds, size))
+
+        if not response.streaming:
+            record(len(response.content))
+        elif response.has_header('Content-Length'):
+            # Left alone so FileResponse keeps the server's sendfile path
+            record(int(response['Content-Length']))
+        else:
+            # Compressed downloads and event streams: counted as they are sent,
+            # recorded when the response is closed
+            stream = AsyncCountedStream if response.is_async else CountedStream
+            response.streaming_content = stream(response.streaming_content, record)
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'db;desc="{timings.queries} queries";dur={timings.db_seconds * 1000:.1f}',
+                f'ser;dur={timings.serializer_seconds * 1000:.1f}',
+                f'view;dur={view * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile requests asked for by staff (or sampled) and store the results.
+
+    Sits after AuthenticationMiddleware so session users are known; bearer
+    tokens are resolved here, and only when the profiling header is sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = profiling_setting('HEADER')
+        self.default_mode = profiling_setting('MODE')
+        self.sample_rate = profiling_setting('SAMPLE_RATE')
+        self.sample_mode = profiling_setting('SAMPLE_MODE')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def requested(self, request):
+        value = request.headers.get(self.header)
+        if value is not None:
+            return (value if value in MODES else self.default_mode), 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.sample_mode, 'sample'
+        return None, None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode, trigger = self.requested(request)
+        if mode is None:
+            return self.get_response(request)
+        user = staff_user(request) if trigger == 'header' else None
+        if trigger == 'header' and user is None:
+            return self.get_response(request)
+
+        timings, token = self.begin()
+        profiler = start_profiler(mode)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            if token is not None:
+                current_timings.reset(token)
+        return self.finish(request, response, timings, profiler, mode, trigger, user, duration)
+
+    async def __acall__(self, request):
+        mode, trigger = self.requested(request)
+        if mode is None:
+            return await self.get_response(request)
+        user = await sync_to_async(staff_user)(request) if trigger == 'header' else None
+        if trigger == 'header' and user is None:
+            return await self.get_response(request)
+
+        # Both profilers watch the event loop thread, so concurrent
+        # requests on the same loop show up in the profile as well; a sync
+        # view's worker thread is attached in process_view
+        timings, token = self.begin()
+        profiler = request.profiler = start_profiler(mode)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+            # Runs in the same thread-sensitive worker as the view
+            await sync_to_async(profiler.detach)()
+            duration = time.perf_counter() - started
+            if token is not None:
+                current_timings.reset(token)
+        return await sync_to_async(self.finish)(request, response, timings, profiler, mode, trigger,
+                                                user, duration)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this runs in the worker thread the sync view will run in
+        profiler = getattr(request, 'profiler', None)
+        if profiler is not None and not iscoroutinefunction(view_func):
+            profiler.attach()
+
+    def begin(self):
+        # Reuse the metrics middleware's timings; start our own when it is off
+        timings = current_timings.get()
+        token = None
+        if timings is None:
+            timings = RequestTimings()
+            token = current_timings.set(timings)
+        timings.trace = []
+        # Queries made before this point (resolving the token) are not part of the profile
+        timings.profile_baseline = (timings.queries, timings.db_seconds)
+        return timings, token
+
+    def finish(self, request, response, timings, profiler, mode, trigger, user, duration):
+        if user is None:
+            user = getattr(request, 'user', None)
+        try:
+            profile = store_profile(request, response, timings, profiler, mode, trigger, user, duration)
+        except (OSError, DatabaseError):
+            # A profile is never worth failing the request for
+            logger.exception('Could not store the profile of %s %s', request.method, request.path)
+        else:
+            response['X-Profile-Id'] = str(profile.pk)
+        finally:
+            timings.trace = None
+        return response
+
+
+def staff_user(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        user = token_user(request)
+    return user if user is not None and user.is_staff else None
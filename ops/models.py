@@ -0,0 +1,62 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+
+class RequestProfile(models.Model):
+    MODE_CHOICES = (
+        ('cprofile', 'Deterministic (cProfile)'),
+        ('sampling', 'Sampling'),
+    )
+    TRIGGER_CHOICES = (
+        ('header', 'Requested'),
+        ('sample', 'Sampled'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=255, blank=True)
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    db_ms = models.FloatField()
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='request_profiles')
+    # Files in OPS_PROFILING['ROOT']: <name>.prof (cProfile) or <name>.folded
+    # (sampled stacks), plus <name>.sql.json
+    name = models.CharField(max_length=64, unique=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    class Meta:
+        ordering = ['-id']
+
+
+class SlowQuery(models.Model):
+    # sha1 of the normalized SQL
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()
+    params_shape = models.CharField(max_length=255, blank=True)
+    # Innermost view or serializer method on the stack, and the nearest project line
+    caller = models.CharField(max_length=255, blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    plan = models.TextField(blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField()
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def __str__(self):
+        return f"{self.sql[:80]} ({self.count}x, {self.total_ms:.0f} ms)"
+
+    class Meta:
+        ordering = ['-total_ms']
+        verbose_name_plural = 'slow queries'
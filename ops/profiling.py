@@ -0,0 +1,192 @@
+"""On-demand request profiles.
+
+A request is profiled when a staff user sends the OPS_PROFILING['HEADER']
+header (``cprofile`` or ``sampling``; anything else means MODE) or when it
+is picked at SAMPLE_RATE. The profile and the request's SQL trace go to
+files under ROOT, listed by RequestProfile rows; only the newest
+MAX_PROFILES are kept.
+
+cProfile records every call and slows the request down noticeably; the
+sampling profiler reads the request thread's stack every SAMPLE_INTERVAL
+from a helper thread and writes folded stacks for flame graph tools. Under
+ASGI a sync view runs in a worker thread rather than the event loop's, so
+that thread is attached to the profile for the duration of the view.
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import uuid
+
+from django.conf import settings
+
+from .models import RequestProfile
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'HEADER': 'X-Profile',
+    # Mode for a header without a recognised value
+    'MODE': 'cprofile',
+    # Share of all requests profiled without being asked, and how
+    'SAMPLE_RATE': 0.0,
+    'SAMPLE_MODE': 'sampling',
+    'SAMPLE_INTERVAL': 0.002,
+    'ROOT': os.path.join(settings.BASE_DIR, 'profiles'),
+    'MAX_PROFILES': 200,
+}
+
+MODES = ('cprofile', 'sampling')
+EXTENSIONS = {'cprofile': '.prof', 'sampling': '.folded'}
+
+
+def profiling_setting(name):
+    return getattr(settings, 'OPS_PROFILING', {}).get(name, DEFAULTS[name])
+
+
+class SamplingProfiler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._targets = set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._targets.add(threading.get_ident())
+        self._thread = threading.Thread(target=self._run, name='ops-sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def attach(self):
+        # Sample the calling thread as well, until detach
+        self._targets.add(threading.get_ident())
+
+    def detach(self):
+        self._targets.discard(threading.get_ident())
+
+    def disable(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for target in list(self._targets):
+                frame = frames.get(target)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack = ';'.join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    def dump_stats(self, path):
+        with open(path, 'w') as handle:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                handle.write(f'{stack} {count}\n')
+
+
+class CallProfiler:
+    # cProfile only watches the thread that enables it (before Python 3.12),
+    # so each attached thread gets a profile of its own; they are dumped as one
+    def __init__(self):
+        self.profiles = {}
+
+    def enable(self):
+        self.attach()
+
+    def attach(self):
+        ident = threading.get_ident()
+        if ident in self.profiles:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: the first profile already sees every thread
+            return
+        self.profiles[ident] = profile
+
+    def detach(self):
+        profile = self.profiles.get(threading.get_ident())
+        if profile is not None:
+            profile.disable()
+
+    def disable(self):
+        self.detach()
+
+    def dump_stats(self, path):
+        first, *others = self.profiles.values()
+        if not others:
+            first.dump_stats(path)
+            return
+        stats = pstats.Stats(first)
+        for profile in others:
+            stats.add(profile)
+        stats.dump_stats(path)
+
+
+def start_profiler(mode):
+    if mode == 'sampling':
+        profiler = SamplingProfiler(profiling_setting('SAMPLE_INTERVAL'))
+    else:
+        profiler = CallProfiler()
+    profiler.enable()
+    return profiler
+
+
+def profile_path(name, kind):
+    """Path of a stored profile file; ``kind`` is a mode or 'sql'."""
+    extension = '.sql.json' if kind == 'sql' else EXTENSIONS[kind]
+    return os.path.join(profiling_setting('ROOT'), name + extension)
+
+
+def store_profile(request, response, timings, profiler, mode, trigger, user, duration):
+    """Write the profile and SQL trace, record them, and drop the oldest beyond the cap."""
+    root = profiling_setting('ROOT')
+    os.makedirs(root, exist_ok=True)
+    name = uuid.uuid4().hex
+    profiler.dump_stats(profile_path(name, mode))
+    trace = timings.trace or []
+    with open(profile_path(name, 'sql'), 'w') as handle:
+        json.dump([{'alias': alias, 'sql': sql, 'many': many, 'ms': round(seconds * 1000, 3)}
+                   for alias, sql, many, seconds in trace], handle, indent=1)
+
+    match = request.resolver_match
+    queries, db_seconds = timings.profile_baseline
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:2048],
+        view_name=match.view_name if match else '',
+        status=response.status_code,
+        duration_ms=duration * 1000,
+        queries=timings.queries - queries,
+        db_ms=(timings.db_seconds - db_seconds) * 1000,
+        mode=mode,
+        trigger=trigger,
+        user=user if user is not None and user.is_authenticated else None,
+        name=name,
+    )
+    prune_profiles(profiling_setting('MAX_PROFILES'))
+    return profile
+
+
+def prune_profiles(keep):
+    stale = list(RequestProfile.objects.order_by('-id').values_list('pk', 'name', 'mode')[keep:])
+    if not stale:
+        return 0
+    RequestProfile.objects.filter(pk__in=[pk for pk, _, _ in stale]).delete()
+    for _, name, mode in stale:
+        for kind in (mode, 'sql'):
+            try:
+                os.remove(profile_path(name, kind))
+            except FileNotFoundError:
+                pass
+    return len(stale)
@@ -0,0 +1,232 @@
+"""Slow-query log.
+
+Every statement taking at least OPS_SLOW_QUERIES['THRESHOLD_MS'] is
+fingerprinted (literals and placeholders folded, IN lists collapsed) and
+added up in the process together with its parameter shape, the view or
+serializer it came from and, on SQLite, its EXPLAIN QUERY PLAN. The totals
+are written to SlowQuery rows when a request finishes, so the admin can
+rank statements by total time across requests and workers.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.views import APIView
+
+from .models import SlowQuery
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+}
+
+# Statements EXPLAIN QUERY PLAN is run for; it only plans, nothing is executed
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w".])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES = re.compile(r'VALUES\s*\(\?\)(?:\s*,\s*\(\?\))+|VALUES\s*(\([?,\s]+\))(?:\s*,\s*\1)+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_SPACE = re.compile(r'\s+')
+
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+# The execute wrappers themselves are never the caller
+_SKIPPED_PATHS = (os.path.splitext(__file__)[0], os.path.join(os.path.dirname(__file__), 'metrics'),
+                  os.sep + 'site-packages' + os.sep)
+
+# Set while the log runs its own statements (plans, flushes) so they aren't logged
+_suspended = contextvars.ContextVar('ops_slow_queries_suspended', default=False)
+
+
+def slow_query_setting(name):
+    return getattr(settings, 'OPS_SLOW_QUERIES', {}).get(name, DEFAULTS[name])
+
+
+def normalize(sql):
+    """SQL with its values replaced by ``?`` and repeated lists folded."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _SAVEPOINT.sub('"s?"', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _LIST.sub('(...)', sql)
+    return _VALUES.sub(lambda match: 'VALUES ' + (match.group(1) or '(?)') + ', ...', sql)
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def params_shape(params, many):
+    """Types of the parameters with runs folded, e.g. ``(int, str*3)``."""
+    if many:
+        if not isinstance(params, (list, tuple)):
+            return 'many'
+        return f'{params_shape(params[0], False) if params else "()"} x{len(params)}'
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in params.items()) + '}'
+    runs = []
+    for value in params:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return '(' + ', '.join(name if count == 1 else f'{name}*{count}' for name, count in runs) + ')'
+
+
+def find_caller():
+    """The innermost serializer or view method on the stack, and the nearest project line under the view."""
+    caller = location = ''
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not location and filename.startswith(_PROJECT_ROOT) and not filename.startswith(_SKIPPED_PATHS):
+            location = f'{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.f_lineno}'
+        instance = frame.f_locals.get('self')
+        if isinstance(instance, BaseSerializer) and not caller:
+            serializer = instance.child if isinstance(instance, ListSerializer) else instance
+            caller = f'{type(serializer).__name__}.{frame.f_code.co_name}'
+        elif isinstance(instance, APIView):
+            view = type(instance)
+            caller = caller or f'{view.__name__}.{getattr(instance, "action", None) or frame.f_code.co_name}'
+            if not location:
+                # Generic views run their queries in DRF code; point at the view's module
+                module_file = getattr(sys.modules.get(view.__module__), '__file__', None) or ''
+                if module_file.startswith(_PROJECT_ROOT):
+                    location = os.path.relpath(module_file, _PROJECT_ROOT)
+            break
+        frame = frame.f_back
+    return caller[:255], location[:255]
+
+
+def explain(connection, sql, params):
+    """EXPLAIN QUERY PLAN as an indented tree (SQLite only)."""
+    if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith(EXPLAINED):
+        return ''
+    # The backend cursor skips the execute wrappers and the debug query log
+    with connection.cursor() as cursor:
+        cursor.cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        rows = cursor.cursor.fetchall()
+    depths = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append('  ' * depths[node] + detail)
+    return '\n'.join(lines)
+
+
+class SlowQueryLog:
+    """Per-process totals for slow statements, waiting to be written."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = {}
+
+    def record(self, connection, sql, params, many, seconds, failed):
+        normalized = normalize(sql)
+        key = fingerprint(normalized)
+        caller, location = find_caller()
+        plan = ''
+        if not failed and not many and slow_query_setting('EXPLAIN'):
+            token = _suspended.set(True)
+            try:
+                plan = explain(connection, sql, params)
+            except Exception:
+                # A statement the planner can't take on its own; log it without a plan
+                pass
+            finally:
+                _suspended.reset(token)
+        with self._lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = self.pending[key] = {'sql': normalized, 'count': 0, 'total': 0.0, 'max': 0.0}
+            entry.update({'params_shape': params_shape(params, many)[:255], 'caller': caller,
+                          'location': location, 'last_seen': timezone.now()})
+            if plan:
+                entry['plan'] = plan
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+
+    def flush(self, using='default'):
+        """Add the pending totals to the SlowQuery rows; returns how many were written."""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        token = _suspended.set(True)
+        try:
+            for key, entry in pending.items():
+                fields = {field: entry[field] for field in ('params_shape', 'caller', 'location',
+                                                            'last_seen') if entry[field]}
+                if 'plan' in entry:
+                    fields['plan'] = entry['plan']
+                queryset = SlowQuery.objects.using(using).filter(fingerprint=key)
+                updates = dict(fields, count=F('count') + entry['count'],
+                               total_ms=F('total_ms') + entry['total'] * 1000,
+                               max_ms=Greatest(F('max_ms'), entry['max'] * 1000))
+                if queryset.update(**updates):
+                    continue
+                try:
+                    with transaction.atomic(using=using):
+                        SlowQuery.objects.using(using).create(
+                            fingerprint=key, sql=entry['sql'], count=entry['count'],
+                            total_ms=entry['total'] * 1000, max_ms=entry['max'] * 1000, **fields)
+                except IntegrityError:
+                    # Another worker created it first
+                    queryset.update(**updates)
+        finally:
+            _suspended.reset(token)
+        return len(pending)
+
+
+log = SlowQueryLog()
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    if _suspended.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    except Exception:
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= slow_query_setting('THRESHOLD_MS'):
+            log.record(context['connection'], sql, params, many, elapsed, failed=True)
+        raise
+    elapsed = time.perf_counter() - started
+    if elapsed * 1000 >= slow_query_setting('THRESHOLD_MS'):
+        log.record(context['connection'], sql, params, many, elapsed, failed=False)
+    return result
+
+
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    if record_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_queries)
+
+
+def flush_slow_queries(sender, **kwargs):
+    if not log.pending:
+        return
+    try:
+        log.flush()
+    except DatabaseError:
+        logger.exception('Could not write the slow-query log')
@@ -0,0 +1,220 @@
+"""Concurrent mixed traffic against one database from several worker processes.
+
+Each worker is a separate process with its own Django setup and database
+connections, like a WSGI/ASGI worker, and drives the app through the test
+client. Models are only imported once a worker has called django.setup().
+"""
+import random
+import time
+
+import django
+from django.db import IntegrityError, OperationalError
+
+from .benchmark import client_settings, token_client
+
+
+OPERATIONS = ('read', 'create_version', 'upload', 'approve_step')
+DEFAULT_MIX = {'read': 60, 'create_version': 15, 'upload': 10, 'approve_step': 15}
+
+
+def parse_mix(value):
+    """Parse ``read=60,approve_step=15`` into operation weights."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'Unknown operation {name!r}')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def classify(error):
+    message = str(error).lower()
+    if isinstance(error, OperationalError) and ('locked' in message or 'busy' in message):
+        return 'locked'
+    if isinstance(error, IntegrityError):
+        return 'integrity'
+    return type(error).__name__
+
+
+class LockTimer:
+    """Execute wrapper adding up the time spent waiting for SQLite's write lock.
+
+    With immediate transactions the wait happens in BEGIN; statements that
+    give up on a lock after busy_timeout count as waiting too.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.longest = 0.0
+        self.waits = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except OperationalError as e:
+            if classify(e) == 'locked':
+                self.add(time.perf_counter() - started)
+            raise
+        if sql.startswith('BEGIN'):
+            self.add(time.perf_counter() - started)
+        return result
+
+    def add(self, seconds):
+        self.seconds += seconds
+        self.longest = max(self.longest, seconds)
+        self.waits += 1
+
+
+class Worker:
+    def __init__(self, index, plan):
+        from django.contrib.auth.models import User
+
+        self.rng = random.Random(plan['seed'] * 1000 + index)
+        self.plan = plan
+        self.users = {user.pk: user for user in User.objects.filter(pk__in=plan['user_ids'])
+                      .select_related('profile')}
+        self.clients = {}
+        self.stats = {name: {'latencies': [], 'statuses': {}, 'errors': {}} for name in OPERATIONS}
+        self.operations = [name for name in OPERATIONS if plan['mix'].get(name)]
+        self.weights = [plan['mix'][name] for name in self.operations]
+
+    def client_for(self, user_id):
+        if user_id not in self.clients:
+            self.clients[user_id] = token_client(self.users[user_id])
+        return self.clients[user_id]
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            name = self.rng.choices(self.operations, self.weights)[0]
+            started = time.perf_counter()
+            stats = self.stats[name]
+            try:
+                response = getattr(self, name)()
+            except Exception as e:
+                # The test client re-raises what the view raised: a 500 in production
+                kind = classify(e)
+                stats['errors'][kind] = stats['errors'].get(kind, 0) + 1
+            else:
+                if response is None:
+                    continue
+                status = str(response.status_code)
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['latencies'].append(time.perf_counter() - started)
+            if self.plan['think']:
+                time.sleep(self.rng.uniform(0, self.plan['think']))
+
+    def read(self):
+        from django.urls import reverse
+
+        pk, owner_id = self.rng.choice(self.plan['documents'])
+        if self.rng.random() < 0.5:
+            return self.client_for(owner_id).get(reverse('document-detail', args=[pk]))
+        return self.client_for(owner_id).get(reverse('document-list'))
+
+    def create_version(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.urls import reverse
+
+        pk, owner_id = self.rng.choice(self.plan['documents'])
+        return self.client_for(owner_id).post(
+            reverse('document-create-version', args=[pk]),
+            {'file': SimpleUploadedFile('stress.bin', b's' * 1024), 'comment': 'Stress version'},
+            format='multipart',
+        )
+
+    def upload(self):
+        from django.urls import reverse
+
+        pk, owner_id = self.rng.choice(self.plan['documents'])
+        url = reverse('document-version-upload', args=[pk])
+        return self.client_for(owner_id).put(f'{url}?filename=stress-upload.bin', b'u' * 1024,
+                                             content_type='application/octet-stream')
+
+    def approve_step(self):
+        from django.urls import reverse
+        from workflows.models import DocumentWorkflow
+
+        # Like a client: look at the workflow, then act on what it saw
+        pk = self.rng.choice(self.plan['workflows'])
+        approver_id = (DocumentWorkflow.objects.filter(pk=pk, status='in_progress')
+                       .values_list('current_step__approver_id', flat=True).first())
+        if approver_id is None or approver_id not in self.users:
+            return None
+        return self.client_for(approver_id).post(
+            reverse('documentworkflow-approve-step', args=[pk]), {'comments': 'Stress approval'})
+
+
+def run_worker(index, plan, start_at):
+    """Entry point of a worker process; returns its raw statistics."""
+    django.setup()
+    from django.db import connection
+
+    timer = LockTimer()
+    with client_settings(), connection.execute_wrapper(timer):
+        worker = Worker(index, plan)
+        # Start together so the workers actually contend
+        time.sleep(max(0.0, start_at - time.time()))
+        worker.run(time.monotonic() + plan['duration'])
+    connection.close()
+    return {'operations': worker.stats,
+            'lock_wait': {'seconds': timer.seconds, 'longest': timer.longest, 'waits': timer.waits}}
+
+
+def snapshot(plan):
+    """Counts the invariants are checked against after the run."""
+    from documents.models import Version
+    from workflows.models import WorkflowStepApproval
+
+    return {
+        'versions': Version.objects.filter(document__in=[pk for pk, _ in plan['documents']]).count(),
+        'approvals': WorkflowStepApproval.objects.filter(document_workflow__in=plan['workflows'],
+                                                         approved=True).count(),
+    }
+
+
+def check_invariants(plan, before, acknowledged):
+    """Return violation counts for the documents and workflows under test.
+
+    ``acknowledged`` holds the number of successful version writes and
+    approvals the clients were told about.
+    """
+    from django.db.models import Count
+    from documents.models import Version
+    from workflows.models import DocumentWorkflow
+
+    after = snapshot(plan)
+    document_ids = [pk for pk, _ in plan['documents']]
+    duplicate_versions = (Version.objects.filter(document__in=document_ids)
+                          .values('document', 'version_number').annotate(rows=Count('id'))
+                          .filter(rows__gt=1).count())
+
+    # Approved steps must be exactly the ones before the current step
+    # (all of them once approved); anything else skipped or repeated a step
+    inconsistent = 0
+    for document_workflow in (DocumentWorkflow.objects.filter(pk__in=plan['workflows'])
+                              .select_related('current_step').prefetch_related('workflow__steps',
+                                                                               'step_approvals')):
+        if document_workflow.status == 'rejected':
+            continue
+        approved = {a.step_id for a in document_workflow.step_approvals.all() if a.approved}
+        steps = document_workflow.workflow.steps.all()
+        if document_workflow.status == 'approved':
+            expected = {step.pk for step in steps}
+        elif document_workflow.current_step is None:
+            inconsistent += 1
+            continue
+        else:
+            expected = {step.pk for step in steps if step.order < document_workflow.current_step.order}
+        if approved != expected:
+            inconsistent += 1
+
+    return {
+        'duplicate_version_numbers': duplicate_versions,
+        'inconsistent_workflows': inconsistent,
+        # More successes reported than rows written: two requests took the same decision
+        'double_approvals': max(0, acknowledged['approvals'] - (after['approvals'] - before['approvals'])),
+        'lost_versions': max(0, acknowledged['versions'] - (after['versions'] - before['versions'])),
+    }
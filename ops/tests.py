@@ -0,0 +1,327 @@
+import json
+import os
+import pstats
+import re
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from users.revocation import revocation_index
+from users.serializers import ECMSTokenObtainPairSerializer
+
+from documents.models import Document, Version
+
+from .backup import create_snapshot, load_manifest, object_path, verify_snapshot
+from .metrics import registry
+from .models import RequestProfile, SlowQuery
+from .profiling import profile_path
+from .slow_queries import log as slow_query_log, normalize, params_shape
+
+
+class SQLiteBenchmarkTest(SimpleTestCase):
+    def test_benchmark_reports_both_profiles(self):
+        """Test that the concurrency benchmark runs both SQLite profiles"""
+        out = StringIO()
+        call_command('bench_sqlite', writers=1, readers=2, duration=0.2, rows=200, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[2].startswith('baseline'))
+        self.assertTrue(lines[3].startswith('production'))
+
+
+class SnapshotTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = os.path.join(directory.name, 'backups')
+        self.media = os.path.join(directory.name, 'media')
+        self.database = os.path.join(directory.name, 'db.sqlite3')
+        
+        connection = sqlite3.connect(self.database)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT)')
+        connection.executemany('INSERT INTO note (body) VALUES (?)', [(f'note {i}',) for i in range(500)])
+        connection.commit()
+        connection.close()
+        for relative, content in (('documents/a.txt', b'alpha'), ('documents/b.txt', b'beta'),
+                                  ('thumbnails/a-copy.txt', b'alpha')):
+            self.write_media(relative, content)
+    
+    def write_media(self, relative, content):
+        path = os.path.join(self.media, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(content)
+    
+    def snapshot(self, name):
+        call_command('backup_snapshot', root=self.root, name=name, database_path=self.database,
+                     media_root=self.media, stdout=StringIO())
+        return load_manifest(self.root, name)
+    
+    def test_incremental_snapshots_only_copy_changes(self):
+        """Test that unchanged files are neither re-hashed nor copied again"""
+        _, stats = create_snapshot(self.root, self.database, self.media, name='first')
+        self.assertEqual((stats['files'], stats['hashed'], stats['copied']), (3, 3, 2))
+        
+        self.write_media('documents/b.txt', b'beta, edited')
+        self.write_media('documents/c.txt', b'gamma')
+        _, stats = create_snapshot(self.root, self.database, self.media, name='second')
+        self.assertEqual((stats['files'], stats['hashed'], stats['copied']), (4, 2, 2))
+        
+        manifest = load_manifest(self.root, 'second')
+        self.assertEqual(manifest['files']['documents/a.txt']['sha256'],
+                         manifest['files']['thumbnails/a-copy.txt']['sha256'])
+    
+    def test_restore_verifies_and_recreates_files(self):
+        """Test that a restore checks the manifest and rebuilds database and media"""
+        self.snapshot('nightly')
+        shutil.rmtree(self.media)
+        os.remove(self.database)
+        
+        call_command('restore_snapshot', 'nightly', root=self.root, database_path=self.database,
+                     media_root=self.media, stdout=StringIO())
+        with open(os.path.join(self.media, 'documents', 'b.txt'), 'rb') as handle:
+            self.assertEqual(handle.read(), b'beta')
+        connection = sqlite3.connect(self.database)
+        self.assertEqual(connection.execute('SELECT count(*) FROM note').fetchone()[0], 500)
+        connection.close()
+    
+    def test_corrupt_object_fails_verification(self):
+        """Test that a damaged object is reported and blocks the restore"""
+        manifest = self.snapshot('nightly')
+        digest = manifest['files']['documents/b.txt']['sha256']
+        with open(object_path(self.root, digest), 'wb') as handle:
+            handle.write(b'BETA')
+        self.assertEqual(len(verify_snapshot(self.root, 'nightly')), 1)
+        with self.assertRaises(CommandError):
+            call_command('restore_snapshot', 'nightly', root=self.root, verify_only=True,
+                         stdout=StringIO(), stderr=StringIO())
+
+
+class RequestMetricsTest(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='measured', password='testpassword')
+        Document.objects.create(title='Measured', created_by=self.user)
+        self.client.force_authenticate(user=self.user)
+    
+    def test_server_timing_reports_queries_and_serializer(self):
+        """Test that responses carry per-request database and serializer timings"""
+        response = self.client.get(reverse('document-list'))
+        timing = response['Server-Timing']
+        queries = int(re.search(r'db;desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+        for metric in ('ser;dur=', 'view;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+    
+    def test_metrics_endpoint_exposes_histograms(self):
+        """Test that per-endpoint histograms are exported in Prometheus text format"""
+        self.client.get(reverse('document-list'))
+        self.client.get(reverse('document-list'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('ecms_requests_total{method="GET",view="document-list",status="200"} 2', body)
+        self.assertIn('ecms_request_db_queries_count{method="GET",view="document-list"} 2', body)
+        self.assertIn('ecms_request_duration_seconds_bucket{method="GET",view="document-list",le="+Inf"} 2',
+                      body)
+    
+    def test_response_bytes_are_counted_after_compression(self):
+        """Test that response sizes are the compressed bytes, streamed bodies included"""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with self.settings(MEDIA_ROOT=media_root.name):
+            document = Document.objects.create(title='Measured file', created_by=self.user,
+                                               file=ContentFile(b'measured line\n' * 1000, name='m.txt'))
+            token = ECMSTokenObtainPairSerializer.get_token(self.user).access_token
+            response = self.client.get(reverse('document-download', args=[document.pk]),
+                                       HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            body = b''.join(response.streaming_content)
+            response.close()
+        histograms = registry.endpoints[('GET', 'document-download')]
+        self.assertEqual(histograms[-1].total, len(body))
+        self.assertLess(len(body), 14000)
+    
+    def test_metrics_token_is_required_when_configured(self):
+        """Test that a configured scrape token must be presented"""
+        with self.settings(OPS_METRICS={'TOKEN': 'scrape-secret'}):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+
+
+class ApiBenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        overridden = override_settings(MEDIA_ROOT=os.path.join(directory.name, 'media'))
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        call_command('seed_dataset', users=12, departments=2, documents=10, versions=2, workflows=1,
+                     steps=2, in_flight=4, file_size=64, stdout=StringIO())
+    
+    def test_seeded_dataset_is_benchmarked_without_side_effects(self):
+        """Test that every endpoint is measured and benchmark writes are rolled back"""
+        self.assertEqual(Version.objects.count(), 20)
+        output = os.path.join(self.directory, 'results.json')
+        call_command('bench_api', requests=3, warmup=1, output=output, stdout=StringIO())
+        with open(output) as handle:
+            results = json.load(handle)
+        
+        self.assertEqual(set(results['endpoints']), {'list', 'search', 'retrieve', 'download',
+                                                     'create_version', 'approve_step'})
+        for name, row in results['endpoints'].items():
+            self.assertEqual(row['errors'], 0, name)
+            self.assertGreater(row['queries_mean'], 0, name)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertEqual(Version.objects.count(), 20)
+        
+        out = StringIO()
+        call_command('bench_api', requests=2, warmup=0, endpoints='retrieve', compare=output, stdout=out)
+        self.assertIn('Change against the baseline run', out.getvalue())
+    
+    def test_stress_run_checks_invariants(self):
+        """Test that a stress run reports throughput, errors, lock waits and invariants"""
+        output = os.path.join(self.directory, 'stress.json')
+        call_command('stress_api', processes=0, duration=0.5, hot=2, output=output, stdout=StringIO())
+        with open(output) as handle:
+            results = json.load(handle)
+        self.assertGreater(results['requests'], 0)
+        self.assertIn('per_request_ms', results['lock_wait'])
+        self.assertEqual(set(results['invariants'].values()), {0})
+        with self.assertRaises(CommandError):
+            call_command('stress_api', processes=0, mix='read=1,delete=1', stdout=StringIO())
+    
+    def test_seeding_twice_requires_clear(self):
+        """Test that an existing seeded dataset is only replaced on request"""
+        with self.assertRaises(CommandError):
+            call_command('seed_dataset', users=12, departments=2, documents=5, stdout=StringIO())
+        call_command('seed_dataset', users=12, departments=2, documents=5, in_flight=2, clear=True,
+                     stdout=StringIO())
+        self.assertEqual(Document.objects.count(), 5)
+
+
+class RequestProfileTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        overridden = override_settings(OPS_PROFILING={'ROOT': self.root, 'MAX_PROFILES': 2})
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        
+        self.staff = User.objects.create_user(username='profiler', password='testpassword', is_staff=True)
+        Document.objects.create(title='Profiled', created_by=self.staff)
+        token = ECMSTokenObtainPairSerializer.get_token(self.staff).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def test_staff_header_stores_profile_and_sql_trace(self):
+        """Test that a staff request with the header is profiled with its SQL"""
+        response = self.client.get(reverse('document-list'), HTTP_X_PROFILE='cprofile')
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.view_name, profile.mode, profile.user), ('document-list', 'cprofile', self.staff))
+        self.assertGreater(profile.queries, 0)
+        self.assertGreater(pstats.Stats(profile_path(profile.name, 'cprofile')).total_calls, 0)
+        with open(profile_path(profile.name, 'sql')) as handle:
+            trace = json.load(handle)
+        self.assertEqual(len(trace), profile.queries)
+        self.assertTrue(any('"documents_document"' in query['sql'] for query in trace))
+    
+    async def test_asgi_profile_includes_the_sync_view(self):
+        """Test that under ASGI the worker thread running a sync view is profiled too"""
+        token = self.client._credentials['HTTP_AUTHORIZATION']
+        response = await AsyncClient().get(reverse('document-list'),
+                                           headers={'Authorization': token, 'X-Profile': 'cprofile'})
+        profile = await RequestProfile.objects.aget(pk=response['X-Profile-Id'])
+        functions = pstats.Stats(profile_path(profile.name, 'cprofile')).stats
+        self.assertTrue(any(filename.endswith(os.path.join('rest_framework', 'mixins.py')) and name == 'list'
+                            for filename, _, name in functions))
+    
+    def test_other_requests_are_not_profiled(self):
+        """Test that the header is ignored for non-staff users and absent without it"""
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('document-list')))
+        other = User.objects.create_user(username='curious', password='testpassword')
+        token = ECMSTokenObtainPairSerializer.get_token(other).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.get(reverse('document-list'), HTTP_X_PROFILE='cprofile')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+    
+    def test_ring_buffer_keeps_newest_profiles(self):
+        """Test that only MAX_PROFILES profiles and their files are kept"""
+        ids = [self.client.get(reverse('document-list'), HTTP_X_PROFILE='sampling')['X-Profile-Id']
+               for _ in range(3)]
+        self.assertEqual([str(pk) for pk in RequestProfile.objects.values_list('pk', flat=True)], ids[:0:-1])
+        self.assertEqual(len(os.listdir(self.root)), 4)
+    
+    def test_admin_lists_and_downloads_profiles(self):
+        """Test that staff can download a stored profile from the admin"""
+        profile_id = self.client.get(reverse('document-list'), HTTP_X_PROFILE='1')['X-Profile-Id']
+        admin_user = User.objects.create_superuser(username='root', password='testpassword')
+        self.client.force_login(admin_user)
+        self.assertEqual(self.client.get(reverse('admin:ops_requestprofile_changelist')).status_code, 200)
+        response = self.client.get(reverse('admin:ops_requestprofile_download', args=[profile_id, 'sql']))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'documents_document', b''.join(response.streaming_content))
+
+
+class SlowQueryLogTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.user = User.objects.create_user(username='slow', password='testpassword', is_staff=True)
+        self.document = Document.objects.create(title='Quarterly report', created_by=self.user)
+        token = ECMSTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        slow_query_log.pending.clear()
+    
+    def test_statements_are_fingerprinted(self):
+        """Test that statements differing only in values share a fingerprint"""
+        first = normalize('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'a\' LIMIT 21')
+        second = normalize('SELECT *  FROM "t" WHERE "id" IN (%s) AND "name" = \'b\'\nLIMIT 3')
+        self.assertEqual(first, 'SELECT * FROM "t" WHERE "id" IN (...) AND "name" = ? LIMIT ?')
+        self.assertEqual(normalize('SELECT * FROM "t" WHERE "id" IN (%s, %s)'),
+                         'SELECT * FROM "t" WHERE "id" IN (...)')
+        self.assertNotEqual(first, second)
+        self.assertEqual(params_shape([1, 2, 3, 'a', None], False), '(int*3, str, NoneType)')
+        self.assertEqual(params_shape([(1, 'a'), (2, 'b')], True), '(int, str) x2')
+    
+    @override_settings(OPS_SLOW_QUERIES={'THRESHOLD_MS': 0})
+    def test_slow_queries_are_logged_with_caller_and_plan(self):
+        """Test that slow statements are grouped with their caller and query plan"""
+        for _ in range(2):
+            self.client.get(reverse('document-list'), {'search': 'report'})
+        self.client.get(reverse('document-versions', args=[self.document.pk]))
+        
+        search = SlowQuery.objects.get(sql__contains='LIKE', sql__startswith='SELECT "documents_document"')
+        self.assertEqual(search.count, 2)
+        self.assertEqual((search.caller, search.location), ('DocumentViewSet.list', 'documents/views.py'))
+        self.assertIn('documents_document', search.plan)
+        self.assertIn('str', search.params_shape)
+        versions = SlowQuery.objects.get(sql__startswith='SELECT "documents_version"',
+                                         sql__contains='"document_id" = ?')
+        self.assertIn('ORDER BY "documents_version"."version_number"', versions.sql)
+        self.assertEqual(versions.caller, 'VersionSerializer.to_representation')
+        self.assertTrue(versions.location.startswith('documents/views.py:'))
+        self.assertFalse(SlowQuery.objects.filter(sql__contains='EXPLAIN').exists())
+        
+        out = StringIO()
+        call_command('slow_queries', limit=3, plans=True, stdout=out)
+        self.assertTrue(out.getvalue().startswith('1. '))
+    
+    def test_fast_queries_are_not_logged(self):
+        """Test that statements under the threshold are not logged"""
+        self.client.get(reverse('document-list'), {'search': 'report'})
+        self.assertFalse(SlowQuery.objects.exists())
@@ -0,0 +1,17 @@
+import hmac
+
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import metrics_setting, registry
+
+
+def metrics(request):
+    # Plain Django view: scraping must not go through JWT auth or DRF rendering
+    token = metrics_setting('TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponseForbidden()
+    elif request.META.get('REMOTE_ADDR') not in metrics_setting('METRICS_IPS'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
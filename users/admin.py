@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile
+from .models import UserProfile, RevokedToken, TokenCutoff
 
 
 @admin.register(UserProfile)
@@ -7,3 +7,15 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'department')
     list_filter = ('role', 'department')
     search_fields = ('user__username', 'user__email', 'department')
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'revoked_at', 'expires_at')
+    search_fields = ('jti',)
+
+
+@admin.register(TokenCutoff)
+class TokenCutoffAdmin(admin.ModelAdmin):
+    list_display = ('user', 'valid_after', 'updated_at')
+    search_fields = ('user__username',)
@@ -0,0 +1,173 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .models import UserProfile, principal_cache_key
+from .revocation import check_token
+
+
+DEFAULTS = {
+    # Seconds a principal stays cached; saves to User/UserProfile invalidate it earlier
+    'PRINCIPAL_CACHE_TTL': 300,
+    # Build principals from the role claims in access tokens instead of the cache
+    'TRUST_TOKEN_CLAIMS': False,
+}
+
+# Claims added to tokens by users.serializers.ECMSTokenObtainPairSerializer
+PRINCIPAL_CLAIMS = ('username', 'role', 'department', 'is_staff', 'is_superuser')
+
+
+def auth_setting(name):
+    return getattr(settings, 'USERS_AUTH', {}).get(name, DEFAULTS[name])
+
+
+def build_principal(user):
+    # Everything UserDetailSerializer and the role checks read, as plain data
+    profile = getattr(user, 'profile', None)
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_active': user.is_active,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'profile': None if profile is None else {
+            'id': profile.pk,
+            'role': profile.role,
+            'department': profile.department,
+            'profile_picture': profile.profile_picture.name or None,
+        },
+    }
+
+
+def load_principal(user_id):
+    key = principal_cache_key(user_id)
+    principal = cache.get(key)
+    if principal is None:
+        try:
+            user = User.objects.select_related('profile').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        principal = build_principal(user)
+        cache.set(key, principal, auth_setting('PRINCIPAL_CACHE_TTL'))
+    return principal
+
+
+def principal_from_claims(validated_token):
+    return {
+        'id': validated_token[jwt_settings.USER_ID_CLAIM],
+        'username': validated_token['username'],
+        'is_active': True,
+        'is_staff': validated_token.get('is_staff', False),
+        'is_superuser': validated_token.get('is_superuser', False),
+        'profile': {
+            'role': validated_token['role'],
+            'department': validated_token.get('department'),
+        },
+    }
+
+
+def user_from_principal(principal, source):
+    # An unsaved-looking User/UserProfile pair; reading it never touches the
+    # database and the refuse_principal_save signal stops it being written
+    user = User(
+        id=principal['id'],
+        username=principal['username'],
+        email=principal.get('email', ''),
+        first_name=principal.get('first_name', ''),
+        last_name=principal.get('last_name', ''),
+        is_active=principal['is_active'],
+        is_staff=principal['is_staff'],
+        is_superuser=principal['is_superuser'],
+    )
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+    user.principal_source = source
+    if principal['profile'] is not None:
+        profile = UserProfile(user=user, **principal['profile'])
+        profile._state.adding = False
+        profile._state.db = DEFAULT_DB_ALIAS
+        user.profile = profile
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that serves read requests from a cached principal.
+
+    Write requests still load the full ``User`` row, so views that save
+    ``request.user`` keep working.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        # In-memory Bloom filter and cutoff map; the database is only asked on a filter hit
+        if check_token(validated_token, jwt_settings.USER_ID_CLAIM):
+            raise InvalidToken('Token has been revoked')
+        return validated_token
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method not in SAFE_METHODS:
+            return self.get_user(validated_token), validated_token
+        return self.get_principal_user(validated_token), validated_token
+
+    def get_principal_user(self, validated_token):
+        if auth_setting('TRUST_TOKEN_CLAIMS') and all(c in validated_token for c in PRINCIPAL_CLAIMS):
+            return user_from_principal(principal_from_claims(validated_token), 'token')
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        principal = load_principal(user_id)
+        if principal is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not principal['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user_from_principal(principal, 'cache')
+
+
+def get_raw_token(request, query_token=False):
+    # EventSource can't set headers, so views it calls may also accept a
+    # ?token= query parameter; everywhere else it would end up in logs and
+    # Referer headers, so only the Authorization header counts
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is not None:
+        return authentication.get_raw_token(header)
+    token = request.GET.get('token') if query_token else None
+    return token.encode() if token else None
+
+
+def token_user(request, query_token=False):
+    """Resolve the JWT of a plain Django request to a user, or None."""
+    authentication = CachedJWTAuthentication()
+    try:
+        raw_token = get_raw_token(request, query_token)
+        if raw_token is None:
+            return None
+        validated_token = authentication.get_validated_token(raw_token)
+        return authentication.get_principal_user(validated_token)
+    except (AuthenticationFailed, TokenError):
+        return None
+
+
+async def aauthenticate(request, query_token=False):
+    """Resolve the JWT of a non-DRF async view to a user, or None."""
+    # Revocation and principal lookups may need the database
+    return await sync_to_async(token_user)(request, query_token)
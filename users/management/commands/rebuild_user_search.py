@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import UserProfile, UserSearchTerm
+from users.search import build_terms
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the user autocomplete prefix index from the user and profile tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Profiles loaded per batch')
+
+    def handle(self, *args, **options):
+        rows = 0
+        with transaction.atomic():
+            UserSearchTerm.objects.all().delete()
+            batch = []
+            queryset = UserProfile.objects.select_related('user').order_by('pk')
+            for profile in queryset.iterator(chunk_size=options['chunk_size']):
+                batch.extend(build_terms(profile.user, profile))
+                if len(batch) >= 5000:
+                    UserSearchTerm.objects.bulk_create(batch)
+                    rows += len(batch)
+                    batch = []
+            UserSearchTerm.objects.bulk_create(batch)
+            rows += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} user search terms'))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:39
+
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copies of users.search.normalize and term_rows as of this migration,
+# so later changes to the app code don't change what it builds
+def normalize(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def term_rows(user, profile):
+    sources = {user.username, user.email, user.first_name, user.last_name,
+               f'{user.first_name} {user.last_name}'}
+    terms = {normalize(source)[:254] for source in sources}
+    terms.discard('')
+    full_name = f'{user.first_name} {user.last_name}'.strip()
+    label = f'{full_name} ({user.username})' if full_name else user.username
+    return [
+        {'term': term, 'user_id': user.pk, 'label': label, 'role': profile.role,
+         'department': profile.department, 'is_active': user.is_active}
+        for term in sorted(terms)
+    ]
+
+
+def build_search_index(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    UserSearchTerm = apps.get_model('users', 'UserSearchTerm')
+    batch = []
+    for profile in UserProfile.objects.select_related('user').iterator(chunk_size=2000):
+        batch.extend(UserSearchTerm(**row) for row in term_rows(profile.user, profile))
+        if len(batch) >= 5000:
+            UserSearchTerm.objects.bulk_create(batch)
+            batch = []
+    UserSearchTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_token_revocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=254)),
+                ('label', models.CharField(max_length=320)),
+                ('role', models.CharField(max_length=20)),
+                ('department', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term'], name='users_search_term_idx'), models.Index(fields=['role', 'term'], name='users_search_role_term_idx'), models.Index(fields=['department', 'term'], name='users_search_dept_term_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
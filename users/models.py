@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 
 
@@ -18,8 +19,43 @@ class UserProfile(models.Model):
     department = models.CharField(max_length=100, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     
+    # Fields compared against their loaded values to skip no-op writes
+    TRACKED_FIELDS = ('role', 'department', 'profile_picture')
+    
     def __str__(self):
         return f"{self.user.username}'s Profile"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = instance._tracked_values()
+        return instance
+    
+    def _tracked_values(self):
+        return {
+            'role': self.role,
+            'department': self.department,
+            'profile_picture': self.profile_picture.name or None,
+        }
+    
+    def changed_fields(self):
+        # None when the stored state is unknown (never loaded or saved here)
+        saved = getattr(self, '_saved_values', None)
+        if saved is None:
+            return None
+        current = self._tracked_values()
+        return [field for field in self.TRACKED_FIELDS if current[field] != saved[field]]
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._saved_values = self._tracked_values()
+    
+    def save_changes(self):
+        changed = self.changed_fields()
+        if changed is None:
+            self.save()
+        elif changed:
+            self.save(update_fields=changed)
 
 
 @receiver(post_save, sender=User)
@@ -29,5 +65,72 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    # Login timestamps and password updates leave the profile alone: only a
+    # profile already loaded on this user and actually modified is written
+    if not created and User.profile.is_cached(instance):
+        instance.profile.save_changes()
+
+
+
+def principal_cache_key(user_id):
+    return f'users:principal:{user_id}'
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    cache.delete(principal_cache_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_principal(sender, instance, **kwargs):
+    cache.delete(principal_cache_key(instance.user_id))
+
+
+@receiver(pre_save, sender=User)
+def refuse_principal_save(sender, instance, **kwargs):
+    # Cached principals only carry a subset of the user's columns (no password);
+    # saving one would overwrite the real row
+    if getattr(instance, 'principal_source', None):
+        raise RuntimeError('Cached principals are read-only; load the user from the database to save it')
+
+
+class RevokedToken(models.Model):
+    # Compact revocation list behind the in-memory Bloom filter in users/revocation.py
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.jti
+
+
+class TokenCutoff(models.Model):
+    # Tokens issued for this user before valid_after are rejected
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='token_cutoff')
+    valid_after = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.user.username} tokens valid after {self.valid_after}"
+
+
+class UserSearchTerm(models.Model):
+    # Normalized prefix index for autocomplete, maintained by users/search.py;
+    # role, department and label are copied here so a lookup never joins
+    term = models.CharField(max_length=254)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    label = models.CharField(max_length=320)
+    role = models.CharField(max_length=20)
+    department = models.CharField(max_length=100, blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['term'], name='users_search_term_idx'),
+            models.Index(fields=['role', 'term'], name='users_search_role_term_idx'),
+            models.Index(fields=['department', 'term'], name='users_search_dept_term_idx'),
+        ]
+    
+    def __str__(self):
+        return self.term
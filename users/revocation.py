@@ -0,0 +1,194 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import RevokedToken, TokenCutoff
+
+
+DEFAULTS = {
+    # Seconds between checks of the shared revocation generation counter
+    'REVOCATION_REFRESH_SECONDS': 2,
+    # Seconds between incremental table reads even if the counter looks unchanged
+    # (covers an evicted or non-shared cache)
+    'REVOCATION_RESYNC_SECONDS': 60,
+    'REVOCATION_BLOOM_CAPACITY': 100000,
+    'REVOCATION_BLOOM_ERROR_RATE': 0.001,
+}
+
+GENERATION_KEY = 'users:revocation:generation'
+
+
+def revocation_setting(name):
+    return getattr(settings, 'USERS_AUTH', {}).get(name, DEFAULTS[name])
+
+
+class BloomFilter:
+    # Membership test with no false negatives; positives are confirmed against the table
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+
+class RevocationIndex:
+    """Per-process view of the revocation tables.
+
+    Revocations made in this process apply immediately; those made elsewhere
+    are picked up within REVOCATION_REFRESH_SECONDS through a generation
+    counter in the shared cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def clear(self):
+        # Forget everything; the next check reloads from the tables
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        capacity = revocation_setting('REVOCATION_BLOOM_CAPACITY')
+        self.bloom = BloomFilter(capacity, revocation_setting('REVOCATION_BLOOM_ERROR_RATE'))
+        self.cutoffs = {}
+        self.last_token_id = 0
+        self.last_cutoff_update = None
+        self.generation = None
+        self.checked_at = float('-inf')
+        self.synced_at = float('-inf')
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked_at < revocation_setting('REVOCATION_REFRESH_SECONDS'):
+            return
+        with self._lock:
+            self.checked_at = now
+            generation = cache.get(GENERATION_KEY, 0)
+            stale = now - self.synced_at >= revocation_setting('REVOCATION_RESYNC_SECONDS')
+            if generation == self.generation and not stale:
+                return
+            self.generation = generation
+            self.synced_at = now
+            self._load_changes()
+
+    def _load_changes(self):
+        # Incremental: only rows added or changed since the last read
+        new_tokens = list(RevokedToken.objects
+                          .filter(id__gt=self.last_token_id, expires_at__gt=timezone.now())
+                          .values_list('id', 'jti'))
+        if self.bloom.count + len(new_tokens) > self.bloom.capacity:
+            # Filter is full: rebuild sized for the live rows (expired ones drop out)
+            self._reset()
+            self.generation = cache.get(GENERATION_KEY, 0)
+            self.checked_at = self.synced_at = time.monotonic()
+            live = RevokedToken.objects.filter(expires_at__gt=timezone.now()).count()
+            capacity = max(revocation_setting('REVOCATION_BLOOM_CAPACITY'), live * 2)
+            self.bloom = BloomFilter(capacity, revocation_setting('REVOCATION_BLOOM_ERROR_RATE'))
+            new_tokens = list(RevokedToken.objects
+                              .filter(expires_at__gt=timezone.now())
+                              .values_list('id', 'jti'))
+        for token_id, jti in new_tokens:
+            self.bloom.add(jti)
+            self.last_token_id = max(self.last_token_id, token_id)
+
+        cutoffs = TokenCutoff.objects.all()
+        if self.last_cutoff_update is not None:
+            cutoffs = cutoffs.filter(updated_at__gte=self.last_cutoff_update)
+        for user_id, valid_after, updated_at in cutoffs.values_list('user_id', 'valid_after',
+                                                                    'updated_at'):
+            self.cutoffs[str(user_id)] = valid_after.timestamp()
+            if self.last_cutoff_update is None or updated_at > self.last_cutoff_update:
+                self.last_cutoff_update = updated_at
+
+    def is_revoked(self, jti, user_id, issued_at):
+        self.refresh()
+        # Token user id claims are strings
+        cutoff = self.cutoffs.get(str(user_id))
+        if cutoff is not None and (issued_at is None or issued_at < cutoff):
+            return True
+        if jti is not None and jti in self.bloom:
+            # Rare: real revocation or a Bloom false positive
+            return RevokedToken.objects.filter(jti=jti).exists()
+        return False
+
+    def note_token(self, jti):
+        with self._lock:
+            self.bloom.add(jti)
+
+    def note_cutoff(self, user_id, valid_after):
+        with self._lock:
+            self.cutoffs[str(user_id)] = valid_after.timestamp()
+
+
+revocation_index = RevocationIndex()
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+
+
+def revoke_token(token):
+    jti = token.get('jti')
+    if jti is None:
+        return
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': expires_at})
+    revocation_index.note_token(jti)
+    _bump_generation()
+
+
+def revoke_user_tokens(user_id):
+    # Exact, so a login right after a password change keeps working; see check_token
+    valid_after = timezone.now()
+    TokenCutoff.objects.update_or_create(user_id=user_id, defaults={'valid_after': valid_after})
+    revocation_index.note_cutoff(user_id, valid_after)
+    _bump_generation()
+
+
+def check_token(token, user_id_claim):
+    # Returns True when the validated token has been revoked. ``orig_iat`` is the
+    # sub-second login time (users.serializers); ``iat`` alone is whole seconds, so
+    # a token without it issued in the cutoff's second counts as issued before it
+    issued_at = token.get('orig_iat', token.get('iat'))
+    return revocation_index.is_revoked(token.get('jti'), token.get(user_id_claim), issued_at)
+
+
+def revoke_on_credential_change(sender, instance, created, **kwargs):
+    # A new password or a deactivated account invalidates every outstanding token
+    if created:
+        return
+    if getattr(instance, '_password', None) is not None or not instance.is_active:
+        revoke_user_tokens(instance.pk)
+
+
+post_save.connect(revoke_on_credential_change, sender=User,
+                  dispatch_uid='users_revoke_on_credential_change')
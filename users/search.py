@@ -0,0 +1,105 @@
+import unicodedata
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .models import UserProfile, UserSearchTerm
+
+
+# User columns that feed the index; saves touching none of them are ignored
+INDEXED_USER_FIELDS = {'username', 'email', 'first_name', 'last_name', 'is_active'}
+MAX_RESULTS = 50
+
+
+def normalize(value):
+    # Case- and accent-insensitive, whitespace collapsed
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def user_label(user):
+    full_name = f'{user.first_name} {user.last_name}'.strip()
+    return f'{full_name} ({user.username})' if full_name else user.username
+
+
+def term_rows(user, profile):
+    # One row per searchable prefix source: username, email, first and last
+    # name, and "first last" so typing a full name keeps matching
+    sources = {user.username, user.email, user.first_name, user.last_name,
+               f'{user.first_name} {user.last_name}'}
+    terms = {normalize(source)[:254] for source in sources}
+    terms.discard('')
+    label = user_label(user)
+    return [
+        {'term': term, 'user_id': user.pk, 'label': label, 'role': profile.role,
+         'department': profile.department, 'is_active': user.is_active}
+        for term in sorted(terms)
+    ]
+
+
+def build_terms(user, profile):
+    return [UserSearchTerm(**row) for row in term_rows(user, profile)]
+
+
+def index_user(user, profile):
+    with transaction.atomic():
+        UserSearchTerm.objects.filter(user_id=user.pk).delete()
+        UserSearchTerm.objects.bulk_create(build_terms(user, profile))
+
+
+def prefix_upper_bound(prefix):
+    # Smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def autocomplete(query, roles=None, departments=None, include_inactive=False, limit=10):
+    """Return up to ``limit`` ``{'id', 'label'}`` dicts whose names or email start with ``query``."""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    limit = max(1, min(limit, MAX_RESULTS))
+
+    # A range on the term index instead of LIKE, which SQLite can't serve
+    # from an index for case-insensitive patterns
+    terms = UserSearchTerm.objects.filter(term__gte=prefix, term__lt=prefix_upper_bound(prefix))
+    if roles:
+        terms = terms.filter(role__in=roles)
+    if departments:
+        terms = terms.filter(department__in=departments)
+    if not include_inactive:
+        terms = terms.filter(is_active=True)
+
+    # A user can match on several terms; over-fetch a little and dedupe here
+    results = {}
+    rows = terms.order_by('term', 'user_id').values_list('user_id', 'label')[:limit * 5]
+    for user_id, label in rows:
+        results.setdefault(user_id, label)
+        if len(results) == limit:
+            break
+    return [{'id': user_id, 'label': label} for user_id, label in results.items()]
+
+
+def reindex_user(sender, instance, created, update_fields=None, **kwargs):
+    # New users are indexed when create_user_profile saves their profile
+    if created or getattr(instance, 'principal_source', None):
+        return
+    if update_fields is not None and not INDEXED_USER_FIELDS.intersection(update_fields):
+        return
+    if User.profile.is_cached(instance):
+        profile = instance.profile
+    else:
+        profile = UserProfile.objects.filter(user_id=instance.pk).first()
+    if profile is not None:
+        index_user(instance, profile)
+
+
+def reindex_profile(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'role', 'department'}.intersection(update_fields):
+        return
+    index_user(instance.user, instance)
+
+
+post_save.connect(reindex_user, sender=User, dispatch_uid='users_search_reindex_user')
+post_save.connect(reindex_profile, sender=UserProfile, dispatch_uid='users_search_reindex_profile')
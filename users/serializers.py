@@ -1,6 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from .models import UserProfile
+from .authentication import build_principal, load_principal
+from .revocation import check_token
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -29,6 +35,45 @@ class UserDetailSerializer(serializers.ModelSerializer):
         # Update Profile fields
         for attr, value in profile_data.items():
             setattr(profile, attr, value)
-        profile.save()
+        profile.save_changes()
         
-        return instance
\ No newline at end of file
+        return instance
+
+
+def add_principal_claims(token, principal):
+    # Lets CachedJWTAuthentication skip the principal lookup when
+    # USERS_AUTH['TRUST_TOKEN_CLAIMS'] is on
+    profile = principal['profile'] or {}
+    token['username'] = principal['username']
+    token['role'] = profile.get('role', 'viewer')
+    token['department'] = profile.get('department')
+    token['is_staff'] = principal['is_staff']
+    token['is_superuser'] = principal['is_superuser']
+    return token
+
+
+class ECMSTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = add_principal_claims(super().get_token(user), build_principal(user))
+        # Sub-second login time for revocation cutoffs; access tokens inherit it on refresh
+        token['orig_iat'] = token.current_time.timestamp()
+        return token
+
+
+class ECMSTokenRefreshSerializer(TokenRefreshSerializer):
+    # Rejects revoked refresh tokens and re-issues the role claims from the
+    # current principal, so a role change reaches trusted claims within one
+    # access token lifetime
+    def validate(self, attrs):
+        if check_token(RefreshToken(attrs['refresh']), jwt_settings.USER_ID_CLAIM):
+            raise InvalidToken('Token has been revoked')
+        data = super().validate(attrs)
+        refresh = RefreshToken(attrs['refresh'], verify=False)
+        principal = load_principal(refresh[jwt_settings.USER_ID_CLAIM])
+        if principal is None or not principal['is_active']:
+            raise serializers.ValidationError('User is inactive or no longer exists')
+        access = refresh.access_token
+        add_principal_claims(access, principal)
+        data['access'] = str(access)
+        return data
@@ -1,3 +1,273 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework.request import Request
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .authentication import CachedJWTAuthentication
+from .models import TokenCutoff, UserProfile
+from .revocation import BloomFilter, check_token, revocation_index
+from .search import normalize
+from .serializers import ECMSTokenObtainPairSerializer
 
-# Create your tests here.
+
+class CachedPrincipalAuthTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.user = User.objects.create_user(
+            username='principal',
+            password='testpassword',
+            email='principal@example.com'
+        )
+        self.user.profile.role = 'approver'
+        self.user.profile.department = 'legal'
+        self.user.profile.save()
+        token = ECMSTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.me_url = reverse('user-me')
+
+    def test_read_requests_use_cached_principal(self):
+        """Test that a warm principal serves GET requests without queries"""
+        self.client.get(self.me_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.me_url)
+        self.assertEqual(response.data['email'], 'principal@example.com')
+        self.assertEqual(response.data['profile']['role'], 'approver')
+
+    def test_profile_save_invalidates_principal(self):
+        """Test that changing the profile is visible on the next request"""
+        self.client.get(self.me_url)
+        profile = User.objects.get(pk=self.user.pk).profile
+        profile.role = 'manager'
+        profile.save()
+        response = self.client.get(self.me_url)
+        self.assertEqual(response.data['profile']['role'], 'manager')
+
+    def test_write_requests_load_the_full_user(self):
+        """Test that writes go through a real User row and can save it"""
+        response = self.client.patch(reverse('user-update-profile'), {'first_name': 'Pat'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Pat')
+        self.assertTrue(self.user.check_password('testpassword'))
+
+    def test_trusted_claims_skip_cache_and_database(self):
+        """Test that trusted token claims authenticate without any lookup"""
+        token = ECMSTokenObtainPairSerializer.get_token(self.user).access_token
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        revocation_index.refresh()
+        with self.settings(USERS_AUTH={'TRUST_TOKEN_CLAIMS': True}):
+            cache.clear()
+            with self.assertNumQueries(0):
+                user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user.profile.department, 'legal')
+        self.assertEqual(user.principal_source, 'token')
+        with self.assertRaises(RuntimeError):
+            user.save()
+
+    def test_refresh_reissues_role_claims(self):
+        """Test that refreshing picks up a role change in the new access token"""
+        refresh = ECMSTokenObtainPairSerializer.get_token(self.user)
+        self.user.profile.role = 'admin'
+        self.user.profile.save()
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RefreshToken(str(refresh)).payload['role'], 'approver')
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'admin')
+
+
+class TokenRevocationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.user = User.objects.create_user(username='revoked', password='testpassword')
+        self.refresh = ECMSTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        self.me_url = reverse('user-me')
+    
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added item is reported as present"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'other-{i}' in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+    
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        """Test that logged-out tokens are rejected"""
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_logout'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+        
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_revocation_made_elsewhere_is_picked_up(self):
+        """Test that a fresh process view of the tables sees existing revocations"""
+        self.client.post(reverse('token_logout'))
+        revocation_index.clear()
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_password_change_and_deactivation_revoke_tokens(self):
+        """Test that credential changes invalidate tokens issued before them"""
+        self.user.set_password('newpassword')
+        self.user.save()
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        other = User.objects.create_user(username='deactivated', password='testpassword')
+        token = ECMSTokenObtainPairSerializer.get_token(other).access_token
+        other.is_active = False
+        other.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_login_right_after_password_change(self):
+        """Test that tokens issued right after a password change, in the same second, stay valid"""
+        self.user.set_password('newpassword')
+        self.user.save()
+        response = self.client.post(reverse('token_obtain_pair'),
+                                    {'username': 'revoked', 'password': 'newpassword'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        cutoff = TokenCutoff.objects.get(user=self.user).valid_after.timestamp()
+        same_second = {'user_id': str(self.user.pk), 'iat': int(cutoff)}
+        self.assertFalse(check_token({**same_second, 'orig_iat': cutoff + 0.001}, 'user_id'))
+        self.assertTrue(check_token({**same_second, 'orig_iat': cutoff - 0.001}, 'user_id'))
+        # Without the sub-second claim, the cutoff's own second counts as before it
+        self.assertTrue(check_token(same_second, 'user_id'))
+
+
+class ProfileWriteTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='writer', password='testpassword')
+    
+    def test_user_save_skips_unchanged_profile(self):
+        """Test that saving a user with an untouched profile writes only the user"""
+        user = User.objects.select_related('profile').get(username='writer')
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+    
+    def test_user_save_writes_changed_profile_fields(self):
+        """Test that modified profile fields are still persisted with the user"""
+        user = User.objects.select_related('profile').get(username='writer')
+        user.profile.department = 'finance'
+        user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).department, 'finance')
+
+
+class ImportUsersTest(TestCase):
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+    
+    def import_file(self, path):
+        out = StringIO()
+        call_command('import_users', path, '--chunk-size', '20', stdout=out)
+        return out.getvalue()
+    
+    def test_csv_import_creates_users_and_profiles(self):
+        """Test that a CSV import creates users with their profiles in bulk"""
+        User.objects.create_user(username='existing', password='testpassword')
+        rows = ['username,email,role,department'] + [
+            f'user{i},user{i}@example.com,approver,legal' for i in range(50)
+        ] + ['existing,x@example.com,viewer,', 'bad,,not-a-role,']
+        path = self.write('.csv', '\n'.join(rows))
+        
+        # Per chunk of 20: existing-username lookup, savepoint, three inserts, release
+        with self.assertNumQueries(3 * 6):
+            output = self.import_file(path)
+        self.assertIn('Imported 50 users', output)
+        self.assertIn('(1 existing or duplicate usernames skipped, 1 invalid rows)', output)
+        self.assertEqual(UserProfile.objects.filter(role='approver', department='legal').count(), 50)
+        self.assertFalse(User.objects.get(username='user1').has_usable_password())
+        self.assertFalse(User.objects.filter(username='bad').exists())
+    
+    def test_json_array_import_is_streamed(self):
+        """Test that a JSON array is imported object by object"""
+        users = [{'username': f'json{i}', 'first_name': 'J', 'is_staff': i == 0} for i in range(30)]
+        path = self.write('.json', json.dumps(users, indent=2))
+        self.import_file(path)
+        self.assertEqual(User.objects.filter(username__startswith='json').count(), 30)
+        self.assertTrue(User.objects.get(username='json0').is_staff)
+        self.assertEqual(UserProfile.objects.get(user__username='json5').role, 'viewer')
+
+
+class UserAutocompleteTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.user = User.objects.create_user(username='picker', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('user-autocomplete')
+        
+        for username, first, last, role, department in [
+            ('jdoe', 'Jane', 'Doe', 'approver', 'legal'),
+            ('jsmith', 'John', 'Smith', 'viewer', 'legal'),
+            ('zoe', 'Zoë', 'Janssen', 'approver', 'finance'),
+        ]:
+            user = User.objects.create_user(username=username, password='testpassword',
+                                            first_name=first, last_name=last,
+                                            email=f'{username}@example.com')
+            user.profile.role = role
+            user.profile.department = department
+            user.profile.save()
+    
+    def labels(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item['label'] for item in response.data)
+    
+    def test_prefix_matches_names_and_email(self):
+        """Test that any name or email prefix matches, case- and accent-insensitively"""
+        self.assertEqual(self.labels(q='J'), ['Jane Doe (jdoe)', 'John Smith (jsmith)', 'Zoë Janssen (zoe)'])
+        self.assertEqual(self.labels(q='smi'), ['John Smith (jsmith)'])
+        self.assertEqual(self.labels(q='zoe j'), ['Zoë Janssen (zoe)'])
+        self.assertEqual(self.labels(q='jdoe@ex'), ['Jane Doe (jdoe)'])
+        self.assertEqual(normalize('  ZoË   Janssen '), 'zoe janssen')
+    
+    def test_filters_by_role_and_department(self):
+        """Test that role and department narrow the results"""
+        self.assertEqual(self.labels(q='j', role='approver'), ['Jane Doe (jdoe)', 'Zoë Janssen (zoe)'])
+        self.assertEqual(self.labels(q='j', role='approver', department='legal'), ['Jane Doe (jdoe)'])
+    
+    def test_index_follows_profile_and_user_changes(self):
+        """Test that edits and deactivation are reflected in the index"""
+        user = User.objects.get(username='jsmith')
+        user.profile.role = 'approver'
+        user.profile.save()
+        self.assertIn('John Smith (jsmith)', self.labels(q='j', role='approver'))
+        
+        user.last_name = 'Baker'
+        user.save()
+        self.assertEqual(self.labels(q='smi'), [])
+        self.assertEqual(self.labels(q='bak'), ['John Baker (jsmith)'])
+        
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.labels(q='bak'), [])
+    
+    def test_autocomplete_is_a_single_query(self):
+        """Test that a lookup is one indexed query and returns id/label pairs only"""
+        self.client.get(self.url, {'q': 'ja'})
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'q': 'ja', 'limit': 1})
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(set(response.data[0]), {'id', 'label'})
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Workflow, WorkflowStep, DocumentWorkflow, WorkflowStepApproval
+from .models import (Workflow, WorkflowStep, DocumentWorkflow, WorkflowStepApproval,
+                     WorkflowDailyStats, WorkflowStepDailyStats, Notification)
 
 
 @admin.register(Workflow)
@@ -10,14 +11,14 @@ class WorkflowAdmin(admin.ModelAdmin):
 
 @admin.register(WorkflowStep)
 class WorkflowStepAdmin(admin.ModelAdmin):
-    list_display = ('workflow', 'name', 'order', 'approver')
+    list_display = ('workflow', 'name', 'order', 'approver', 'sla')
     list_filter = ('workflow',)
     search_fields = ('name', 'workflow__name')
 
 
 @admin.register(DocumentWorkflow)
 class DocumentWorkflowAdmin(admin.ModelAdmin):
-    list_display = ('document', 'workflow', 'status', 'started_at', 'completed_at')
+    list_display = ('document', 'workflow', 'status', 'started_at', 'due_at', 'completed_at')
     list_filter = ('status', 'started_at', 'completed_at')
     search_fields = ('document__title', 'workflow__name')
 
@@ -27,3 +28,22 @@ class WorkflowStepApprovalAdmin(admin.ModelAdmin):
     list_display = ('document_workflow', 'step', 'approved', 'approved_at', 'approved_by')
     list_filter = ('approved', 'approved_at')
     search_fields = ('document_workflow__document__title', 'step__name')
+
+
+@admin.register(WorkflowDailyStats)
+class WorkflowDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'workflow', 'started_count', 'approved_count', 'rejected_count')
+    list_filter = ('day', 'workflow')
+
+
+@admin.register(WorkflowStepDailyStats)
+class WorkflowStepDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'step', 'approver', 'approved_count', 'rejected_count')
+    list_filter = ('day', 'workflow')
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'event', 'created_at', 'sent_at')
+    list_filter = ('event', 'sent_at')
+    search_fields = ('recipient__username', 'message')
@@ -0,0 +1,181 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import DocumentWorkflow, WorkflowDailyStats, WorkflowStepDailyStats
+
+
+DEFAULT_STUCK_AFTER = timedelta(days=3)
+
+
+def _bump(model, keys, **increments):
+    # Atomic "upsert + increment" so concurrent transitions never lose counts
+    changes = {field: F(field) + value for field, value in increments.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **increments)
+    except IntegrityError:
+        # Another transition created the row first
+        model.objects.filter(**keys).update(**changes)
+
+
+def _seconds_between(start, end):
+    if not start or not end:
+        return 0.0
+    return max((end - start).total_seconds(), 0.0)
+
+
+def department_key(department):
+    # Rollup rows keep '' rather than NULL so the unique keys hold for shared documents
+    return department or ''
+
+
+def record_started(document_workflow):
+    _bump(
+        WorkflowDailyStats,
+        {'day': timezone.localdate(document_workflow.started_at),
+         'workflow_id': document_workflow.workflow_id,
+         'department': department_key(document_workflow.document.department)},
+        started_count=1,
+    )
+
+
+def record_step_decision(document_workflow, step, approver, approved, decided_at):
+    duration = _seconds_between(
+        document_workflow.step_started_at or document_workflow.started_at, decided_at
+    )
+    _bump(
+        WorkflowStepDailyStats,
+        {'day': timezone.localdate(decided_at),
+         'workflow_id': document_workflow.workflow_id,
+         'step_id': step.pk,
+         'approver_id': approver.pk,
+         'department': department_key(document_workflow.document.department)},
+        approved_count=1 if approved else 0,
+        rejected_count=0 if approved else 1,
+        total_step_seconds=duration,
+    )
+
+
+def record_completed(document_workflow):
+    approved = document_workflow.status == 'approved'
+    _bump(
+        WorkflowDailyStats,
+        {'day': timezone.localdate(document_workflow.completed_at),
+         'workflow_id': document_workflow.workflow_id,
+         'department': department_key(document_workflow.document.department)},
+        approved_count=1 if approved else 0,
+        rejected_count=0 if approved else 1,
+        total_cycle_seconds=_seconds_between(
+            document_workflow.started_at, document_workflow.completed_at
+        ),
+    )
+
+
+def _rate(part, total):
+    return round(part / total, 4) if total else None
+
+
+def _average(total_seconds, count):
+    return round(total_seconds / count, 1) if count else None
+
+
+def stuck_workflows(stuck_after=None, workflow_id=None, department=None, limit=50):
+    if stuck_after is None:
+        stuck_after = getattr(settings, 'WORKFLOW_STUCK_AFTER', DEFAULT_STUCK_AFTER)
+    cutoff = timezone.now() - stuck_after
+    # Served by the (status, step_started_at) index
+    queryset = DocumentWorkflow.objects.filter(status='in_progress', step_started_at__lt=cutoff)
+    if workflow_id is not None:
+        queryset = queryset.filter(workflow_id=workflow_id)
+    if department is not None:
+        queryset = queryset.filter(Q(document__department=department)
+                                   if department else
+                                   Q(document__department__isnull=True) | Q(document__department=''))
+    return (queryset
+            .select_related('document', 'workflow', 'current_step__approver')
+            .order_by('step_started_at')[:limit])
+
+
+def build_report(start_day, end_day, workflow_id=None, stuck_after=None, department=None):
+    """The report over every department, or over ``department`` ('' for shared documents)."""
+    daily = WorkflowDailyStats.objects.filter(day__range=(start_day, end_day))
+    step_daily = WorkflowStepDailyStats.objects.filter(day__range=(start_day, end_day))
+    if workflow_id is not None:
+        daily = daily.filter(workflow_id=workflow_id)
+        step_daily = step_daily.filter(workflow_id=workflow_id)
+    if department is not None:
+        daily = daily.filter(department=department)
+        step_daily = step_daily.filter(department=department)
+
+    workflows = []
+    for row in (daily.values('workflow_id', 'workflow__name')
+                .annotate(started=Sum('started_count'), approved=Sum('approved_count'),
+                          rejected=Sum('rejected_count'), cycle=Sum('total_cycle_seconds'))
+                .order_by('workflow__name')):
+        completed = row['approved'] + row['rejected']
+        workflows.append({
+            'workflow_id': row['workflow_id'],
+            'name': row['workflow__name'],
+            'started': row['started'],
+            'approved': row['approved'],
+            'rejected': row['rejected'],
+            'approval_rate': _rate(row['approved'], completed),
+            'rejection_rate': _rate(row['rejected'], completed),
+            'avg_cycle_seconds': _average(row['cycle'], completed),
+        })
+
+    steps = []
+    for row in (step_daily.values('workflow_id', 'step_id', 'step__name', 'step__order')
+                .annotate(approved=Sum('approved_count'), rejected=Sum('rejected_count'),
+                          seconds=Sum('total_step_seconds'))
+                .order_by('workflow_id', 'step__order')):
+        decided = row['approved'] + row['rejected']
+        steps.append({
+            'workflow_id': row['workflow_id'],
+            'step_id': row['step_id'],
+            'name': row['step__name'],
+            'order': row['step__order'],
+            'approved': row['approved'],
+            'rejected': row['rejected'],
+            'approval_rate': _rate(row['approved'], decided),
+            'avg_step_seconds': _average(row['seconds'], decided),
+        })
+
+    approvers = []
+    for row in (step_daily.values('approver_id', 'approver__username')
+                .annotate(approved=Sum('approved_count'), rejected=Sum('rejected_count'),
+                          seconds=Sum('total_step_seconds'))
+                .order_by('approver__username')):
+        decided = row['approved'] + row['rejected']
+        approvers.append({
+            'approver_id': row['approver_id'],
+            'username': row['approver__username'],
+            'approved': row['approved'],
+            'rejected': row['rejected'],
+            'approval_rate': _rate(row['approved'], decided),
+            'avg_step_seconds': _average(row['seconds'], decided),
+        })
+
+    stuck = [{
+        'id': dw.pk,
+        'document': dw.document.title,
+        'workflow': dw.workflow.name,
+        'current_step': dw.current_step.name if dw.current_step else None,
+        'approver': dw.current_step.approver.username if dw.current_step else None,
+        'step_started_at': dw.step_started_at,
+    } for dw in stuck_workflows(stuck_after, workflow_id, department)]
+
+    return {
+        'from': start_day,
+        'to': end_day,
+        'workflows': workflows,
+        'steps': steps,
+        'approvers': approvers,
+        'stuck': stuck,
+    }
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from workflows import sla
+
+
+class Command(BaseCommand):
+    help = ('Send reminders and escalations for workflow steps past their SLA. Sleeps until '
+            'the nearest deadline instead of scanning open workflows on a timer.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Handle everything currently overdue, then exit')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or sla.sla_setting('BATCH_SIZE')
+        max_sleep = sla.sla_setting('MAX_SLEEP_SECONDS')
+
+        while True:
+            handled = sla.process_overdue(batch_size=batch_size)
+            if handled:
+                self.stdout.write(f'Handled {handled} overdue workflows')
+            if handled >= batch_size:
+                # More overdue work is waiting
+                continue
+            if options['once']:
+                return
+
+            deadline = sla.next_deadline()
+            if deadline is None:
+                delay = max_sleep
+            else:
+                delay = min(max((deadline - timezone.now()).total_seconds(), 0), max_sleep)
+            time.sleep(delay)
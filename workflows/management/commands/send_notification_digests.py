@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflows import notifications
+
+
+class Command(BaseCommand):
+    help = ('Send pending workflow notifications as one digest email per recipient '
+            'through the configured EMAIL_BACKEND')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send the digests that are currently due, then exit')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between passes')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = notifications.send_due_digests()
+            if sent:
+                self.stdout.write(f'Sent {sent} notification digests')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+        ('workflows', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('started_count', models.PositiveIntegerField(default=0)),
+                ('approved_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('total_cycle_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'workflow daily stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkflowStepDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('approved_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('total_step_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'workflow step daily stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='documentworkflow',
+            name='step_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='documentworkflow',
+            index=models.Index(fields=['status', 'step_started_at'], name='workflows_d_status_cd3a48_idx'),
+        ),
+        migrations.AddField(
+            model_name='workflowdailystats',
+            name='workflow',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='workflows.workflow'),
+        ),
+        migrations.AddField(
+            model_name='workflowstepdailystats',
+            name='approver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='step_daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='workflowstepdailystats',
+            name='step',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='workflows.workflowstep'),
+        ),
+        migrations.AddField(
+            model_name='workflowstepdailystats',
+            name='workflow',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='step_daily_stats', to='workflows.workflow'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='workflowdailystats',
+            unique_together={('day', 'workflow')},
+        ),
+        migrations.AddIndex(
+            model_name='workflowstepdailystats',
+            index=models.Index(fields=['day', 'workflow'], name='workflows_w_day_2048f6_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='workflowstepdailystats',
+            unique_together={('day', 'step', 'approver')},
+        ),
+    ]
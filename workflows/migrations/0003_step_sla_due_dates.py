@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+        ('workflows', '0002_workflow_analytics_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentworkflow',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentworkflow',
+            name='escalated_to',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='escalated_workflows', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='documentworkflow',
+            name='reminders_sent',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workflowstep',
+            name='sla',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='documentworkflow',
+            index=models.Index(fields=['status', 'due_at'], name='workflows_d_status_edf67d_idx'),
+        ),
+    ]
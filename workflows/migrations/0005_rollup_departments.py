@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflows', '0004_notification_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='workflowdailystats',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='workflowstepdailystats',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='workflowdailystats',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='workflowstepdailystats',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterUniqueTogether(
+            name='workflowdailystats',
+            unique_together={('day', 'workflow', 'department')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='workflowstepdailystats',
+            unique_together={('day', 'step', 'approver', 'department')},
+        ),
+    ]
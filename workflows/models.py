@@ -18,6 +18,8 @@ class WorkflowStep(models.Model):
     name = models.CharField(max_length=255)
     order = models.PositiveIntegerField()
     approver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='approval_steps')
+    # Time allowed for a decision once the step becomes current; no SLA when empty
+    sla = models.DurationField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.workflow.name} - {self.name} (Step {self.order})"
@@ -40,12 +42,36 @@ class DocumentWorkflow(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # When the current step became current; used for step cycle times and stuck detection
+    step_started_at = models.DateTimeField(null=True, blank=True)
+    # SLA deadline of the current step; the escalation scheduler only ever reads the earliest ones
+    due_at = models.DateTimeField(null=True, blank=True)
+    reminders_sent = models.PositiveIntegerField(default=0)
+    escalated_to = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='escalated_workflows',
+                                     null=True, blank=True)
     
     def __str__(self):
         return f"{self.document.title} - {self.workflow.name}"
     
+    def start_step(self, step, started_at):
+        # Make ``step`` current and restart its SLA clock (not saved)
+        self.current_step = step
+        self.step_started_at = started_at
+        self.due_at = started_at + step.sla if step is not None and step.sla else None
+        self.reminders_sent = 0
+        self.escalated_to = None
+    
+    def can_decide(self, user):
+        if self.current_step is None:
+            return False
+        return self.current_step.approver_id == user.pk or self.escalated_to_id == user.pk
+    
     class Meta:
         unique_together = ['document', 'workflow']
+        indexes = [
+            models.Index(fields=['status', 'step_started_at']),
+            models.Index(fields=['status', 'due_at']),
+        ]
 
 
 class WorkflowStepApproval(models.Model):
@@ -62,3 +88,73 @@ class WorkflowStepApproval(models.Model):
     
     class Meta:
         unique_together = ['document_workflow', 'step']
+
+
+class WorkflowDailyStats(models.Model):
+    # Daily rollup per workflow, updated incrementally on each transition
+    day = models.DateField()
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name='daily_stats')
+    # The document's department, '' for documents without one
+    department = models.CharField(max_length=100, blank=True, default='')
+    started_count = models.PositiveIntegerField(default=0)
+    approved_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    total_cycle_seconds = models.FloatField(default=0)
+    
+    def __str__(self):
+        return f"{self.workflow.name} - {self.day}"
+    
+    class Meta:
+        unique_together = ['day', 'workflow', 'department']
+        verbose_name_plural = 'workflow daily stats'
+
+
+class WorkflowStepDailyStats(models.Model):
+    # Daily rollup per step and approver, updated incrementally on each decision
+    day = models.DateField()
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name='step_daily_stats')
+    step = models.ForeignKey(WorkflowStep, on_delete=models.CASCADE, related_name='daily_stats')
+    approver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='step_daily_stats')
+    department = models.CharField(max_length=100, blank=True, default='')
+    approved_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    total_step_seconds = models.FloatField(default=0)
+    
+    def __str__(self):
+        return f"{self.step.name} - {self.approver.username} - {self.day}"
+    
+    class Meta:
+        unique_together = ['day', 'step', 'approver', 'department']
+        indexes = [
+            models.Index(fields=['day', 'workflow']),
+        ]
+        verbose_name_plural = 'workflow step daily stats'
+
+
+class Notification(models.Model):
+    # Outbox row written inside the transition transaction; a separate worker
+    # batches a recipient's pending rows into one digest email
+    EVENT_CHOICES = (
+        ('step_assigned', 'Step assigned'),
+        ('workflow_approved', 'Workflow approved'),
+        ('workflow_rejected', 'Workflow rejected'),
+        ('sla_reminder', 'SLA reminder'),
+        ('sla_escalation', 'SLA escalation'),
+    )
+    
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workflow_notifications')
+    event = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    document_workflow = models.ForeignKey(DocumentWorkflow, on_delete=models.CASCADE,
+                                          related_name='notifications', null=True, blank=True)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_event_display()} for {self.recipient.username}"
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['sent_at', 'recipient', 'created_at']),
+        ]
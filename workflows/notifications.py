@@ -0,0 +1,120 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Notification
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # A recipient's digest goes out once their oldest pending event is this old
+    'WINDOW': timedelta(minutes=10),
+    # Events listed in one digest; the rest wait for the next one
+    'MAX_EVENTS_PER_DIGEST': 50,
+    # Digests sent per worker pass
+    'MAX_DIGESTS_PER_RUN': 200,
+    # Upper bound on messages handed to the email backend per second
+    'MAX_MESSAGES_PER_SECOND': 5,
+    'SUBJECT_PREFIX': '[ECMS] ',
+}
+
+
+def digest_setting(name):
+    return getattr(settings, 'NOTIFICATION_DIGEST', {}).get(name, DEFAULTS[name])
+
+
+def enqueue(event, document_workflow, recipients, message):
+    # Only an INSERT in the caller's transaction; no email work at transition time
+    Notification.objects.bulk_create([
+        Notification(recipient=recipient, event=event,
+                     document_workflow=document_workflow, message=message)
+        for recipient in {r.pk: r for r in recipients if r is not None}.values()
+    ])
+
+
+def step_assigned(document_workflow):
+    step = document_workflow.current_step
+    if step is None:
+        return
+    enqueue('step_assigned', document_workflow, [step.approver],
+            f'"{document_workflow.document.title}" is waiting for your approval '
+            f'at step "{step.name}" of {document_workflow.workflow.name}.')
+
+
+def workflow_completed(document_workflow):
+    event = f'workflow_{document_workflow.status}'
+    enqueue(event, document_workflow,
+            [document_workflow.document.created_by, document_workflow.workflow.created_by],
+            f'"{document_workflow.document.title}" was {document_workflow.status} '
+            f'in {document_workflow.workflow.name}.')
+
+
+def sla_overdue(kind, document_workflow, recipients):
+    step = document_workflow.current_step
+    enqueue(f'sla_{kind}', document_workflow, recipients,
+            f'Step "{step.name}" for "{document_workflow.document.title}" is overdue '
+            f'({document_workflow.workflow.name}).')
+
+
+def _build_digest(recipient, notifications):
+    count = len(notifications)
+    subject = digest_setting('SUBJECT_PREFIX') + (
+        notifications[0].message if count == 1 else f'{count} workflow updates')
+    lines = [f'Hello {recipient.get_full_name() or recipient.username},', '']
+    lines += [f'- {n.created_at:%Y-%m-%d %H:%M} {n.message}' for n in notifications]
+    return EmailMessage(subject, '\n'.join(lines), settings.DEFAULT_FROM_EMAIL, [recipient.email])
+
+
+def send_due_digests(now=None):
+    """Send one digest per recipient whose window has elapsed; returns digests sent."""
+    now = now or timezone.now()
+    cutoff = now - digest_setting('WINDOW')
+    max_events = digest_setting('MAX_EVENTS_PER_DIGEST')
+    min_interval = 1.0 / digest_setting('MAX_MESSAGES_PER_SECOND')
+
+    due_recipients = list(Notification.objects
+                          .filter(sent_at__isnull=True)
+                          .values('recipient')
+                          .annotate(oldest=Min('created_at'))
+                          .filter(oldest__lte=cutoff)
+                          .order_by('oldest')
+                          .values_list('recipient', flat=True)[:digest_setting('MAX_DIGESTS_PER_RUN')])
+    if not due_recipients:
+        return 0
+
+    pending = {}
+    for notification in (Notification.objects
+                         .filter(sent_at__isnull=True, recipient__in=due_recipients)
+                         .select_related('recipient')
+                         .order_by('created_at')):
+        batch = pending.setdefault(notification.recipient_id, [])
+        if len(batch) < max_events:
+            batch.append(notification)
+
+    sent = 0
+    last_send = 0.0
+    connection = get_connection()
+    with connection:
+        for notifications in pending.values():
+            recipient = notifications[0].recipient
+            if recipient.email:
+                wait = last_send + min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    connection.send_messages([_build_digest(recipient, notifications)])
+                except Exception:
+                    # Left pending; retried on the next pass
+                    logger.exception('Sending notification digest to %s failed', recipient.username)
+                    continue
+                finally:
+                    last_send = time.monotonic()
+                sent += 1
+            Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(sent_at=now)
+    return sent
@@ -1,7 +1,12 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Workflow, WorkflowStep, DocumentWorkflow, WorkflowStepApproval
+from documents import acl
+from documents.models import Document
 from documents.serializers import DocumentSerializer, UserSerializer
+from django.db import transaction
 from django.utils import timezone
+from . import analytics, notifications
 
 
 class WorkflowStepSerializer(serializers.ModelSerializer):
@@ -10,8 +15,12 @@ class WorkflowStepSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = WorkflowStep
-        fields = ['id', 'workflow', 'name', 'order', 'approver', 'approver_id']
+        fields = ['id', 'workflow', 'name', 'order', 'approver', 'approver_id', 'sla']
         read_only_fields = ['workflow']
+    
+    @staticmethod
+    def eager_load(queryset, prefix=''):
+        return queryset.select_related(f'{prefix}approver')
 
 
 class WorkflowSerializer(serializers.ModelSerializer):
@@ -23,6 +32,12 @@ class WorkflowSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'created_at', 'created_by', 'steps']
         read_only_fields = ['created_at', 'created_by']
     
+    @staticmethod
+    def eager_load(queryset, prefix=''):
+        steps = WorkflowStepSerializer.eager_load(WorkflowStep.objects.all())
+        return queryset.select_related(f'{prefix}created_by').prefetch_related(
+            Prefetch(f'{prefix}steps', queryset=steps))
+    
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
@@ -36,6 +51,10 @@ class WorkflowStepApprovalSerializer(serializers.ModelSerializer):
         fields = ['id', 'document_workflow', 'step', 'approved', 'approved_at', 'approved_by', 'comments']
         read_only_fields = ['approved_at', 'approved_by']
     
+    @staticmethod
+    def eager_load(queryset, prefix=''):
+        return queryset.select_related(f'{prefix}approved_by')
+    
     def update(self, instance, validated_data):
         if 'approved' in validated_data and validated_data['approved'] and not instance.approved:
             validated_data['approved_at'] = timezone.now()
@@ -54,9 +73,27 @@ class DocumentWorkflowSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentWorkflow
         fields = ['id', 'document', 'document_id', 'workflow', 'workflow_id', 
-                  'current_step', 'status', 'started_at', 'completed_at', 'step_approvals']
-        read_only_fields = ['current_step', 'status', 'started_at', 'completed_at']
+                  'current_step', 'status', 'started_at', 'completed_at', 'due_at',
+                  'escalated_to', 'step_approvals']
+        read_only_fields = ['current_step', 'status', 'started_at', 'completed_at', 'due_at',
+                            'escalated_to']
+    
+    @staticmethod
+    def eager_load(queryset):
+        approvals = WorkflowStepApprovalSerializer.eager_load(WorkflowStepApproval.objects.all())
+        queryset = DocumentSerializer.eager_load(queryset, 'document__')
+        queryset = WorkflowSerializer.eager_load(queryset, 'workflow__')
+        return WorkflowStepSerializer.eager_load(queryset, 'current_step__').prefetch_related(
+            Prefetch('step_approvals', queryset=approvals))
+    
+    def validate_document_id(self, value):
+        # Only documents the user can read may be put through a workflow
+        documents = acl.visible_documents(Document.objects.filter(pk=value), self.context['request'].user)
+        if not documents.exists():
+            raise serializers.ValidationError('Document not found.')
+        return value
     
+    @transaction.atomic
     def create(self, validated_data):
         # Get the first step of the workflow
         workflow_id = validated_data.pop('workflow_id')
@@ -64,11 +101,14 @@ class DocumentWorkflowSerializer(serializers.ModelSerializer):
         first_step = workflow.steps.order_by('order').first()
         
         # Create the document workflow
-        document_workflow = DocumentWorkflow.objects.create(
+        document_workflow = DocumentWorkflow(
             document_id=validated_data.pop('document_id'),
-            workflow=workflow,
-            current_step=first_step
+            workflow=workflow
         )
+        document_workflow.start_step(first_step, timezone.now())
+        document_workflow.save()
+        analytics.record_started(document_workflow)
+        notifications.step_assigned(document_workflow)
         
         # Create approval entries for each step
         for step in workflow.steps.all():
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DocumentWorkflow
+from . import notifications
+
+
+DEFAULTS = {
+    # Time between reminders while a step stays overdue
+    'REMINDER_INTERVAL': timedelta(hours=24),
+    # Reminders sent to the approver before the workflow owner is made co-approver
+    'ESCALATE_AFTER_REMINDERS': 2,
+    # Overdue workflows handled per transaction
+    'BATCH_SIZE': 500,
+    # Upper bound on the scheduler's sleep, so deadlines created meanwhile are picked up
+    'MAX_SLEEP_SECONDS': 60,
+}
+
+
+def sla_setting(name):
+    return getattr(settings, 'WORKFLOW_SLA', {}).get(name, DEFAULTS[name])
+
+
+def next_deadline():
+    # Earliest open deadline; one probe of the (status, due_at) index
+    return (DocumentWorkflow.objects
+            .filter(status='in_progress', due_at__isnull=False)
+            .order_by('due_at')
+            .values_list('due_at', flat=True)
+            .first())
+
+
+def process_overdue(now=None, batch_size=None):
+    """Remind or escalate one batch of overdue workflows; returns how many were handled."""
+    now = now or timezone.now()
+    batch_size = batch_size or sla_setting('BATCH_SIZE')
+    reminder_interval = sla_setting('REMINDER_INTERVAL')
+    escalate_after = sla_setting('ESCALATE_AFTER_REMINDERS')
+
+    overdue = list(DocumentWorkflow.objects
+                   .filter(status='in_progress', due_at__lte=now)
+                   .select_related('document', 'current_step__approver', 'workflow__created_by',
+                                   'escalated_to')
+                   .order_by('due_at')[:batch_size])
+
+    handled = 0
+    with transaction.atomic():
+        for document_workflow in overdue:
+            step = document_workflow.current_step
+            if step is None:
+                continue
+            owner = document_workflow.workflow.created_by
+            escalate = (document_workflow.reminders_sent >= escalate_after
+                        and document_workflow.escalated_to_id is None
+                        and owner.pk != step.approver_id)
+            escalated_to = owner if escalate else document_workflow.escalated_to
+
+            # Guarded on the step and deadline we read, so a concurrent approval
+            # that already moved the workflow on is never overwritten
+            updated = DocumentWorkflow.objects.filter(
+                pk=document_workflow.pk,
+                status='in_progress',
+                current_step_id=step.pk,
+                due_at=document_workflow.due_at,
+            ).update(
+                due_at=now + reminder_interval,
+                reminders_sent=document_workflow.reminders_sent + 1,
+                escalated_to=escalated_to,
+            )
+            if not updated:
+                continue
+
+            recipients = [step.approver] + ([escalated_to] if escalated_to else [])
+            notifications.sla_overdue('escalation' if escalate else 'reminder',
+                                      document_workflow, recipients)
+            handled += 1
+    return handled
@@ -1,3 +1,209 @@
+from datetime import timedelta
+from io import StringIO
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core import mail
+from django.utils import timezone
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from documents.models import Document
+from .models import (Workflow, WorkflowStep, DocumentWorkflow, WorkflowStepApproval,
+                     WorkflowDailyStats, WorkflowStepDailyStats, Notification)
+from . import notifications, sla
 
-# Create your tests here.
+
+class WorkflowAPITestCase(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='testpassword')
+        self.approver = User.objects.create_user(username='approver', password='testpassword')
+        self.document = Document.objects.create(title='Workflow Document', created_by=self.owner)
+        self.workflow = Workflow.objects.create(name='Review', created_by=self.owner)
+        WorkflowStep.objects.create(workflow=self.workflow, name='First', order=1,
+                                    approver=self.approver)
+        WorkflowStep.objects.create(workflow=self.workflow, name='Second', order=2,
+                                    approver=self.approver)
+
+    def start_workflow(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse('documentworkflow-list'), {
+            'document_id': str(self.document.id),
+            'workflow_id': self.workflow.id,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return DocumentWorkflow.objects.get(pk=response.data['id'])
+
+    def approve(self, document_workflow):
+        self.client.force_authenticate(user=self.approver)
+        url = reverse('documentworkflow-approve-step', args=[document_workflow.pk])
+        return self.client.post(url, {'comments': 'ok'})
+
+
+class WorkflowAnalyticsTest(WorkflowAPITestCase):
+    def snapshot(self):
+        return (
+            sorted(WorkflowDailyStats.objects.values_list(
+                'day', 'workflow_id', 'department', 'started_count', 'approved_count',
+                'rejected_count')),
+            sorted(WorkflowStepDailyStats.objects.values_list(
+                'day', 'step_id', 'approver_id', 'department', 'approved_count', 'rejected_count')),
+        )
+
+    def test_transitions_update_rollups(self):
+        """Test that starting and approving a workflow updates the daily rollups"""
+        document_workflow = self.start_workflow()
+        self.assertIsNotNone(document_workflow.step_started_at)
+        self.approve(document_workflow)
+        self.approve(document_workflow)
+
+        daily = WorkflowDailyStats.objects.get(workflow=self.workflow)
+        self.assertEqual((daily.started_count, daily.approved_count, daily.rejected_count), (1, 1, 0))
+        self.assertEqual(WorkflowStepDailyStats.objects.filter(approved_count=1).count(), 2)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test that rebuilding from history reproduces the incremental rollups"""
+        document_workflow = self.start_workflow()
+        self.approve(document_workflow)
+        self.client.force_authenticate(user=self.approver)
+        self.client.post(reverse('documentworkflow-reject', args=[document_workflow.pk]))
+
+        incremental = self.snapshot()
+        out = StringIO()
+        call_command('rebuild_workflow_stats', stdout=out)
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertIn('Rebuilt 1 workflow', out.getvalue())
+
+    def test_analytics_endpoint(self):
+        """Test the analytics report built from the rollups"""
+        document_workflow = self.start_workflow()
+        self.approve(document_workflow)
+
+        manager = User.objects.create_user(username='manager', password='testpassword')
+        manager.profile.role = 'manager'
+        manager.profile.save()
+        self.client.force_authenticate(user=manager)
+        response = self.client.get(reverse('workflow-analytics'), {'stuck_hours': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['workflows'][0]['started'], 1)
+        self.assertEqual(response.data['approvers'][0]['username'], 'approver')
+        self.assertEqual(response.data['stuck'][0]['current_step'], 'Second')
+
+    def test_analytics_is_for_roles_that_read_every_document(self):
+        """Test that analytics is refused to other roles and scoped with ?department="""
+        self.document.department = 'legal'
+        self.document.save()
+        self.approve(self.start_workflow())
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(reverse('workflow-analytics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_user(username='admin', password='testpassword')
+        admin.profile.role = 'admin'
+        admin.profile.save()
+        self.client.force_authenticate(user=admin)
+        for department, started in (('legal', 1), ('finance', 0), ('', 0)):
+            response = self.client.get(reverse('workflow-analytics'),
+                                       {'department': department, 'stuck_hours': 0})
+            self.assertEqual(sum(row['started'] for row in response.data['workflows']), started)
+            self.assertEqual(len(response.data['approvers']), started)
+            self.assertEqual(len(response.data['stuck']), started)
+
+
+class DocumentWorkflowAccessTest(WorkflowAPITestCase):
+    def test_workflows_of_hidden_documents_are_not_readable(self):
+        """Test that document workflows follow the ACL of their document"""
+        document_workflow = self.start_workflow()
+        outsider = User.objects.create_user(username='outsider', password='testpassword')
+        self.client.force_authenticate(user=outsider)
+        url = reverse('documentworkflow-detail', args=[document_workflow.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('documentworkflow-list')).data['count'], 0)
+        # The step approver takes part in the workflow and can read it
+        self.client.force_authenticate(user=self.approver)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_workflows_cannot_start_on_hidden_documents(self):
+        """Test that a workflow can't be started on a document the user can't see"""
+        outsider = User.objects.create_user(username='outsider', password='testpassword')
+        self.client.force_authenticate(user=outsider)
+        response = self.client.post(reverse('documentworkflow-list'), {
+            'document_id': str(self.document.id),
+            'workflow_id': self.workflow.id,
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('document_id', response.data)
+        self.assertFalse(DocumentWorkflow.objects.exists())
+
+
+class WorkflowSLATest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='sla_owner', password='testpassword')
+        self.approver = User.objects.create_user(username='sla_approver', password='testpassword')
+        document = Document.objects.create(title='SLA Document', created_by=self.owner)
+        workflow = Workflow.objects.create(name='Timed', created_by=self.owner)
+        self.step = WorkflowStep.objects.create(workflow=workflow, name='Only', order=1,
+                                                approver=self.approver, sla=timedelta(hours=4))
+        self.document_workflow = DocumentWorkflow(document=document, workflow=workflow)
+        self.started = timezone.now()
+        self.document_workflow.start_step(self.step, self.started)
+        self.document_workflow.save()
+        WorkflowStepApproval.objects.create(document_workflow=self.document_workflow, step=self.step)
+
+    def test_due_at_follows_step_sla(self):
+        """Test that making a step current sets its deadline"""
+        self.assertEqual(self.document_workflow.due_at, self.started + timedelta(hours=4))
+        self.assertEqual(sla.next_deadline(), self.document_workflow.due_at)
+
+    def test_reminders_then_escalation(self):
+        """Test that overdue steps get reminders and are then escalated to the owner"""
+        now = self.started + timedelta(hours=5)
+        with self.settings(WORKFLOW_SLA={'ESCALATE_AFTER_REMINDERS': 1,
+                                         'REMINDER_INTERVAL': timedelta(hours=1)}):
+            self.assertEqual(sla.process_overdue(now=now), 1)
+            self.assertEqual(sla.process_overdue(now=now), 0)
+            self.assertEqual(sla.process_overdue(now=now + timedelta(hours=1)), 1)
+
+        self.document_workflow.refresh_from_db()
+        self.assertEqual(self.document_workflow.reminders_sent, 2)
+        self.assertEqual(self.document_workflow.escalated_to, self.owner)
+
+        # The escalation target may now decide the step
+        self.client.force_authenticate(user=self.owner)
+        url = reverse('documentworkflow-approve-step', args=[self.document_workflow.pk])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'approved')
+        self.assertIsNone(response.data['due_at'])
+
+
+class NotificationDigestTest(WorkflowAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.approver.email = 'approver@example.com'
+        self.approver.save()
+
+    def test_transitions_only_write_the_outbox(self):
+        """Test that transitions queue notifications without sending email"""
+        document_workflow = self.start_workflow()
+        self.approve(document_workflow)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Notification.objects.filter(recipient=self.approver,
+                                                     event='step_assigned').count(), 2)
+
+    def test_digest_batches_events_per_recipient(self):
+        """Test that a recipient's pending events go out as one digest once the window passes"""
+        document_workflow = self.start_workflow()
+        self.approve(document_workflow)
+
+        self.assertEqual(notifications.send_due_digests(), 0)
+        later = timezone.now() + timedelta(hours=1)
+        with self.settings(NOTIFICATION_DIGEST={'MAX_MESSAGES_PER_SECOND': 1000}):
+            self.assertEqual(notifications.send_due_digests(now=later), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['approver@example.com'])
+        self.assertIn('2 workflow updates', mail.outbox[0].subject)
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True,
+                                                     recipient=self.approver).exists())
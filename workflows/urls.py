@@ -3,9 +3,10 @@ from rest_framework.routers import DefaultRouter
 from .views import WorkflowViewSet, WorkflowStepViewSet, DocumentWorkflowViewSet
 
 router = DefaultRouter()
-router.register(r'', WorkflowViewSet)
+# Prefixed routes go first so the '' detail route does not shadow them
 router.register(r'steps', WorkflowStepViewSet)
 router.register(r'document-workflows', DocumentWorkflowViewSet)
+router.register(r'', WorkflowViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
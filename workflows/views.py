@@ -1,20 +1,35 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.http import Http404
+from django.db import transaction
 from django.utils import timezone
-from .models import Workflow, WorkflowStep, DocumentWorkflow, WorkflowStepApproval
+from datetime import timedelta
+from .models import Workflow, WorkflowStep, DocumentWorkflow
+from . import analytics, notifications
 from .serializers import (WorkflowSerializer, WorkflowStepSerializer, 
                           DocumentWorkflowSerializer, WorkflowStepApprovalSerializer)
 from django_filters.rest_framework import DjangoFilterBackend
+from documents import acl
+from documents.scoping import DepartmentScopedMixin, department_scope
+
+
+class ReadsAllDocuments(permissions.BasePermission):
+    # Roles that may read every document (admins and managers by default)
+    def has_permission(self, request, view):
+        return acl.role_permission(request.user) is not None
 
 
 class WorkflowViewSet(viewsets.ModelViewSet):
-    queryset = Workflow.objects.all()
+    queryset = Workflow.objects.order_by('-created_at')
     serializer_class = WorkflowSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
+    throttle_scopes = {'analytics': 'analytics'}
+    
+    def get_queryset(self):
+        return WorkflowSerializer.eager_load(super().get_queryset())
     
     @action(detail=True, methods=['post'])
     def add_step(self, request, pk=None):
@@ -25,6 +40,29 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             serializer.save(workflow=workflow)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'],
+            permission_classes=[permissions.IsAuthenticated, ReadsAllDocuments])
+    def analytics(self, request):
+        # Reads the daily rollup tables only, never the raw approvals; the
+        # rollups span documents, so only roles that may read them all get
+        # them, narrowed to one department with ?department=
+        try:
+            days = int(request.query_params.get('days', 30))
+            workflow_id = request.query_params.get('workflow')
+            workflow_id = int(workflow_id) if workflow_id else None
+            stuck_hours = request.query_params.get('stuck_hours')
+            stuck_after = timedelta(hours=float(stuck_hours)) if stuck_hours else None
+        except ValueError:
+            return Response({'error': 'days, workflow and stuck_hours must be numbers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        end_day = timezone.localdate()
+        start_day = end_day - timedelta(days=max(days, 1) - 1)
+        scoped, department = department_scope(request)
+        department = analytics.department_key(department) if scoped else None
+        return Response(analytics.build_report(start_day, end_day, workflow_id, stuck_after,
+                                               department))
 
 
 class WorkflowStepViewSet(viewsets.ModelViewSet):
@@ -33,17 +71,36 @@ class WorkflowStepViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['workflow']
+    
+    def get_queryset(self):
+        return WorkflowStepSerializer.eager_load(super().get_queryset())
 
 
-class DocumentWorkflowViewSet(viewsets.ModelViewSet):
-    queryset = DocumentWorkflow.objects.all()
+class DocumentWorkflowViewSet(DepartmentScopedMixin, viewsets.ModelViewSet):
+    queryset = DocumentWorkflow.objects.order_by('-started_at')
+    department_field = 'document__department'
+    document_field = 'document_id'
+    owner_field = 'document__created_by_id'
     serializer_class = DocumentWorkflowSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['document', 'workflow', 'status']
     search_fields = ['document__title', 'workflow__name']
     
+    def get_queryset(self):
+        # approve_step and reject also answer from these prefetched rows
+        queryset = acl.visible_document_workflows(super().get_queryset(), self.request.user)
+        return DocumentWorkflowSerializer.eager_load(queryset)
+    
+    def current_approval(self, document_workflow):
+        # From the prefetched approvals, so the response shows the decision
+        for approval in document_workflow.step_approvals.all():
+            if approval.step_id == document_workflow.current_step_id:
+                return approval
+        raise Http404('No approval record for the current step')
+    
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def approve_step(self, request, pk=None):
         document_workflow = self.get_object()
         current_step = document_workflow.current_step
@@ -51,15 +108,13 @@ class DocumentWorkflowViewSet(viewsets.ModelViewSet):
         if not current_step:
             return Response({'error': 'No current step to approve'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if user is the approver for this step
-        if current_step.approver != request.user:
+        # Check if user is the approver (or escalation target) for this step
+        if not document_workflow.can_decide(request.user):
             return Response({'error': 'You are not authorized to approve this step'}, 
                             status=status.HTTP_403_FORBIDDEN)
         
         # Get the approval record for this step
-        approval = get_object_or_404(WorkflowStepApproval, 
-                                    document_workflow=document_workflow, 
-                                    step=current_step)
+        approval = self.current_approval(document_workflow)
         
         # Update the approval
         approval.approved = True
@@ -67,26 +122,30 @@ class DocumentWorkflowViewSet(viewsets.ModelViewSet):
         approval.approved_by = request.user
         approval.comments = request.data.get('comments', '')
         approval.save()
+        analytics.record_step_decision(document_workflow, current_step, request.user,
+                                       True, approval.approved_at)
         
         # Move to the next step or complete the workflow
-        next_step = WorkflowStep.objects.filter(
-            workflow=document_workflow.workflow,
-            order__gt=current_step.order
-        ).order_by('order').first()
+        next_step = next((step for step in document_workflow.workflow.steps.all()
+                          if step.order > current_step.order), None)
         
         if next_step:
-            document_workflow.current_step = next_step
+            document_workflow.start_step(next_step, approval.approved_at)
             document_workflow.save()
+            notifications.step_assigned(document_workflow)
         else:
             # All steps completed
-            document_workflow.current_step = None
+            document_workflow.start_step(None, approval.approved_at)
             document_workflow.status = 'approved'
             document_workflow.completed_at = timezone.now()
             document_workflow.save()
+            analytics.record_completed(document_workflow)
+            notifications.workflow_completed(document_workflow)
         
         return Response(DocumentWorkflowSerializer(document_workflow).data)
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def reject(self, request, pk=None):
         document_workflow = self.get_object()
         current_step = document_workflow.current_step
@@ -94,15 +153,13 @@ class DocumentWorkflowViewSet(viewsets.ModelViewSet):
         if not current_step:
             return Response({'error': 'No current step to reject'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if user is the approver for this step
-        if current_step.approver != request.user:
+        # Check if user is the approver (or escalation target) for this step
+        if not document_workflow.can_decide(request.user):
             return Response({'error': 'You are not authorized to reject this workflow'}, 
                             status=status.HTTP_403_FORBIDDEN)
         
         # Get the approval record for this step
-        approval = get_object_or_404(WorkflowStepApproval, 
-                                    document_workflow=document_workflow, 
-                                    step=current_step)
+        approval = self.current_approval(document_workflow)
         
         # Update the approval as rejected
         approval.approved = False
@@ -110,10 +167,15 @@ class DocumentWorkflowViewSet(viewsets.ModelViewSet):
         approval.approved_by = request.user
         approval.comments = request.data.get('comments', '')
         approval.save()
+        analytics.record_step_decision(document_workflow, current_step, request.user,
+                                       False, approval.approved_at)
         
         # Mark the workflow as rejected
+        document_workflow.due_at = None
         document_workflow.status = 'rejected'
         document_workflow.completed_at = timezone.now()
         document_workflow.save()
+        analytics.record_completed(document_workflow)
+        notifications.workflow_completed(document_workflow)
         
         return Response(DocumentWorkflowSerializer(document_workflow).data)